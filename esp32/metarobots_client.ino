@@ -28,6 +28,7 @@ const int SENSOR_PIN = 4;      // Pin del sensor (opcional)
 
 // Variables
 bool buttonPressed = false;
+unsigned long secuenciaEnvio = 0;  // Contador de envíos (diagnóstico de latencia)
 unsigned long lastButtonTime = 0;
 const unsigned long DEBOUNCE_DELAY = 500;  // 500ms debounce
 
@@ -174,6 +175,8 @@ void enviarTiempo(float tiempo, String categoria) {
   StaticJsonDocument<200> doc;
   doc["categoria"] = categoria;
   doc["tiempo"] = String(tiempo, 5);  // 5 decimales de precisión
+  doc["dispositivo"] = WiFi.macAddress();
+  doc["secuencia"] = ++secuenciaEnvio;
   
   String jsonString;
   serializeJson(doc, jsonString);
@@ -1,9 +1,80 @@
-from django.contrib import admin
-from .models import Categoria, Robot, SesionRegistro, TiempoRegistro
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import (
+    AccionSincronizada, Categoria, Evento, FootballGroup, FootballGroupMatch, FootballTeam, RallyTriad, Robot, SesionRegistro,
+    TiempoRegistro, Tournament, TournamentMatch, TournamentParticipant, TournamentRound,
+)
+
+# Con filtros el conteo exacto se corta aquí (el paginador muestra "10001" como máximo)
+LIMITE_CONTEO = 10000
+
+
+def filas_estimadas(queryset):
+    """Filas de la tabla sin recorrerla: reltuples en PostgreSQL, rango de ids en el resto (None si no aplica)."""
+    modelo = queryset.model
+    conexion = connections[queryset.db]
+    if conexion.vendor == 'postgresql':
+        with conexion.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [modelo._meta.db_table])
+            fila = cursor.fetchone()
+        return fila[0] if fila and fila[0] >= 0 else None
+    if modelo._meta.pk.get_internal_type() not in ('AutoField', 'BigAutoField'):
+        return None
+    # MIN/MAX de la clave primaria se resuelven con los extremos del índice (los huecos sobreestiman)
+    rango = modelo._default_manager.using(queryset.db).aggregate(menor=Min('pk'), mayor=Max('pk'))
+    return 0 if rango['menor'] is None else rango['mayor'] - rango['menor'] + 1
+
+
+class ConteoEstimadoPaginator(Paginator):
+    """Paginador del admin que no hace COUNT(*) de la tabla entera.
+
+    Sin filtros usa filas_estimadas(); con filtros cuenta como mucho LIMITE_CONTEO + 1 filas.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if not qs.query.where:
+            estimado = filas_estimadas(qs)
+            if estimado is not None:
+                return estimado
+        return qs[:LIMITE_CONTEO + 1].count()
+
+
+class AdminEscalable(admin.ModelAdmin):
+    """Base de los admins de tablas grandes: conteo estimado y sin el conteo total aparte."""
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+
+
+class CategoriaRobotFilter(admin.SimpleListFilter):
+    """Filtra por la categoría del robot con un IN sobre los ids (usa los índices por robot, sin JOIN)."""
+    title = 'categoría'
+    parameter_name = 'categoria'
+
+    def lookups(self, request, model_admin):
+        return [(c.pk, c.get_nombre_display()) for c in Categoria.objects.all()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(robot__in=Robot.objects.filter(categoria_id=self.value()).values('pk'))
+        return queryset
+
+
+class ReasignarRobotForm(ActionForm):
+    robot_destino = forms.IntegerField(required=False, label='Robot destino (id)')
+
 
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'activa', 'fecha_creacion']
+    list_display = ['nombre', 'activa', 'ttl_sesion', 'fecha_creacion']
     list_filter = ['activa', 'fecha_creacion']
     search_fields = ['nombre', 'descripcion']
 
@@ -11,19 +82,142 @@ class CategoriaAdmin(admin.ModelAdmin):
 class RobotAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'categoria', 'autor_principal', 'autor_secundario', 'activo', 'fecha_registro']
     list_filter = ['categoria', 'activo', 'fecha_registro']
+    list_select_related = ['categoria']
     search_fields = ['nombre', 'autor_principal', 'autor_secundario']
     ordering = ['categoria', 'nombre']
 
 @admin.register(SesionRegistro)
-class SesionRegistroAdmin(admin.ModelAdmin):
-    list_display = ['robot', 'activa', 'usuario', 'fecha_inicio', 'fecha_fin']
-    list_filter = ['activa', 'fecha_inicio', 'robot__categoria']
+class SesionRegistroAdmin(AdminEscalable):
+    list_display = ['robot', 'activa', 'usuario', 'fecha_inicio', 'expira_en', 'fecha_fin']
+    list_filter = ['activa', 'fecha_inicio', CategoriaRobotFilter]
+    list_select_related = ['robot__categoria']
+    raw_id_fields = ['robot']
     search_fields = ['robot__nombre', 'usuario']
     ordering = ['-fecha_inicio']
+    actions = ['cerrar_sesiones']
+
+    @admin.action(description='Cerrar las sesiones seleccionadas')
+    def cerrar_sesiones(self, request, queryset):
+        cerradas = queryset.filter(activa=True).update(activa=False, fecha_fin=timezone.now())
+        self.message_user(request, f'Sesiones cerradas: {cerradas}', messages.SUCCESS)
 
 @admin.register(TiempoRegistro)
-class TiempoRegistroAdmin(admin.ModelAdmin):
+class TiempoRegistroAdmin(AdminEscalable):
     list_display = ['robot', 'tiempo', 'metodo_registro', 'valido', 'fecha_registro']
-    list_filter = ['metodo_registro', 'valido', 'fecha_registro', 'robot__categoria']
+    list_filter = ['metodo_registro', 'valido', 'fecha_registro', CategoriaRobotFilter]
+    list_select_related = ['robot__categoria']
+    raw_id_fields = ['robot', 'sesion']
     search_fields = ['robot__nombre', 'observaciones']
     ordering = ['-fecha_registro']
+    action_form = ReasignarRobotForm
+    actions = ['invalidar_tiempos', 'reasignar_robot']
+
+    @admin.action(description='Marcar los tiempos seleccionados como inválidos')
+    def invalidar_tiempos(self, request, queryset):
+        invalidados = queryset.filter(valido=True).update(valido=False)
+        self.message_user(request, f'Tiempos invalidados: {invalidados}', messages.SUCCESS)
+
+    @admin.action(description='Reasignar los tiempos seleccionados al robot destino')
+    def reasignar_robot(self, request, queryset):
+        try:
+            robot = Robot.objects.filter(pk=int(request.POST.get('robot_destino', ''))).first()
+        except ValueError:
+            robot = None
+        if robot is None:
+            self.message_user(request, 'Indica el id de un robot existente en "Robot destino".', messages.ERROR)
+            return
+        movidos = queryset.update(robot=robot)
+        self.message_user(request, f'Tiempos reasignados a {robot.nombre}: {movidos}', messages.SUCCESS)
+
+# =====================
+# Torneos
+# =====================
+# Los contadores de avance y las tablas de grupos los mantienen los servicios de torneo:
+# aquí son de solo lectura (verificar_posiciones --reparar los recalcula).
+
+@admin.register(Tournament)
+class TournamentAdmin(AdminEscalable):
+    list_display = ['nombre', 'categoria', 'activo', 'fecha_creacion', 'group_matches_pending', 'triads_pending']
+    list_filter = ['categoria', 'activo']
+    search_fields = ['nombre']
+    readonly_fields = ['group_matches_total', 'group_matches_pending', 'triads_total', 'triads_pending']
+
+@admin.register(TournamentParticipant)
+class TournamentParticipantAdmin(AdminEscalable):
+    list_display = ['nombre', 'tournament']
+    list_select_related = ['tournament']
+    raw_id_fields = ['tournament']
+    search_fields = ['nombre', 'tournament__nombre']
+
+@admin.register(TournamentRound)
+class TournamentRoundAdmin(AdminEscalable):
+    list_display = ['nombre', 'tournament', 'index', 'completed']
+    list_filter = ['completed']
+    list_select_related = ['tournament']
+    raw_id_fields = ['tournament']
+
+@admin.register(TournamentMatch)
+class TournamentMatchAdmin(AdminEscalable):
+    list_display = ['__str__', 'round', 'winner', 'is_bye']
+    list_filter = ['is_bye']
+    list_select_related = ['round', 'a', 'b', 'winner']
+    raw_id_fields = ['round', 'a', 'b', 'winner', 'next_match']
+
+@admin.register(RallyTriad)
+class RallyTriadAdmin(AdminEscalable):
+    list_display = ['__str__', 'tournament', 'winner']
+    list_select_related = ['tournament', 'a', 'b', 'c', 'winner']
+    raw_id_fields = ['tournament', 'a', 'b', 'c', 'winner']
+
+@admin.register(FootballGroup)
+class FootballGroupAdmin(AdminEscalable):
+    list_display = ['__str__', 'tournament', 'completed', 'matches_pending', 'matches_total']
+    list_filter = ['completed']
+    list_select_related = ['tournament']
+    raw_id_fields = ['tournament']
+    readonly_fields = ['completed', 'matches_total', 'matches_pending']
+
+@admin.register(FootballTeam)
+class FootballTeamAdmin(AdminEscalable):
+    list_display = ['participant', 'group', 'pj', 'g', 'e', 'p', 'gf', 'gc', 'dg', 'pts']
+    list_select_related = ['participant', 'group']
+    raw_id_fields = ['group', 'participant']
+    readonly_fields = ['pj', 'g', 'e', 'p', 'gf', 'gc', 'dg', 'pts']
+    ordering = ['group', '-pts']
+
+@admin.register(FootballGroupMatch)
+class FootballGroupMatchAdmin(AdminEscalable):
+    list_display = ['__str__', 'group', 'goals_home', 'goals_away', 'played']
+    list_filter = ['played']
+    list_select_related = ['group', 'home__participant', 'away__participant']
+    raw_id_fields = ['group', 'home', 'away']
+    # Los resultados se cargan desde la vista de grupos (record_group_result actualiza la tabla)
+    readonly_fields = ['goals_home', 'goals_away', 'played']
+
+# =====================
+# Registro de eventos
+# =====================
+
+@admin.register(Evento)
+class EventoAdmin(AdminEscalable):
+    """Solo lectura: el registro únicamente crece (reconstruir_torneo agrega, nunca borra)."""
+    list_display = ['id', 'fecha', 'tipo', 'torneo_id', 'robot_id']
+    list_filter = ['tipo']
+    ordering = ['-id']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(AccionSincronizada)
+class AccionSincronizadaAdmin(AdminEscalable):
+    list_display = ['clave', 'dispositivo', 'tipo', 'fecha']
+    list_filter = ['tipo']
+    search_fields = ['clave', 'dispositivo']
+    ordering = ['-fecha']
+    readonly_fields = ['clave', 'dispositivo', 'tipo', 'fecha', 'resultado']
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class JuradosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'jurados'
+
+    def ready(self):
+        from .db_sqlite import aplicar_pragmas
+
+        connection_created.connect(aplicar_pragmas, dispatch_uid='jurados_aplicar_pragmas')
+
+        from .models import Categoria, Tournament
+        from .referencias import al_cambiar
+
+        for modelo in (Categoria, Tournament):
+            post_save.connect(al_cambiar, sender=modelo, dispatch_uid=f'jurados_referencias_guardar_{modelo.__name__}')
+            post_delete.connect(al_cambiar, sender=modelo, dispatch_uid=f'jurados_referencias_borrar_{modelo.__name__}')
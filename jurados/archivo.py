@@ -0,0 +1,215 @@
+"""Base de archivo para torneos terminados y tiempos de eventos pasados.
+
+El comando `archivar` copia las filas a la base settings.ARCHIVO_DB_ALIAS
+(mismo esquema, mismos ids) y las borra del primario en lotes cortos. Categorías y
+robots se identifican por su nombre: si el archivo ya tiene uno con ese nombre
+bajo otro id (se borró y se volvió a crear en el primario), se usa el del archivo.
+
+Las vistas marcadas con @vista_con_archivo leen de esa base cuando se piden con
+?archivo=1. Mientras no se haya corrido `archivar` (que crea el esquema) se
+muestran los datos del primario con el aviso "sin archivo".
+"""
+import contextvars
+import time
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models.functions import Lower
+
+_usar_archivo = contextvars.ContextVar('usar_archivo', default=False)
+_sin_archivo = contextvars.ContextVar('sin_archivo', default=False)
+# Alias cuyo esquema ya se encontró (no se vuelve a consultar en el proceso)
+_con_esquema = set()
+
+
+def alias() -> str:
+    return getattr(settings, 'ARCHIVO_DB_ALIAS', 'archivo')
+
+
+def configurado() -> bool:
+    return alias() in connections.databases
+
+
+def pide_archivo(request) -> bool:
+    return configurado() and request.method in ('GET', 'HEAD') and request.GET.get('archivo') == '1'
+
+
+def tiene_esquema() -> bool:
+    """El archivo ya tiene las tablas de jurados (las crea el comando `archivar`)."""
+    from .models import Tournament
+
+    if alias() in _con_esquema:
+        return True
+    try:
+        tablas = connections[alias()].introspection.table_names()
+    except DatabaseError:
+        return False
+    if Tournament._meta.db_table not in tablas:
+        return False
+    _con_esquema.add(alias())
+    return True
+
+
+def vista_con_archivo(view):
+    """Con ?archivo=1 la vista lee los modelos de jurados desde la base de archivo."""
+    @wraps(view)
+    def envoltura(request, *args, **kwargs):
+        if not pide_archivo(request):
+            return view(request, *args, **kwargs)
+        contexto_var = _usar_archivo if tiene_esquema() else _sin_archivo
+        token = contexto_var.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            contexto_var.reset(token)
+    return envoltura
+
+
+def leyendo() -> bool:
+    return _usar_archivo.get()
+
+
+def contexto(request) -> dict:
+    """Procesador de contexto: las plantillas muestran un aviso al leer el archivo."""
+    return {'en_archivo': _usar_archivo.get(), 'sin_archivo': _sin_archivo.get()}
+
+
+class ArchivoRouter:
+    """Lecturas de jurados dentro de @vista_con_archivo van al archivo; el resto sigue al siguiente router."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'jurados' and _usar_archivo.get():
+            return alias()
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == alias():
+            return app_label == 'jurados'
+        return None
+
+
+class ArchivoInconsistente(Exception):
+    """Una fila no quedó en el archivo (otra fila con la misma clave única lo impidió)."""
+
+
+def _copiar(modelos_y_filas, usando: str) -> None:
+    """Copia las filas con sus ids; las que ya estaban con ese id (reintentos) se dejan como están.
+
+    Si alguna no queda en el archivo se lanza ArchivoInconsistente y no se copia nada
+    del lote, así el primario no borra filas que el archivo no tiene.
+    """
+    with transaction.atomic(using=usando):
+        for modelo, objetos in modelos_y_filas:
+            if not objetos:
+                continue
+            # bulk_create pisa los campos auto_now/auto_now_add: se guardan y se restauran después
+            fechas = [f.attname for f in modelo._meta.concrete_fields if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+            originales = [[getattr(o, f) for f in fechas] for o in objetos]
+            modelo.objects.using(usando).bulk_create(objetos, batch_size=500, ignore_conflicts=True)
+            pks = [o.pk for o in objetos]
+            copiados = set()
+            for ids in _lotes(pks, 500):
+                copiados.update(modelo.objects.using(usando).filter(pk__in=ids).values_list('pk', flat=True))
+            faltan = [pk for pk in pks if pk not in copiados]
+            if faltan:
+                raise ArchivoInconsistente(
+                    f'{modelo._meta.verbose_name_plural}: el archivo rechazó los ids {faltan[:20]} '
+                    '(clave única ocupada por otra fila).'
+                )
+            if fechas:
+                for obj, valores in zip(objetos, originales):
+                    for campo, valor in zip(fechas, valores):
+                        setattr(obj, campo, valor)
+                modelo.objects.using(usando).bulk_update(objetos, fechas, batch_size=500)
+
+
+def _por_clave_natural(objetos: list, en_archivo, clave: Callable) -> Tuple[list, Dict[int, int]]:
+    """Separa los objetos que el archivo ya tiene con la misma clave natural.
+
+    Devuelve los que hay que insertar y {id en el primario: id en el archivo} de los
+    que ya estaban (con el mismo id o con otro), para reapuntar a ellos las claves foráneas.
+    """
+    existentes = {clave(o): o.pk for o in en_archivo}
+    nuevos, ids = [], {}
+    for obj in objetos:
+        pk = existentes.get(clave(obj))
+        if pk is None:
+            nuevos.append(obj)
+        else:
+            ids[obj.pk] = pk
+    return nuevos, ids
+
+
+def _lotes(ids: List[int], tamano: int) -> Iterable[List[int]]:
+    for i in range(0, len(ids), tamano):
+        yield ids[i:i + tamano]
+
+
+def archivar_torneos(lote: int = 20, pausa: float = 0.0, informar: Optional[Callable[[str], None]] = None) -> int:
+    """Mueve los torneos inactivos (con rondas, partidos, triadas y grupos) al archivo."""
+    from .models import (
+        FootballGroup, FootballGroupMatch, FootballTeam, RallyTriad,
+        Tournament, TournamentMatch, TournamentParticipant, TournamentRound,
+    )
+
+    ids = list(Tournament.objects.filter(activo=False).order_by('pk').values_list('pk', flat=True))
+    movidos = 0
+    for grupo in _lotes(ids, lote):
+        _copiar([
+            (Tournament, list(Tournament.objects.filter(pk__in=grupo))),
+            (TournamentParticipant, list(TournamentParticipant.objects.filter(tournament__in=grupo))),
+            (TournamentRound, list(TournamentRound.objects.filter(tournament__in=grupo))),
+            (TournamentMatch, list(TournamentMatch.objects.filter(round__tournament__in=grupo))),
+            (RallyTriad, list(RallyTriad.objects.filter(tournament__in=grupo))),
+            (FootballGroup, list(FootballGroup.objects.filter(tournament__in=grupo))),
+            (FootballTeam, list(FootballTeam.objects.filter(group__tournament__in=grupo))),
+            (FootballGroupMatch, list(FootballGroupMatch.objects.filter(group__tournament__in=grupo))),
+        ], alias())
+        # Solo se borran los que siguen inactivos (por si alguien reactivó uno mientras se copiaba)
+        with transaction.atomic():
+            borrados = Tournament.objects.filter(pk__in=grupo, activo=False).delete()[1].get(Tournament._meta.label, 0)
+        movidos += borrados
+        if informar:
+            informar(f'Torneos archivados: {movidos}/{len(ids)}')
+        if pausa:
+            time.sleep(pausa)
+    return movidos
+
+
+def archivar_tiempos(antes_de, lote: int = 1000, pausa: float = 0.0, informar: Optional[Callable[[str], None]] = None) -> int:
+    """Mueve al archivo los TiempoRegistro anteriores a `antes_de` (con sus robots y categorías copiados)."""
+    from .models import Categoria, Robot, TiempoRegistro
+
+    movidos = 0
+    while True:
+        tiempos = list(TiempoRegistro.objects.filter(fecha_registro__lt=antes_de).order_by('pk')[:lote])
+        if not tiempos:
+            break
+        robot_ids = {t.robot_id for t in tiempos}
+        robots = list(Robot.objects.filter(pk__in=robot_ids).annotate(nombre_ci=Lower('nombre')))
+        categorias = list(Categoria.objects.filter(pk__in={r.categoria_id for r in robots}))
+        categorias, ids_categoria = _por_clave_natural(
+            categorias, Categoria.objects.using(alias()).filter(nombre__in=[c.nombre for c in categorias]),
+            lambda c: c.nombre,
+        )
+        for r in robots:
+            r.categoria_id = ids_categoria.get(r.categoria_id, r.categoria_id)
+        robots, ids_robot = _por_clave_natural(
+            robots,
+            Robot.objects.using(alias()).filter(categoria_id__in={r.categoria_id for r in robots}).annotate(nombre_ci=Lower('nombre')),
+            lambda r: (r.categoria_id, r.nombre_ci),
+        )
+        for t in tiempos:
+            t.robot_id = ids_robot.get(t.robot_id, t.robot_id)
+            t.sesion_id = None  # las sesiones de registro no se archivan
+        _copiar([(Categoria, categorias), (Robot, robots), (TiempoRegistro, tiempos)], alias())
+        with transaction.atomic():
+            TiempoRegistro.objects.filter(pk__in=[t.pk for t in tiempos]).delete()
+        movidos += len(tiempos)
+        if informar:
+            informar(f'Tiempos archivados: {movidos}')
+        if pausa:
+            time.sleep(pausa)
+    return movidos
@@ -0,0 +1,252 @@
+"""Motor de llaves de eliminación directa en memoria (sin ORM).
+
+Los participantes son identificadores opacos (ids de TournamentParticipant, de
+Robot, ...). El motor crea rondas, avanza ganadores, aplica ediciones
+retroactivas y nombra las rondas; no toca la base de datos. El adaptador de
+services_torneo carga el estado desde la BD y persiste las diferencias en un solo
+lote; las llaves Top 12 de Rally lo guardan en la sesión con to_dict()/from_dict().
+
+Cada partido apunta al partido de la ronda siguiente que alimenta (next_match es
+la posición dentro de esa ronda, next_slot 'a' o 'b'), así que cambiar un ganador
+solo recorre su cadena hacia la final.
+"""
+import random
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+Participante = Hashable
+
+
+def round_name(entrants: int, index: int) -> str:
+    """Nombre de una ronda según cuántos participantes entran en ella."""
+    if entrants == 2:
+        return 'Final - Oro'
+    if 2 < entrants <= 4:
+        return 'Semifinales'
+    if 4 < entrants <= 8:
+        return 'Cuartos'
+    if 8 < entrants <= 16:
+        return 'Octavos'
+    if 16 < entrants <= 32:
+        return 'Dieciseisavos'
+    return f'Ronda {index + 1}'
+
+
+def get_round_name(total_participants: int, round_index: int) -> str:
+    """Nombre de la ronda `round_index` de unas llaves que empiezan con `total_participants`."""
+    entrants = total_participants
+    for _ in range(round_index):
+        entrants = (entrants + 1) // 2
+    return round_name(entrants, round_index)
+
+
+class BracketMatch:
+    __slots__ = ('a', 'b', 'winner', 'is_bye', 'next_match', 'next_slot', 'pk')
+
+    def __init__(self, a: Optional[Participante], b: Optional[Participante] = None,
+                 winner: Optional[Participante] = None, is_bye: bool = False,
+                 next_match: Optional[int] = None, next_slot: Optional[str] = None, pk: Optional[int] = None):
+        self.a = a
+        self.b = b
+        self.winner = winner
+        self.is_bye = is_bye
+        self.next_match = next_match
+        self.next_slot = next_slot
+        self.pk = pk
+
+    @property
+    def advancing(self) -> Optional[Participante]:
+        """Participante que pasa a la ronda siguiente (None si aún no se decide)."""
+        return self.a if self.is_bye else self.winner
+
+    def __repr__(self) -> str:
+        return f'BracketMatch(a={self.a!r}, b={self.b!r}, winner={self.winner!r}, is_bye={self.is_bye})'
+
+
+class BracketRound:
+    __slots__ = ('index', 'nombre', 'matches', 'completed', 'pk')
+
+    def __init__(self, index: int, nombre: str, matches: Optional[List[BracketMatch]] = None,
+                 completed: bool = False, pk: Optional[int] = None):
+        self.index = index
+        self.nombre = nombre
+        self.matches = matches if matches is not None else []
+        self.completed = completed
+        self.pk = pk
+
+    def refresh_completed(self) -> None:
+        self.completed = bool(self.matches) and all(m.advancing is not None for m in self.matches)
+
+    def __repr__(self) -> str:
+        return f'BracketRound({self.index}, {self.nombre!r}, {len(self.matches)} partidos)'
+
+
+class Bracket:
+    """Llaves completas. `origin` lo usa el adaptador para recordar lo ya persistido."""
+
+    __slots__ = ('rounds', 'origin')
+
+    def __init__(self, rounds: Optional[List[BracketRound]] = None):
+        self.rounds = rounds if rounds is not None else []
+        self.origin = None
+
+    @classmethod
+    def create(cls, participants: Sequence[Participante], rng=None) -> 'Bracket':
+        """Sortea la ronda inicial; con cantidad impar el BYE queda en el primer partido."""
+        bracket = cls()
+        bracket._append_round(list(participants), rng, bye_first=True)
+        return bracket
+
+    def _append_round(self, entrants: List[Participante], rng, bye_first: bool,
+                      sources: Optional[List[BracketMatch]] = None) -> BracketRound:
+        order = list(range(len(entrants)))
+        (rng or random).shuffle(order)
+        bye = order.pop() if len(order) % 2 == 1 else None
+        pairs: List[Tuple[int, Optional[int]]] = [(order[i], order[i + 1]) for i in range(0, len(order), 2)]
+        if bye is not None:
+            pairs.insert(0 if bye_first else len(pairs), (bye, None))
+
+        index = len(self.rounds)
+        round_obj = BracketRound(index, round_name(len(entrants), index))
+        for match_index, (x, y) in enumerate(pairs):
+            a = entrants[x]
+            b = entrants[y] if y is not None else None
+            round_obj.matches.append(BracketMatch(a, b, winner=a if y is None else None, is_bye=y is None))
+            if sources is not None:
+                for position, slot in ((x, 'a'), (y, 'b')):
+                    if position is not None:
+                        sources[position].next_match = match_index
+                        sources[position].next_slot = slot
+        round_obj.refresh_completed()
+        self.rounds.append(round_obj)
+        return round_obj
+
+    def advance(self, rng=None) -> Optional[BracketRound]:
+        """Genera la ronda siguiente si la última está completa y queda más de un participante."""
+        if not self.rounds or not self.rounds[-1].completed:
+            return None
+        sources = list(self.rounds[-1].matches)
+        if len(sources) <= 1:
+            return None
+        return self._append_round([m.advancing for m in sources], rng, bye_first=False, sources=sources)
+
+    def rebuild_from(self, round_index: int, rng=None) -> None:
+        """Descarta las rondas posteriores a `round_index` y vuelve a sortear desde ella."""
+        del self.rounds[round_index + 1:]
+        for match in self.rounds[round_index].matches:
+            match.next_match = None
+            match.next_slot = None
+        self.rounds[round_index].refresh_completed()
+        self.advance(rng)
+
+    def set_winner(self, round_index: int, match_index: int, winner: Optional[Participante], rng=None) -> List[Tuple[int, int]]:
+        """Registra (o borra, con None) el ganador de un partido y actualiza lo que depende de él.
+
+        Devuelve las posiciones (ronda, partido) modificadas. Lanza IndexError si el
+        partido no existe y ValueError si el ganador no es válido.
+        """
+        match = self.rounds[round_index].matches[match_index]
+        if match.is_bye:
+            raise ValueError('Un partido con BYE no admite ganador.')
+        if winner is not None and winner not in (match.a, match.b):
+            raise ValueError('El ganador no pertenece al partido.')
+        match.winner = winner
+        touched = [(round_index, match_index)]
+        if match.next_match is None and round_index + 1 < len(self.rounds):
+            # Llaves sin enlaces hacia adelante: no se sabe qué depende del partido
+            self.rebuild_from(round_index, rng)
+            return touched
+        touched += self._propagate(round_index, match)
+        for ri in {ri for ri, _ in touched}:
+            self.rounds[ri].refresh_completed()
+        self.advance(rng)
+        return touched
+
+    def set_round_winners(self, round_index: int, winners: Dict[int, Optional[Participante]], rng=None) -> List[Tuple[int, int]]:
+        """Registra varios ganadores de una ronda (posición del partido -> ganador) de una vez.
+
+        Valida todos antes de modificar nada (ValueError con el primer partido inválido)
+        y propaga, re-sortea o genera la ronda siguiente una sola vez al final.
+        """
+        matches = self.rounds[round_index].matches
+        for match_index, winner in winners.items():
+            match = matches[match_index]
+            if match.is_bye:
+                raise ValueError(f'Partido {match_index + 1}: un partido con BYE no admite ganador.')
+            if winner is not None and winner not in (match.a, match.b):
+                raise ValueError(f'Partido {match_index + 1}: el ganador no pertenece al partido.')
+        touched = []
+        for match_index, winner in sorted(winners.items()):
+            matches[match_index].winner = winner
+            touched.append((round_index, match_index))
+        if round_index + 1 < len(self.rounds) and any(matches[mi].next_match is None for mi in winners):
+            self.rebuild_from(round_index, rng)
+            return touched
+        for match_index in sorted(winners):
+            touched += self._propagate(round_index, matches[match_index])
+        for ri in {ri for ri, _ in touched}:
+            self.rounds[ri].refresh_completed()
+        self.advance(rng)
+        return touched
+
+    def _propagate(self, round_index: int, match: BracketMatch) -> List[Tuple[int, int]]:
+        """Lleva el participante que avanza por la cadena next_match.
+
+        Si un partido posterior lo había ganado el participante reemplazado, su
+        ganador se limpia y el hueco sigue propagándose; se detiene en cuanto un
+        partido no cambia lo que entrega.
+        """
+        touched: List[Tuple[int, int]] = []
+        ri, current = round_index, match
+        while current.next_match is not None and ri + 1 < len(self.rounds):
+            ri += 1
+            target = self.rounds[ri].matches[current.next_match]
+            advancing = current.advancing
+            if getattr(target, current.next_slot) == advancing:
+                break
+            previous = target.advancing
+            setattr(target, current.next_slot, advancing)
+            if target.is_bye:
+                target.winner = target.a
+            elif target.winner not in (target.a, target.b):
+                target.winner = None
+            touched.append((ri, current.next_match))
+            if target.advancing == previous:
+                break
+            current = target
+        return touched
+
+    def infer_links(self) -> None:
+        """Completa enlaces next_match faltantes (llaves antiguas) buscando dónde avanzó cada ganador."""
+        for current, following in zip(self.rounds, self.rounds[1:]):
+            slots: Dict[Participante, Tuple[int, str]] = {}
+            for match_index, m in enumerate(following.matches):
+                for slot in ('a', 'b'):
+                    participant = getattr(m, slot)
+                    if participant is not None:
+                        slots[participant] = (match_index, slot)
+            for m in current.matches:
+                if m.next_match is None and m.advancing in slots:
+                    m.next_match, m.next_slot = slots[m.advancing]
+
+    def locate(self, pk: int) -> Tuple[int, int]:
+        for ri, round_obj in enumerate(self.rounds):
+            for mi, m in enumerate(round_obj.matches):
+                if m.pk == pk:
+                    return ri, mi
+        raise KeyError(pk)
+
+    def to_dict(self) -> dict:
+        """Forma compacta serializable a JSON (p. ej. para la sesión)."""
+        return {'rounds': [
+            {'nombre': r.nombre, 'matches': [[m.a, m.b, m.winner, m.is_bye, m.next_match, m.next_slot] for m in r.matches]}
+            for r in self.rounds
+        ]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Bracket':
+        rounds = []
+        for index, r in enumerate(data['rounds']):
+            round_obj = BracketRound(index, r['nombre'], [BracketMatch(*m) for m in r['matches']])
+            round_obj.refresh_completed()
+            rounds.append(round_obj)
+        return cls(rounds)
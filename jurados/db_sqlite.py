@@ -0,0 +1,109 @@
+"""Ajustes de conexión para SQLite (PRAGMAs aplicados a cada conexión nueva)."""
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+# Solo se aceptan estos PRAGMAs desde la configuración (los valores vienen de variables de entorno)
+PRAGMAS_PERMITIDOS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store')
+_VALOR_VALIDO = re.compile(r'^-?[A-Za-z0-9_]+$')
+
+
+def sentencias_pragmas(pragmas: Dict[str, object]) -> List[str]:
+    """Convierte el dict de PRAGMAs en sentencias SQL, validando nombres y valores."""
+    sentencias = []
+    for nombre, valor in pragmas.items():
+        if valor in (None, ''):
+            continue
+        if nombre not in PRAGMAS_PERMITIDOS or not _VALOR_VALIDO.match(str(valor)):
+            raise ValueError(f'PRAGMA no permitido: {nombre}={valor!r}')
+        sentencias.append(f'PRAGMA {nombre} = {valor}')
+    return sentencias
+
+
+def aplicar_pragmas(sender, connection, **kwargs) -> None:
+    """Receptor de `connection_created`: aplica settings.SQLITE_PRAGMAS a la base principal.
+
+    La réplica y el archivo se copian o se llenan con la API de backup y por lotes;
+    quedan con los ajustes por defecto de SQLite (solo su `timeout` de OPTIONS).
+    """
+    if connection.vendor != 'sqlite' or connection.alias != DEFAULT_DB_ALIAS:
+        return
+    with connection.cursor() as cursor:
+        for sql in sentencias_pragmas(getattr(settings, 'SQLITE_PRAGMAS', {})):
+            cursor.execute(sql)
+
+
+@contextmanager
+def transaccion_lectura(using: str = DEFAULT_DB_ALIAS):
+    """atomic() para lecturas que necesitan una vista consistente, sin el lock de escritura.
+
+    La base principal usa transaction_mode IMMEDIATE (ver settings): cada atomic()
+    toma el lock de escritura al empezar. Este bloque empieza con BEGIN DEFERRED,
+    así no espera a los jurados que escriben ni los hace esperar. Dentro de una
+    transacción ya abierta es un savepoint común.
+    """
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite' or conexion.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    # Django fija transaction_mode al conectar (get_connection_params): se conecta antes
+    # de cambiarlo, así una reconexión dentro de atomic() no lo devuelve a IMMEDIATE.
+    conexion.close_if_health_check_failed()
+    conexion.ensure_connection()
+    modo = conexion.transaction_mode
+    conexion.transaction_mode = 'DEFERRED'
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        conexion.transaction_mode = modo
+
+
+class DemasiadosReinicios(Exception):
+    """La copia por tramos se reinició demasiadas veces por escrituras concurrentes."""
+
+
+def copiar_en_linea(origen: str, destino: str, paginas: int = -1, pausa: float = 0.0,
+                    max_reinicios: Optional[int] = None) -> Dict[str, float]:
+    """Copia una base SQLite en uso con la API de backup en línea.
+
+    Con `paginas` > 0 copia por tramos y espera `pausa` segundos entre ellos sin
+    retener ningún lock. Si otra conexión escribe en el origen, SQLite reinicia la
+    copia; pasado `max_reinicios` se lanza DemasiadosReinicios. Devuelve pasos,
+    reinicios, páginas y la duración del tramo más largo (tiempo con el origen
+    tomado en lectura).
+    """
+    estado = {'pasos': 0, 'reinicios': 0, 'paginas': 0, 'max_paso_ms': 0.0}
+    restantes_previas: List[Optional[int]] = [None]
+    marca = [time.perf_counter()]
+
+    def progreso(status, restantes, total):
+        estado['pasos'] += 1
+        estado['paginas'] = total
+        estado['max_paso_ms'] = max(estado['max_paso_ms'], (time.perf_counter() - marca[0]) * 1000)
+        if restantes_previas[0] is not None and restantes > restantes_previas[0]:
+            estado['reinicios'] += 1
+            if max_reinicios is not None and estado['reinicios'] > max_reinicios:
+                raise DemasiadosReinicios(f"{estado['reinicios']} reinicios")
+        restantes_previas[0] = restantes
+        if pausa and restantes:
+            time.sleep(pausa)
+        marca[0] = time.perf_counter()
+
+    fuente = sqlite3.connect(str(origen), timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        copia = sqlite3.connect(str(destino), timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000)
+        try:
+            fuente.backup(copia, pages=paginas, progress=progreso)
+        finally:
+            copia.close()
+    finally:
+        fuente.close()
+    estado['max_paso_ms'] = round(estado['max_paso_ms'], 3)
+    return estado
@@ -0,0 +1,180 @@
+"""Registro de eventos de los jurados e instantáneas para reconstruir torneos.
+
+Cada acción (sesiones, tiempos, ganadores, triadas, resultados de grupos,
+reinicios) agrega una fila a Evento dentro de la misma transacción que la
+aplica. Cada settings.EVENTOS_INSTANTANEA_CADA eventos de un torneo (y siempre al
+crearlo) se guarda una InstantaneaTorneo con su estado completo.
+
+reconstruir() deja un torneo como estaba tras un evento: carga la instantánea más
+cercana anterior y reproduce solo los eventos siguientes con los servicios de
+torneo. Los partidos de llaves se identifican por posición (ronda, partido)
+porque las rondas recreadas al reproducir tienen otros ids, y cada sorteo guarda
+su semilla. La reconstrucción se registra como un evento más, con su propia
+instantánea, así el historial nunca se reescribe.
+"""
+import contextlib
+import contextvars
+import random
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Evento, FootballGroup, FootballGroupMatch, FootballTeam, InstantaneaTorneo, RallyTriad,
+    Tournament, TournamentMatch, TournamentRound,
+)
+from .services_posiciones import STANDING_FIELDS
+
+_reproduciendo = contextvars.ContextVar('reproduciendo_eventos', default=False)
+
+# Columnas de cada tabla que cambian después de crear el torneo (los participantes no cambian)
+CAMPOS_TORNEO = ('nombre', 'activo', 'group_matches_total', 'group_matches_pending', 'triads_total', 'triads_pending')
+CAMPOS_RONDA = ('id', 'index', 'nombre', 'completed')
+CAMPOS_PARTIDO = ('id', 'round_id', 'a_id', 'b_id', 'winner_id', 'is_bye', 'next_match_id', 'next_slot', 'version')
+CAMPOS_TRIADA = ('id', 'winner_id', 'version')
+CAMPOS_GRUPO = ('id', 'completed', 'matches_pending')
+CAMPOS_EQUIPO = ('id',) + tuple(STANDING_FIELDS)
+CAMPOS_PARTIDO_GRUPO = ('id', 'goals_home', 'goals_away', 'played', 'version')
+
+
+class SinInstantanea(Exception):
+    """No hay instantánea del torneo anterior al evento pedido."""
+
+
+@contextlib.contextmanager
+def reproduciendo():
+    """Dentro del bloque los servicios no registran eventos (se están reproduciendo)."""
+    token = _reproduciendo.set(True)
+    try:
+        yield
+    finally:
+        _reproduciendo.reset(token)
+
+
+def nueva_semilla() -> int:
+    return random.getrandbits(32)
+
+
+def registrar(tipo: str, torneo_id: Optional[int] = None, robot_id: Optional[int] = None,
+              instantanea: bool = False, **datos) -> Optional[Evento]:
+    """Agrega un evento; con torneo, toma una instantánea si se pide o si tocan."""
+    if _reproduciendo.get():
+        return None
+    evento = Evento.objects.create(tipo=tipo, torneo_id=torneo_id, robot_id=robot_id, datos=datos)
+    if torneo_id is not None and (instantanea or _pendientes(torneo_id) >= settings.EVENTOS_INSTANTANEA_CADA):
+        InstantaneaTorneo.objects.create(torneo_id=torneo_id, evento=evento, estado=capturar(torneo_id))
+    return evento
+
+
+def _pendientes(torneo_id: int) -> int:
+    """Eventos del torneo desde su última instantánea (una consulta)."""
+    ultima = InstantaneaTorneo.objects.filter(torneo_id=torneo_id).order_by('-evento_id').values('evento_id')[:1]
+    return Evento.objects.filter(torneo_id=torneo_id, id__gt=Coalesce(Subquery(ultima), 0)).count()
+
+
+def capturar(torneo_id: int) -> dict:
+    """Estado del torneo como listas de valores (serializable a JSON)."""
+    return {
+        'torneo': Tournament.objects.filter(pk=torneo_id).values(*CAMPOS_TORNEO).get(),
+        'rondas': list(TournamentRound.objects.filter(tournament_id=torneo_id).values(*CAMPOS_RONDA)),
+        'partidos': list(TournamentMatch.objects.filter(round__tournament_id=torneo_id).order_by('id').values(*CAMPOS_PARTIDO)),
+        'triadas': list(RallyTriad.objects.filter(tournament_id=torneo_id).values(*CAMPOS_TRIADA)),
+        'grupos': list(FootballGroup.objects.filter(tournament_id=torneo_id).values(*CAMPOS_GRUPO)),
+        'equipos': list(FootballTeam.objects.filter(group__tournament_id=torneo_id).order_by('id').values(*CAMPOS_EQUIPO)),
+        'partidos_grupo': list(FootballGroupMatch.objects.filter(group__tournament_id=torneo_id).values(*CAMPOS_PARTIDO_GRUPO)),
+    }
+
+
+def _sin_bajar_versiones(filas, modelo, filtro) -> list:
+    """Las versiones restauradas quedan por encima de las actuales: una página anterior a la reconstrucción da conflicto."""
+    tope = max(modelo.objects.filter(**filtro).values_list('version', flat=True), default=-1) + 1
+    return [{**fila, 'version': max(fila['version'], tope)} for fila in filas]
+
+
+def _restaurar(torneo_id: int, estado: dict) -> None:
+    Tournament.objects.filter(pk=torneo_id).update(**estado['torneo'])
+
+    partidos = _sin_bajar_versiones(estado['partidos'], TournamentMatch, {'round__tournament_id': torneo_id})
+    TournamentRound.objects.filter(tournament_id=torneo_id).delete()
+    TournamentRound.objects.bulk_create([TournamentRound(tournament_id=torneo_id, **r) for r in estado['rondas']])
+    # Con los mismos ids; de la última ronda a la primera para que next_match ya exista
+    indices = {r['id']: r['index'] for r in estado['rondas']}
+    TournamentMatch.objects.bulk_create(
+        [TournamentMatch(**m) for m in sorted(partidos, key=lambda m: -indices[m['round_id']])], batch_size=100,
+    )
+
+    for modelo, filas, filtro in (
+        (RallyTriad, estado['triadas'], {'tournament_id': torneo_id}),
+        (FootballGroupMatch, estado['partidos_grupo'], {'group__tournament_id': torneo_id}),
+    ):
+        filas = _sin_bajar_versiones(filas, modelo, filtro)
+        if filas:
+            modelo.objects.bulk_update([modelo(**f) for f in filas], [c for c in filas[0] if c != 'id'], batch_size=100)
+    for modelo, filas in ((FootballGroup, estado['grupos']), (FootballTeam, estado['equipos'])):
+        if filas:
+            modelo.objects.bulk_update([modelo(**f) for f in filas], [c for c in filas[0] if c != 'id'], batch_size=100)
+
+
+def _partidos_de_ronda(torneo: Tournament, ronda: int) -> list:
+    """Partidos de la ronda en el orden del motor de llaves (por id)."""
+    return list(TournamentMatch.objects.filter(round__tournament=torneo, round__index=ronda).order_by('id'))
+
+
+def _aplicar(evento: Evento) -> None:
+    """Reproduce un evento de torneo con los servicios (sin versiones: el estado es el reconstruido)."""
+    from . import services_torneo as servicios
+
+    torneo = Tournament.objects.get(pk=evento.torneo_id)
+    datos = evento.datos
+    if evento.tipo == 'ganador':
+        partido = _partidos_de_ronda(torneo, datos['ronda'])[datos['partido']]
+        ganador = torneo.participants.get(pk=datos['ganador']) if datos['ganador'] else None
+        servicios.set_match_winner(torneo, partido, ganador, seed=datos['semilla'])
+    elif evento.tipo == 'ganadores_ronda':
+        partidos = _partidos_de_ronda(torneo, datos['ronda'])
+        ronda = torneo.rounds.get(index=datos['ronda'])
+        ganadores = {partidos[int(posicion)].pk: ganador for posicion, ganador in datos['ganadores'].items()}
+        servicios.set_round_winners(torneo, ronda, ganadores, seed=datos['semilla'])
+    elif evento.tipo == 'triada':
+        servicios.set_triad_winner(torneo.rally_triads.get(index=datos['triada']), datos['ganador'])
+    elif evento.tipo == 'resultados':
+        servicios.record_group_results({int(pk): tuple(goles) for pk, goles in datos['resultados'].items()}, tournament=torneo)
+    elif evento.tipo == 'llaves':
+        if datos['origen'] == 'grupos':
+            servicios.seed_knockout_from_groups(torneo, seed=datos['semilla'])
+        elif datos['origen'] == 'triadas':
+            servicios.seed_semifinals_from_triads(torneo, seed=datos['semilla'])
+        elif datos['origen'] == 'siguiente':
+            servicios.generate_next_round(torneo, seed=datos['semilla'])
+        else:
+            servicios.regenerate_following_from(torneo, torneo.rounds.get(index=datos['ronda']), seed=datos['semilla'])
+    elif evento.tipo == 'reinicio':
+        Tournament.objects.filter(pk=torneo.pk).update(activo=False)
+    # torneo_creado, instantanea y reconstruccion no cambian el estado (siempre llevan instantánea)
+
+
+@transaction.atomic
+def reconstruir(torneo_id: int, hasta: int, simular: bool = False) -> dict:
+    """Deja el torneo como estaba tras el evento `hasta` y registra la reconstrucción.
+
+    Lanza SinInstantanea si no hay instantánea del torneo en o antes de `hasta`.
+    Con `simular` todo se deshace al terminar (solo informa qué se haría).
+    """
+    instantanea = (
+        InstantaneaTorneo.objects.filter(torneo_id=torneo_id, evento_id__lte=hasta).order_by('-evento_id').first()
+    )
+    if instantanea is None:
+        raise SinInstantanea(f'El torneo {torneo_id} no tiene instantáneas en o antes del evento {hasta}.')
+    # Una reconstrucción posterior a la instantánea tendría su propia instantánea: la cola nunca la incluye
+    cola = list(Evento.objects.filter(torneo_id=torneo_id, id__gt=instantanea.evento_id, id__lte=hasta))
+    _restaurar(torneo_id, instantanea.estado)
+    with reproduciendo():
+        for evento in cola:
+            _aplicar(evento)
+    evento = registrar('reconstruccion', torneo_id, instantanea=True, hasta=hasta, desde_instantanea=instantanea.evento_id)
+    if simular:
+        transaction.set_rollback(True)
+    return {'instantanea': instantanea.evento_id, 'reproducidos': len(cola), 'evento': evento.pk}
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from jurados import archivo
+
+
+class Command(BaseCommand):
+    help = 'Mueve torneos inactivos y tiempos antiguos a la base de archivo, en lotes cortos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help='Archivar los tiempos con más de N días (sin esta opción no se archivan tiempos)')
+        parser.add_argument('--sin-torneos', action='store_true', help='No archivar torneos inactivos')
+        parser.add_argument('--lote-torneos', type=int, default=20)
+        parser.add_argument('--lote-tiempos', type=int, default=1000)
+        parser.add_argument('--pausa', type=float, default=0.05, help='Segundos entre lotes para dejar pasar a los escritores')
+
+    def handle(self, *args, **opts):
+        # El archivo se crea/actualiza con el mismo esquema antes de copiar
+        call_command('migrate', 'jurados', database=archivo.alias(), verbosity=0)
+        try:
+            self.archivar(opts)
+        except archivo.ArchivoInconsistente as error:
+            raise CommandError(f'No se archivó el último lote: {error}')
+
+    def archivar(self, opts):
+        if not opts['sin_torneos']:
+            torneos = archivo.archivar_torneos(lote=opts['lote_torneos'], pausa=opts['pausa'], informar=self.stdout.write)
+            self.stdout.write(self.style.SUCCESS(f'Torneos archivados: {torneos}'))
+        if opts['dias'] is not None:
+            antes_de = timezone.now() - timedelta(days=opts['dias'])
+            tiempos = archivo.archivar_tiempos(antes_de, lote=opts['lote_tiempos'], pausa=opts['pausa'], informar=self.stdout.write)
+            self.stdout.write(self.style.SUCCESS(f'Tiempos archivados: {tiempos}'))
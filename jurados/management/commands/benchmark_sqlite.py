@@ -0,0 +1,149 @@
+"""Compara throughput mixto de lectura/escritura en SQLite antes y después del ajuste.
+
+"antes": configuración por defecto de Django (journal DELETE, synchronous FULL,
+una conexión nueva por operación, transacciones DEFERRED).
+"despues": PRAGMAs de settings.SQLITE_PRAGMAS, conexión persistente por hilo y
+BEGIN IMMEDIATE para las escrituras.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jurados.db_sqlite import sentencias_pragmas
+from jurados.metricas import percentil
+
+ESQUEMA = """
+CREATE TABLE tiempos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    robot_id INTEGER NOT NULL,
+    tiempo REAL NOT NULL,
+    valido INTEGER NOT NULL DEFAULT 1,
+    fecha TEXT NOT NULL
+);
+CREATE INDEX tiempos_robot_idx ON tiempos (robot_id, tiempo);
+"""
+# Consulta similar al ranking de los tableros
+LECTURA = 'SELECT robot_id, MIN(tiempo) FROM tiempos WHERE valido = 1 GROUP BY robot_id ORDER BY 2 LIMIT 20'
+ESCRITURA = "INSERT INTO tiempos (robot_id, tiempo, valido, fecha) VALUES (?, ?, 1, datetime('now'))"
+
+
+class Escenario:
+    def __init__(self, nombre, ruta, pragmas, persistente, begin, timeout):
+        self.nombre = nombre
+        self.ruta = ruta
+        self.pragmas = pragmas
+        self.persistente = persistente
+        self.begin = begin
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.latencias = {'lectura': [], 'escritura': []}
+        self.errores = Counter()
+        self._local = threading.local()
+
+    def conectar(self):
+        conn = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        for sql in sentencias_pragmas(self.pragmas):
+            conn.execute(sql)
+        return conn
+
+    def conexion(self):
+        if not self.persistente:
+            return self.conectar()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self.conectar()
+        return conn
+
+    def operar(self, tipo, rng):
+        t0 = time.perf_counter()
+        conn = None
+        try:
+            conn = self.conexion()
+            if tipo == 'lectura':
+                conn.execute(LECTURA).fetchall()
+            else:
+                conn.execute(self.begin)
+                conn.execute(ESCRITURA, (rng.randint(1, 200), rng.uniform(8, 50)))
+                conn.execute('COMMIT')
+            error = None
+        except sqlite3.OperationalError as e:
+            error = str(e)
+            if conn is not None and conn.in_transaction:
+                conn.execute('ROLLBACK')
+        finally:
+            if conn is not None and not self.persistente:
+                conn.close()
+        ms = (time.perf_counter() - t0) * 1000
+        with self.lock:
+            if error:
+                self.errores[f'{tipo}: {error}'] += 1
+            else:
+                self.latencias[tipo].append(ms)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de lecturas/escrituras concurrentes en SQLite: configuración por defecto vs. ajustada.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=4)
+        parser.add_argument('--lectores', type=int, default=8)
+        parser.add_argument('--duracion', type=float, default=10.0, help='Segundos por escenario')
+        parser.add_argument('--filas', type=int, default=20000, help='Filas iniciales de la tabla')
+
+    def handle(self, *args, **opts):
+        timeout = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+        ajustes = [
+            ('antes', {'journal_mode': 'DELETE', 'synchronous': 'FULL'}, False, 'BEGIN', 5.0),
+            ('despues', settings.SQLITE_PRAGMAS, True, 'BEGIN IMMEDIATE', timeout),
+        ]
+        with tempfile.TemporaryDirectory(prefix='metarobots-bench-') as tmpdir:
+            for nombre, pragmas, persistente, begin, espera in ajustes:
+                ruta = os.path.join(tmpdir, f'{nombre}.sqlite3')
+                self._preparar(ruta, opts['filas'])
+                escenario = Escenario(nombre, ruta, pragmas, persistente, begin, espera)
+                self._correr(escenario, opts)
+                self._reportar(escenario, opts['duracion'])
+
+    def _preparar(self, ruta, filas):
+        conn = sqlite3.connect(ruta)
+        conn.executescript(ESQUEMA)
+        rng = random.Random(0)
+        conn.executemany(
+            "INSERT INTO tiempos (robot_id, tiempo, valido, fecha) VALUES (?, ?, 1, datetime('now'))",
+            ((rng.randint(1, 200), rng.uniform(8, 50)) for _ in range(filas)),
+        )
+        conn.commit()
+        conn.close()
+
+    def _correr(self, escenario, opts):
+        fin = time.perf_counter() + opts['duracion']
+
+        def trabajador(tipo, semilla):
+            rng = random.Random(semilla)
+            while time.perf_counter() < fin:
+                escenario.operar(tipo, rng)
+
+        hilos = [threading.Thread(target=trabajador, args=('escritura', i)) for i in range(opts['escritores'])]
+        hilos += [threading.Thread(target=trabajador, args=('lectura', 1000 + i)) for i in range(opts['lectores'])]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+    def _reportar(self, escenario, duracion):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Escenario: {escenario.nombre}'))
+        for tipo, valores in escenario.latencias.items():
+            valores.sort()
+            self.stdout.write(
+                f'  {tipo}: {len(valores) / duracion:.1f} ops/s  '
+                f'p50={percentil(valores, 50)} p95={percentil(valores, 95)} p99={percentil(valores, 99)} ms'
+            )
+        for error, cantidad in escenario.errores.most_common():
+            self.stdout.write(self.style.WARNING(f'  error {error}: {cantidad}'))
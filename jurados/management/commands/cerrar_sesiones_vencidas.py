@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jurados.models import SesionRegistro
+
+
+class Command(BaseCommand):
+    help = 'Cierra las sesiones de registro cuyo TTL ya venció (un único UPDATE por pasada).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cada', type=float, default=0, help='Repetir cada N segundos (0 = una sola pasada)')
+
+    def handle(self, *args, **opts):
+        while True:
+            cerradas = SesionRegistro.cerrar_vencidas()
+            if cerradas or not opts['cada']:
+                self.stdout.write(f'Sesiones vencidas cerradas: {cerradas}')
+            if not opts['cada']:
+                break
+            time.sleep(opts['cada'])
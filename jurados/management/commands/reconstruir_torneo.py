@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from jurados import eventos
+from jurados.models import Evento, Tournament
+
+
+class Command(BaseCommand):
+    help = ('Deja un torneo como estaba tras un evento: carga la instantánea más cercana y reproduce los eventos '
+            'siguientes. Sin --hasta ni --fecha lista los últimos eventos del torneo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--torneo', type=int, required=True)
+        parser.add_argument('--hasta', type=int, help='Id del último evento que se conserva')
+        parser.add_argument('--fecha', help='Conservar los eventos hasta esta fecha (AAAA-MM-DD HH:MM:SS)')
+        parser.add_argument('--simular', action='store_true', help='Reconstruir y deshacer, solo para revisar')
+        parser.add_argument('--instantanea', action='store_true',
+                            help='Guardar una instantánea del estado actual (torneos creados antes del registro de eventos)')
+        parser.add_argument('--ultimos', type=int, default=20, help='Eventos a listar')
+
+    def handle(self, *args, **opts):
+        torneo_id = opts['torneo']
+        if not Tournament.objects.filter(pk=torneo_id).exists():
+            raise CommandError(f'No existe el torneo {torneo_id}.')
+        if opts['instantanea']:
+            evento = eventos.registrar('instantanea', torneo_id, instantanea=True)
+            self.stdout.write(self.style.SUCCESS(f'Instantánea guardada tras el evento {evento.pk}.'))
+            return
+
+        hasta = opts['hasta']
+        if opts['fecha']:
+            fecha = parse_datetime(opts['fecha'])
+            if fecha is None:
+                raise CommandError('Fecha inválida (use AAAA-MM-DD HH:MM:SS).')
+            hasta = (
+                Evento.objects.filter(torneo_id=torneo_id, fecha__lte=fecha).order_by('-id').values_list('id', flat=True).first()
+            )
+            if hasta is None:
+                raise CommandError('El torneo no tiene eventos hasta esa fecha.')
+        if hasta is None:
+            for evento in reversed(Evento.objects.filter(torneo_id=torneo_id).order_by('-id')[:opts['ultimos']]):
+                self.stdout.write(f'{evento.pk:>8}  {evento.fecha:%Y-%m-%d %H:%M:%S}  {evento.tipo:<16} {evento.datos}')
+            return
+
+        try:
+            resultado = eventos.reconstruir(torneo_id, hasta, simular=opts['simular'])
+        except eventos.SinInstantanea as error:
+            raise CommandError(str(error))
+        resumen = (
+            f'Torneo {torneo_id} hasta el evento {hasta}: instantánea del evento {resultado["instantanea"]}, '
+            f'{resultado["reproducidos"]} eventos reproducidos'
+        )
+        if opts['simular']:
+            self.stdout.write(self.style.WARNING(f'{resumen} (simulación, sin cambios).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{resumen}. Registrado como evento {resultado["evento"]}.'))
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from jurados import replica
+
+
+class Command(BaseCommand):
+    help = 'Actualiza el latido de la réplica de lectura y, si es una copia SQLite, la vuelve a copiar en línea si el primario cambió.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cada', type=float, default=0, help='Repetir cada N segundos (0 = una sola pasada)')
+        parser.add_argument('--paginas', type=int, default=-1, help='Páginas por tramo de copia (-1 = todo de una vez)')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Segundos entre tramos de copia')
+        parser.add_argument('--forzar', action='store_true', help='Copiar aunque el primario no haya cambiado')
+
+    def handle(self, *args, **opts):
+        if not replica.configurada():
+            raise CommandError(f"No hay una base '{settings.REPLICA_DB_ALIAS}' configurada (METAROBOTS_REPLICA_PATH).")
+        while True:
+            duracion = replica.refrescar(paginas=opts['paginas'], pausa=opts['pausa'], forzar=opts['forzar'])
+            copia = f'copia en {duracion:.3f} s, ' if duracion is not None else 'sin cambios, '
+            self.stdout.write(f'Réplica refrescada: {copia}atraso {replica.atraso():.3f} s')
+            if not opts['cada']:
+                break
+            time.sleep(opts['cada'])
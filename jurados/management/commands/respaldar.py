@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jurados.respaldos import RespaldoInvalido, respaldar
+
+
+class Command(BaseCommand):
+    help = 'Respaldo en línea de la base SQLite (por tramos, verificado y con rotación) sin detener el servidor.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destino', help='Carpeta de respaldos (por defecto settings.RESPALDOS_DIR)')
+        parser.add_argument('--paginas', type=int, help='Páginas por tramo (-1 = todo de una vez)')
+        parser.add_argument('--pausa', type=float, help='Segundos entre tramos')
+        parser.add_argument('--conservar', type=int, help='Cantidad de respaldos a conservar')
+        parser.add_argument('--cada', type=float, default=0, help='Repetir cada N segundos (0 = una sola pasada)')
+
+    def handle(self, *args, **opts):
+        while True:
+            try:
+                r = respaldar(opts['destino'], opts['paginas'], opts['pausa'], opts['conservar'])
+            except RespaldoInvalido as e:
+                raise CommandError(f'El respaldo no pasó integrity_check: {e}')
+            modo = 'una sola pasada' if r['un_solo_paso'] else f"{r['pasos']} tramos"
+            self.stdout.write(self.style.SUCCESS(f"Respaldo {r['archivo']} ({r['bytes']} bytes, integridad ok)"))
+            self.stdout.write(
+                f"  duración {r['duracion_s']} s, {r['paginas']} páginas en {modo}, reinicios {r['reinicios']}"
+            )
+            self.stdout.write(
+                f"  tramo más largo {r['max_paso_ms']} ms"
+                + (' (WAL: los escritores no esperan a la copia)' if r['journal_mode_wal'] else ' (sin WAL: un COMMIT espera hasta un tramo)')
+            )
+            self.stdout.write(
+                f"  espera máxima por el lock de escritura (otros escritores) {r['max_espera_lock_escritura_ms']} ms "
+                f"({r['mediciones_sonda']} mediciones"
+                + (f", {r['esperas_agotadas']} agotaron el busy timeout" if r['esperas_agotadas'] else '') + ')'
+            )
+            for ruta in r['eliminados']:
+                self.stdout.write(f'  rotado: {ruta}')
+            if not opts['cada']:
+                break
+            time.sleep(opts['cada'])
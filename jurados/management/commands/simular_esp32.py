@@ -0,0 +1,271 @@
+"""Prueba de carga: simula una flota de ESP32 contra un servidor local desechable.
+
+Cada dispositivo simulado repite el patrón de `metarobots_client.ino`: un jurado
+abre sesión para un robot (`iniciar_sesion`) y luego el ESP32 envía el tiempo
+por POST JSON a `api_registrar_tiempo`, sin keep-alive.
+"""
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from http.cookiejar import CookieJar
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from jurados.metricas import percentil
+
+# Se ejecuta con `manage.py shell -c` contra la base desechable
+SEED_SCRIPT = """
+import json
+from jurados.models import Categoria, Robot
+salida = {}
+for nombre in %(categorias)r:
+    cat, _ = Categoria.objects.get_or_create(nombre=nombre, defaults={'activa': True})
+    Robot.objects.bulk_create([
+        Robot(categoria=cat, nombre=f'Carga {nombre} {i:04d}', autor_principal='Simulador')
+        for i in range(%(robots)d)
+    ])
+    salida[nombre] = list(Robot.objects.filter(categoria=cat).values_list('id', flat=True))
+print(json.dumps(salida))
+"""
+
+
+def entorno_desechable(tmpdir: str) -> dict:
+    """Entorno del servidor de carga: todas las bases y carpetas dentro de `tmpdir`.
+
+    El servidor arranca las tareas de fondo (réplica, respaldos, sesiones vencidas);
+    sin esto usaría la réplica, el archivo y la carpeta de respaldos reales, y la
+    rotación podría borrar respaldos de verdad. La réplica y los respaldos periódicos
+    quedan apagados.
+    """
+    env = dict(
+        os.environ,
+        METAROBOTS_DB_PATH=os.path.join(tmpdir, 'db.sqlite3'),
+        METAROBOTS_ARCHIVE_PATH=os.path.join(tmpdir, 'archivo.sqlite3'),
+        METAROBOTS_RESPALDOS_DIR=os.path.join(tmpdir, 'respaldos'),
+        METAROBOTS_RESPALDOS_INTERVALO='0',
+        METAROBOTS_REPLICA_INTERVALO='0',
+    )
+    env.pop('METAROBOTS_REPLICA_PATH', None)
+    return env
+
+
+class Resultados:
+    """Latencias y errores por endpoint, compartidos entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(Counter)
+        self.ok = Counter()
+
+    def registrar(self, endpoint, ms, error=None):
+        with self._lock:
+            self.latencias[endpoint].append(ms)
+            if error:
+                self.errores[endpoint][error] += 1
+            else:
+                self.ok[endpoint] += 1
+
+
+def clasificar_error(status, cuerpo):
+    """Agrupa respuestas fallidas en categorías legibles para el reporte."""
+    try:
+        texto = str(json.loads(cuerpo).get('error', '')).lower()
+    except (ValueError, AttributeError):
+        texto = (cuerpo or '').lower()
+    if 'locked' in texto:
+        return f'{status} database locked'
+    if 'no hay sesión activa' in texto:
+        return f'{status} sin sesión activa'
+    return f'{status}'
+
+
+class Command(BaseCommand):
+    help = 'Simula N ESP32 concurrentes contra un servidor local con base desechable y reporta throughput y latencias.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dispositivos', type=int, default=10, help='ESP32 simulados concurrentes')
+        parser.add_argument('--duracion', type=float, default=30.0, help='Segundos de carga')
+        parser.add_argument('--robots', type=int, default=20, help='Robots a crear por categoría')
+        parser.add_argument('--categorias', default='velocista,rally', help='Categorías separadas por coma')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Pausa (s) entre cruces de cada dispositivo')
+        parser.add_argument('--puerto', type=int, default=0, help='Puerto del servidor local (0 = libre)')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Timeout HTTP (s), igual que el ESP32')
+        parser.add_argument('--conservar', action='store_true', help='No borrar la base ni el log del servidor')
+
+    def handle(self, *args, **opts):
+        categorias = [c.strip() for c in opts['categorias'].split(',') if c.strip()]
+        if opts['dispositivos'] < 1 or not categorias:
+            raise CommandError('Se requiere al menos un dispositivo y una categoría.')
+
+        tmpdir = tempfile.mkdtemp(prefix='metarobots-carga-')
+        env = entorno_desechable(tmpdir)
+        manage = str(settings.BASE_DIR / 'manage.py')
+        puerto = opts['puerto'] or self._puerto_libre()
+        base_url = f'http://127.0.0.1:{puerto}'
+
+        self.stdout.write(f'Base desechable: {env["METAROBOTS_DB_PATH"]}')
+        subprocess.run([sys.executable, manage, 'migrate', '--noinput', '-v', '0'], env=env, check=True)
+        seed = subprocess.run(
+            [sys.executable, manage, 'shell', '-c', SEED_SCRIPT % {'categorias': categorias, 'robots': opts['robots']}],
+            env=env, check=True, capture_output=True, text=True,
+        )
+        robots = json.loads(seed.stdout.strip().splitlines()[-1])
+
+        log = open(os.path.join(tmpdir, 'servidor.log'), 'w')
+        servidor = subprocess.Popen(
+            [sys.executable, manage, 'runserver', f'127.0.0.1:{puerto}', '--noreload'],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            self._esperar_servidor(base_url)
+            csrf = self._obtener_csrf(base_url, robots[categorias[0]][0])
+            resultados = Resultados()
+            inicio = time.perf_counter()
+            fin = inicio + opts['duracion']
+            hilos = []
+            for i in range(opts['dispositivos']):
+                categoria = categorias[i % len(categorias)]
+                hilo = threading.Thread(
+                    target=self._dispositivo,
+                    args=(i, base_url, csrf, categoria, robots[categoria], fin, opts, resultados),
+                    daemon=True,
+                )
+                hilos.append(hilo)
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            transcurrido = time.perf_counter() - inicio
+            self._reportar(resultados, transcurrido, base_url)
+        finally:
+            servidor.terminate()
+            servidor.wait(timeout=10)
+            log.close()
+            if opts['conservar']:
+                self.stdout.write(f'Archivos conservados en {tmpdir}')
+            else:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+    # ---------- servidor ----------
+
+    def _puerto_libre(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+
+    def _esperar_servidor(self, base_url, limite=20.0):
+        deadline = time.time() + limite
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(base_url + '/', timeout=1).read()
+                return
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.2)
+        raise CommandError(f'El servidor local no respondió en {limite:.0f}s.')
+
+    def _obtener_csrf(self, base_url, robot_id):
+        """Obtiene la cookie CSRF tal como la recibiría el navegador del jurado."""
+        jar = CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+        opener.open(f'{base_url}/robot/{robot_id}/', timeout=10).read()
+        for cookie in jar:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        raise CommandError('No se obtuvo la cookie CSRF desde robot_detalle.')
+
+    # ---------- carga ----------
+
+    def _post(self, url, cuerpo, headers, timeout):
+        req = urllib.request.Request(url, data=cuerpo, headers=headers, method='POST')
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                texto = resp.read().decode('utf-8', 'replace')
+                return (time.perf_counter() - t0) * 1000, resp.status, texto
+        except urllib.error.HTTPError as e:
+            texto = e.read().decode('utf-8', 'replace')
+            return (time.perf_counter() - t0) * 1000, e.code, texto
+        except (urllib.error.URLError, ConnectionError, socket.timeout) as e:
+            motivo = getattr(e, 'reason', e)
+            return (time.perf_counter() - t0) * 1000, None, type(motivo).__name__
+
+    def _dispositivo(self, numero, base_url, csrf, categoria, robot_ids, fin, opts, resultados):
+        rng = random.Random(numero)
+        secuencia = 0
+        jurado_headers = {
+            'X-CSRFToken': csrf,
+            'Cookie': f'{settings.CSRF_COOKIE_NAME}={csrf}',
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+        while time.perf_counter() < fin:
+            robot_id = rng.choice(robot_ids)
+            # 1) El jurado pulsa "Registrar Tiempo"
+            ms, status, texto = self._post(
+                f'{base_url}/robot/{robot_id}/iniciar-sesion/', b'', jurado_headers, opts['timeout'],
+            )
+            if status != 200:
+                resultados.registrar('iniciar_sesion', ms, clasificar_error(status or 'conexión', texto))
+                continue
+            resultados.registrar('iniciar_sesion', ms)
+
+            # 2) El ESP32 detecta el cruce y envía el tiempo
+            secuencia += 1
+            rango = (800, 2000) if categoria == 'velocista' else (2000, 5000)
+            payload = {
+                'categoria': categoria,
+                'tiempo': f'{rng.randint(*rango) / 100.0:.5f}',
+                'dispositivo': f'sim-{numero:03d}',
+                'secuencia': secuencia,
+                'enviado_en': time.time() * 1000,
+            }
+            ms, status, texto = self._post(
+                f'{base_url}/api/registrar-tiempo/', json.dumps(payload).encode(),
+                {'Content-Type': 'application/json'}, opts['timeout'],
+            )
+            if status == 200:
+                resultados.registrar('registrar_tiempo', ms)
+            else:
+                resultados.registrar('registrar_tiempo', ms, clasificar_error(status or 'conexión', texto))
+            if opts['pausa']:
+                time.sleep(opts['pausa'])
+
+    # ---------- reporte ----------
+
+    def _reportar(self, resultados, transcurrido, base_url):
+        self.stdout.write('')
+        self.stdout.write(f'Duración: {transcurrido:.1f}s')
+        for endpoint in ('iniciar_sesion', 'registrar_tiempo'):
+            valores = sorted(resultados.latencias.get(endpoint, []))
+            total = len(valores)
+            ok = resultados.ok[endpoint]
+            self.stdout.write(self.style.MIGRATE_HEADING(endpoint))
+            self.stdout.write(
+                f'  peticiones={total} ok={ok} throughput={total / transcurrido:.1f} req/s '
+                f'exitosas={ok / transcurrido:.1f}/s'
+            )
+            self.stdout.write(
+                f'  latencia ms: p50={percentil(valores, 50)} p95={percentil(valores, 95)} '
+                f'p99={percentil(valores, 99)} max={round(valores[-1], 3) if valores else None}'
+            )
+            for error, cantidad in resultados.errores[endpoint].most_common():
+                self.stdout.write(self.style.WARNING(f'  error {error}: {cantidad}'))
+
+        try:
+            with urllib.request.urlopen(f'{base_url}/api/diagnostico/latencias/?etapas=validacion,commit,servidor', timeout=5) as resp:
+                etapas = json.loads(resp.read())['etapas']
+        except (urllib.error.URLError, ValueError, KeyError):
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING('Etapas en el servidor (ms)'))
+        for etapa, resumen in etapas.items():
+            self.stdout.write(f'  {etapa}: p50={resumen["p50"]} p95={resumen["p95"]} p99={resumen["p99"]} max={resumen["max"]}')
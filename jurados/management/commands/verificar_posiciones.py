@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from jurados.db_sqlite import transaccion_lectura
+from jurados.services_posiciones import compute_standings, find_mismatches, repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Compara los contadores de FootballTeam con los recalculados desde los partidos y opcionalmente los repara.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--torneo', type=int, action='append', help='Limitar a este torneo (se puede repetir)')
+        parser.add_argument('--reparar', action='store_true', help='Sobrescribir los contadores que no coinciden')
+        parser.add_argument('--lote', type=int, default=500, help='Filas por bulk_update al reparar')
+
+    def handle(self, *args, **opts):
+        torneos = opts['torneo']
+        # Solo al reparar se toma el lock de escritura desde el inicio (atomic con IMMEDIATE)
+        with transaction.atomic() if opts['reparar'] else transaccion_lectura():
+            standings = compute_standings(torneos)
+            mismatches = find_mismatches(standings, torneos)
+            for expected, current in mismatches:
+                diff = ', '.join(
+                    f'{campo}: {current[campo]} → {valor}'
+                    for campo, valor in expected.counters().items() if current[campo] != valor
+                )
+                self.stdout.write(f'{expected.nombre} (equipo {expected.team_id}): {diff}')
+            if mismatches and opts['reparar']:
+                reparados = repair_counters([expected for expected, _ in mismatches], batch_size=opts['lote'])
+                self.stdout.write(self.style.SUCCESS(f'Equipos reparados: {reparados}'))
+                return
+        estilo = self.style.WARNING if mismatches else self.style.SUCCESS
+        self.stdout.write(estilo(f'Equipos revisados: {len(standings)}, con diferencias: {len(mismatches)}'))
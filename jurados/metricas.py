@@ -0,0 +1,131 @@
+"""Métricas de latencia en memoria para la ingesta de tiempos desde ESP32.
+
+Se guardan ventanas móviles por etapa y por dispositivo; no se persisten y se
+pierden al reiniciar el servidor (pensado para diagnosticar durante el evento).
+"""
+import bisect
+import math
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+# Límites superiores (ms) de los buckets del histograma
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Dispositivos con histograma propio; los que llegan después se suman en DISPOSITIVO_OTROS
+MAX_DISPOSITIVOS = 64
+DISPOSITIVO_OTROS = 'otros'
+
+# Etapas de la ingesta, en orden
+ETAPA_RED = 'red'                # envío del dispositivo -> recepción en servidor
+ETAPA_VALIDACION = 'validacion'  # recepción -> datos y sesión validados
+ETAPA_COMMIT = 'commit'          # validación -> transacción confirmada
+ETAPA_SERVIDOR = 'servidor'      # recepción -> transacción confirmada
+ETAPA_TOTAL = 'total'            # envío del dispositivo -> transacción confirmada
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not valores:
+        return None
+    k = max(0, min(len(valores) - 1, math.ceil(p / 100.0 * len(valores)) - 1))
+    return round(valores[k], 3)
+
+
+class HistogramaLatencia:
+    """Histograma de latencias con ventana móvil de las últimas `ventana` muestras."""
+
+    def __init__(self, ventana: int = 500):
+        self.muestras = deque(maxlen=ventana)
+        self.total = 0
+
+    def registrar(self, ms: float) -> None:
+        self.muestras.append(ms)
+        self.total += 1
+
+    def resumen(self) -> dict:
+        ordenadas = sorted(self.muestras)
+        buckets = [0] * (len(BUCKETS_MS) + 1)
+        for ms in ordenadas:
+            buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        etiquetas = [f'<={b}' for b in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}']
+        return {
+            'total': self.total,
+            'ventana': len(ordenadas),
+            'p50': percentil(ordenadas, 50),
+            'p95': percentil(ordenadas, 95),
+            'p99': percentil(ordenadas, 99),
+            'max': round(ordenadas[-1], 3) if ordenadas else None,
+            'buckets': dict(zip(etiquetas, buckets)),
+        }
+
+
+class RegistroLatencias:
+    """Histogramas por etapa (global) y por dispositivo/etapa, seguros entre hilos.
+
+    El id del dispositivo lo manda el cliente: solo los primeros `max_dispositivos`
+    tienen histograma y secuencia propios, el resto se agrupa en DISPOSITIVO_OTROS
+    (sin seguimiento de secuencia) para que la memoria no crezca sin límite.
+    """
+
+    def __init__(self, ventana: int = 500, max_dispositivos: int = MAX_DISPOSITIVOS):
+        self.ventana = ventana
+        self.max_dispositivos = max_dispositivos
+        self._lock = threading.Lock()
+        self._etapas: Dict[str, HistogramaLatencia] = {}
+        self._dispositivos: Dict[str, Dict[str, HistogramaLatencia]] = {}
+        self._secuencias: Dict[str, dict] = {}
+
+    def _histograma(self, tabla: Dict[str, HistogramaLatencia], etapa: str) -> HistogramaLatencia:
+        hist = tabla.get(etapa)
+        if hist is None:
+            hist = tabla[etapa] = HistogramaLatencia(self.ventana)
+        return hist
+
+    def registrar(self, dispositivo: str, etapas: Dict[str, float], secuencia: Optional[int] = None) -> None:
+        with self._lock:
+            if dispositivo not in self._dispositivos and len(self._dispositivos) >= self.max_dispositivos:
+                dispositivo, secuencia = DISPOSITIVO_OTROS, None
+            por_dispositivo = self._dispositivos.setdefault(dispositivo, {})
+            for etapa, ms in etapas.items():
+                self._histograma(self._etapas, etapa).registrar(ms)
+                self._histograma(por_dispositivo, etapa).registrar(ms)
+            if secuencia is not None:
+                # saltos = lecturas perdidas; una secuencia menor indica que el dispositivo se reinició
+                estado = self._secuencias.setdefault(
+                    dispositivo, {'ultima': None, 'saltos': 0, 'repetidas': 0, 'reinicios': 0}
+                )
+                ultima = estado['ultima']
+                if ultima is not None:
+                    if secuencia == ultima:
+                        estado['repetidas'] += 1
+                    elif secuencia < ultima:
+                        estado['reinicios'] += 1
+                    elif secuencia > ultima + 1:
+                        estado['saltos'] += secuencia - ultima - 1
+                estado['ultima'] = secuencia
+
+    def resumen(self, etapas: Optional[Iterable[str]] = None) -> dict:
+        with self._lock:
+            filtro = set(etapas) if etapas else None
+
+            def tabla(histogramas: Dict[str, HistogramaLatencia]) -> dict:
+                return {e: h.resumen() for e, h in histogramas.items() if filtro is None or e in filtro}
+
+            return {
+                'etapas': tabla(self._etapas),
+                'dispositivos': {
+                    d: dict(tabla(hs), secuencia=self._secuencias.get(d))
+                    for d, hs in self._dispositivos.items()
+                },
+            }
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._etapas.clear()
+            self._dispositivos.clear()
+            self._secuencias.clear()
+
+
+# Registro global del proceso
+latencias = RegistroLatencias()
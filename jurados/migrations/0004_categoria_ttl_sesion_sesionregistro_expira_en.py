@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:20
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Case, F, When
+
+
+def asignar_expiracion(apps, schema_editor):
+    # Las sesiones que ya estaban abiertas vencen según el TTL de su categoría (un solo UPDATE)
+    Categoria = apps.get_model('jurados', 'Categoria')
+    Robot = apps.get_model('jurados', 'Robot')
+    SesionRegistro = apps.get_model('jurados', 'SesionRegistro')
+    db = schema_editor.connection.alias
+    ttls = dict(Categoria.objects.using(db).filter(ttl_sesion__gt=0).values_list('id', 'ttl_sesion'))
+    if not ttls:
+        return
+    SesionRegistro.objects.using(db).filter(activa=True, robot__categoria_id__in=ttls).update(expira_en=Case(*[
+        When(robot_id__in=Robot.objects.using(db).filter(categoria_id=categoria_id).values('id'),
+             then=F('fecha_inicio') + timedelta(seconds=ttl))
+        for categoria_id, ttl in ttls.items()
+    ]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0003_alter_tournament_categoria_rallytriad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='ttl_sesion',
+            field=models.PositiveIntegerField(default=0, help_text='Segundos que una sesión de registro espera el tiempo antes de cerrarse (0 = sin vencimiento)'),
+        ),
+        migrations.AddField(
+            model_name='sesionregistro',
+            name='expira_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(asignar_expiracion, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0004_categoria_ttl_sesion_sesionregistro_expira_en'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='robot',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['categoria', 'nombre'], name='robot_activo_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sesionregistro',
+            index=models.Index(condition=models.Q(('activa', True)), fields=['robot', 'expira_en'], name='sesion_activa_robot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sesionregistro',
+            index=models.Index(condition=models.Q(('activa', True)), fields=['expira_en'], name='sesion_activa_expira_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiemporegistro',
+            index=models.Index(condition=models.Q(('valido', True)), fields=['robot', 'tiempo'], name='tiempo_robot_valido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tiemporegistro',
+            index=models.Index(fields=['robot', '-fecha_registro'], name='tiempo_robot_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tournament',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['categoria', '-fecha_creacion'], name='torneo_activo_cat_idx'),
+        ),
+    ]
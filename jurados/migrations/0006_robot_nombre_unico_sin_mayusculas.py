@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:22
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def renombrar_duplicados(apps, schema_editor):
+    # Antes se distinguían mayúsculas: "Robot1" y "robot1" podían convivir en una categoría.
+    # Se conserva el nombre del más antiguo y los demás pasan a "nombre (#id)" para que el
+    # índice único se pueda crear sin borrar ni fusionar robots con tiempos registrados.
+    Robot = apps.get_model('jurados', 'Robot')
+    db = schema_editor.connection.alias
+    vistos = set()
+    renombrados = []
+    for robot in Robot.objects.using(db).annotate(nombre_ci=Lower('nombre')).order_by('categoria_id', 'nombre_ci', 'id'):
+        clave = (robot.categoria_id, robot.nombre_ci)
+        if clave not in vistos:
+            vistos.add(clave)
+            continue
+        sufijo = f' (#{robot.id})'
+        robot.nombre = robot.nombre[:100 - len(sufijo)] + sufijo
+        renombrados.append(robot)
+    Robot.objects.using(db).bulk_update(renombrados, ['nombre'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0005_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='robot',
+            unique_together=set(),
+        ),
+        migrations.RunPython(renombrar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='robot',
+            constraint=models.UniqueConstraint(models.F('categoria'), django.db.models.functions.text.Lower('nombre'), name='robot_categoria_nombre_ci_uniq', violation_error_message='Ya existe un robot con ese nombre en la categoría.'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0006_robot_nombre_unico_sin_mayusculas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournamentmatch',
+            name='next_match',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='feeders', to='jurados.tournamentmatch'),
+        ),
+        migrations.AddField(
+            model_name='tournamentmatch',
+            name='next_slot',
+            field=models.CharField(blank=True, choices=[('a', 'A'), ('b', 'B')], max_length=1),
+        ),
+    ]
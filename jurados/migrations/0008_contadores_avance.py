@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:30
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _contar(queryset, campo_padre, **filtros):
+    return Coalesce(Subquery(
+        queryset.filter(**{campo_padre: OuterRef('pk')}, **filtros)
+        .order_by().values(campo_padre).annotate(n=Count('pk')).values('n'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def calcular_contadores(apps, schema_editor):
+    # Un UPDATE por tabla con subconsultas de conteo
+    Tournament = apps.get_model('jurados', 'Tournament')
+    FootballGroup = apps.get_model('jurados', 'FootballGroup')
+    FootballGroupMatch = apps.get_model('jurados', 'FootballGroupMatch')
+    RallyTriad = apps.get_model('jurados', 'RallyTriad')
+    db = schema_editor.connection.alias
+    FootballGroup.objects.using(db).update(
+        matches_total=_contar(FootballGroupMatch.objects.using(db), 'group'),
+        matches_pending=_contar(FootballGroupMatch.objects.using(db), 'group', played=False),
+    )
+    Tournament.objects.using(db).update(
+        group_matches_total=_contar(FootballGroupMatch.objects.using(db), 'group__tournament'),
+        group_matches_pending=_contar(FootballGroupMatch.objects.using(db), 'group__tournament', played=False),
+        triads_total=_contar(RallyTriad.objects.using(db), 'tournament'),
+        triads_pending=_contar(RallyTriad.objects.using(db), 'tournament', winner__isnull=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0007_tournamentmatch_next_match'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='footballgroup',
+            name='matches_pending',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='footballgroup',
+            name='matches_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='group_matches_pending',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='group_matches_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='triads_pending',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='triads_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0008_contadores_avance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatidoReplica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marca', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0009_latido_replica'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='tiemporegistro',
+            name='tiempo_robot_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='tiemporegistro',
+            index=models.Index(fields=['robot', '-fecha_registro', '-id'], name='tiempo_robot_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0010_historial_por_clave'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tiemporegistro',
+            index=models.Index(fields=['-fecha_registro', '-id'], name='tiempo_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0011_indices_admin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='footballgroupmatch',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rallytriad',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tournamentmatch',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
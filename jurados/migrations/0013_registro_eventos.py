@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:49
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0012_versiones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Evento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tipo', models.CharField(choices=[('sesion_inicio', 'Inicio de sesión de registro'), ('sesion_fin', 'Fin de sesión de registro'), ('tiempo', 'Tiempo registrado'), ('torneo_creado', 'Torneo creado'), ('ganador', 'Ganador de partido'), ('ganadores_ronda', 'Ganadores de una ronda'), ('triada', 'Ganador de triada'), ('resultados', 'Resultados de grupos'), ('llaves', 'Llaves generadas'), ('reinicio', 'Torneo reiniciado'), ('instantanea', 'Instantánea manual'), ('reconstruccion', 'Torneo reconstruido')], max_length=20)),
+                ('datos', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('robot', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='jurados.robot')),
+                ('torneo', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='jurados.tournament')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InstantaneaTorneo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('estado', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='jurados.evento')),
+                ('torneo', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='jurados.tournament')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['torneo', 'id'], name='evento_torneo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instantaneatorneo',
+            index=models.Index(fields=['torneo', '-evento'], name='instantanea_torneo_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:52
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jurados', '0013_registro_eventos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccionSincronizada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True)),
+                ('dispositivo', models.CharField(blank=True, max_length=64)),
+                ('tipo', models.CharField(max_length=20)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('resultado', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+        ),
+    ]
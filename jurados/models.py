@@ -1,4 +1,9 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Concat, Lower
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
@@ -16,6 +21,10 @@ class Categoria(models.Model):
     nombre = models.CharField(max_length=20, choices=CATEGORIAS_CHOICES, unique=True)
     descripcion = models.TextField(blank=True)
     activa = models.BooleanField(default=True)
+    ttl_sesion = models.PositiveIntegerField(
+        default=0,
+        help_text='Segundos que una sesión de registro espera el tiempo antes de cerrarse (0 = sin vencimiento)',
+    )
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -26,6 +35,28 @@ class Categoria(models.Model):
     def __str__(self):
         return self.get_nombre_display()
 
+class RobotQuerySet(models.QuerySet):
+    def por_nombre(self, categoria, nombre):
+        """Robot de la categoría con ese nombre sin distinguir mayúsculas (usa el índice único)."""
+        return self.alias(nombre_ci=Lower('nombre')).filter(categoria=categoria, nombre_ci=Lower(Value(nombre)))
+
+    def listado(self, categoria, prefijo=''):
+        """Robots activos de la categoría en orden alfabético, opcionalmente filtrados por prefijo.
+
+        El prefijo se busca como rango [prefijo, prefijo + U+10FFFF) sobre Lower('nombre'),
+        que el índice único recorre sin ordenar aparte (LIKE con ESCAPE no usa índices en SQLite).
+        """
+        qs = self.alias(nombre_ci=Lower('nombre')).filter(categoria=categoria, activo=True)
+        if prefijo:
+            inicio = Lower(Value(prefijo))
+            qs = qs.filter(nombre_ci__gte=inicio, nombre_ci__lt=Concat(inicio, Value('\U0010ffff')))
+        return qs.order_by('nombre_ci', 'id')
+
+    def con_mejor_tiempo(self):
+        """Anota `mejor` con el mejor tiempo válido (una subconsulta por robot sobre tiempo_robot_valido_idx)."""
+        mejor = TiempoRegistro.objects.filter(robot=OuterRef('pk'), valido=True).order_by('tiempo').values('tiempo')[:1]
+        return self.annotate(mejor=Subquery(mejor, output_field=TiempoRegistro._meta.get_field('tiempo')))
+
 class Robot(models.Model):
     """Modelo para los robots participantes"""
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='robots')
@@ -34,12 +65,25 @@ class Robot(models.Model):
     autor_secundario = models.CharField(max_length=100, blank=True, null=True)
     fecha_registro = models.DateTimeField(auto_now_add=True)
     activo = models.BooleanField(default=True)
+
+    objects = RobotQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Robot"
         verbose_name_plural = "Robots"
         ordering = ['nombre']
-        unique_together = ['categoria', 'nombre']
+        constraints = [
+            # Nombre único por categoría sin distinguir mayúsculas ("Flash" y "flash" chocan)
+            models.UniqueConstraint(
+                'categoria', Lower('nombre'),
+                name='robot_categoria_nombre_ci_uniq',
+                violation_error_message='Ya existe un robot con ese nombre en la categoría.',
+            ),
+        ]
+        indexes = [
+            # Robots activos de una categoría (listados y rankings)
+            models.Index(fields=['categoria', 'nombre'], condition=Q(activo=True), name='robot_activo_cat_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.categoria}"
@@ -49,29 +93,80 @@ class Robot(models.Model):
         mejor = self.tiempos.filter(valido=True).order_by('tiempo').first()
         return mejor.tiempo if mejor else None
 
+class SesionRegistroQuerySet(models.QuerySet):
+    def vigentes(self, ahora=None):
+        """Sesiones activas que aún no vencieron (las vencidas se ignoran aunque no se hayan cerrado)."""
+        ahora = ahora or timezone.now()
+        return self.filter(activa=True).filter(Q(expira_en__isnull=True) | Q(expira_en__gt=ahora))
+
+    def vencidas(self, ahora=None):
+        return self.filter(activa=True, expira_en__lte=ahora or timezone.now())
+
 class SesionRegistro(models.Model):
     """Modelo para controlar las sesiones de registro de tiempo"""
     robot = models.ForeignKey(Robot, on_delete=models.CASCADE, related_name='sesiones')
     activa = models.BooleanField(default=False)
     fecha_inicio = models.DateTimeField(auto_now_add=True)
     fecha_fin = models.DateTimeField(null=True, blank=True)
+    expira_en = models.DateTimeField(null=True, blank=True)
     usuario = models.CharField(max_length=100, default='Jurado')
+
+    objects = SesionRegistroQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Sesión de Registro"
         verbose_name_plural = "Sesiones de Registro"
         ordering = ['-fecha_inicio']
+        indexes = [
+            # Sesión activa por robot/categoría (ingesta ESP32) y cierre de vencidas
+            models.Index(fields=['robot', 'expira_en'], condition=Q(activa=True), name='sesion_activa_robot_idx'),
+            models.Index(fields=['expira_en'], condition=Q(activa=True), name='sesion_activa_expira_idx'),
+        ]
     
     def __str__(self):
         estado = "Activa" if self.activa else "Finalizada"
         return f"Sesión {self.robot.nombre} - {estado}"
     
+    @classmethod
+    def iniciar(cls, robot, ahora=None):
+        """Cierra las sesiones activas del robot y abre una nueva (vence según el TTL de su categoría)."""
+        ahora = ahora or timezone.now()
+        cls.objects.filter(robot=robot, activa=True).update(activa=False, fecha_fin=ahora)
+        return cls.objects.create(robot=robot, activa=True, expira_en=cls.calcular_expiracion(robot.categoria, ahora))
+
     def finalizar(self):
         """Finaliza la sesión de registro"""
         self.activa = False
         self.fecha_fin = timezone.now()
         self.save()
 
+    @staticmethod
+    def calcular_expiracion(categoria, inicio=None):
+        """Momento de vencimiento según el TTL de la categoría (None si no vence)."""
+        if not categoria.ttl_sesion:
+            return None
+        return (inicio or timezone.now()) + timedelta(seconds=categoria.ttl_sesion)
+
+    @classmethod
+    def cerrar_vencidas(cls, ahora=None) -> int:
+        """Cierra en un único UPDATE todas las sesiones vencidas; la fecha de fin es su vencimiento."""
+        return cls.objects.vencidas(ahora).update(activa=False, fecha_fin=F('expira_en'))
+
+class TiempoRegistroQuerySet(models.QuerySet):
+    def historial(self, robot, antes_de=None):
+        """Tiempos del robot del más reciente al más antiguo (orden estable por fecha_registro, id).
+
+        `antes_de` = (fecha_registro, id) del último tiempo ya mostrado: paginación por
+        clave, el costo de cada página no depende de cuántas hay antes.
+        """
+        qs = self.filter(robot=robot)
+        if antes_de is not None:
+            fecha, pk = antes_de
+            # fecha_registro <= fecha acota el recorrido del índice; el OR desempata por id
+            qs = qs.filter(Q(fecha_registro__lt=fecha) | Q(id__lt=pk), fecha_registro__lte=fecha)
+        return qs.order_by('-fecha_registro', '-id')
+
+
 class TiempoRegistro(models.Model):
     """Modelo para los tiempos registrados"""
     robot = models.ForeignKey(Robot, on_delete=models.CASCADE, related_name='tiempos')
@@ -84,11 +179,21 @@ class TiempoRegistro(models.Model):
     valido = models.BooleanField(default=True)
     observaciones = models.TextField(blank=True)
     sesion = models.ForeignKey(SesionRegistro, on_delete=models.SET_NULL, null=True, blank=True)
+
+    objects = TiempoRegistroQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Tiempo Registrado"
         verbose_name_plural = "Tiempos Registrados"
         ordering = ['-fecha_registro']
+        indexes = [
+            # Mejor tiempo válido por robot (Robot.mejor_tiempo y rankings)
+            models.Index(fields=['robot', 'tiempo'], condition=Q(valido=True), name='tiempo_robot_valido_idx'),
+            # Historial por robot del más reciente al más antiguo (robot_detalle, check_new_times)
+            models.Index(fields=['robot', '-fecha_registro', '-id'], name='tiempo_robot_fecha_idx'),
+            # Listado del admin y filtro por fecha sin robot (orden por defecto + pk; archivar)
+            models.Index(fields=['-fecha_registro', '-id'], name='tiempo_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.robot.nombre} - {self.tiempo}s"
@@ -111,13 +216,30 @@ class Tournament(models.Model):
     nombre = models.CharField(max_length=100, default='Torneo')
     activo = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Contadores de avance (mantenidos al escribir; evitan recorrer partidos/triadas)
+    group_matches_total = models.PositiveIntegerField(default=0)
+    group_matches_pending = models.PositiveIntegerField(default=0)
+    triads_total = models.PositiveIntegerField(default=0)
+    triads_pending = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Torneo activo más reciente por categoría
+            models.Index(fields=['categoria', '-fecha_creacion'], condition=Q(activo=True), name='torneo_activo_cat_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} ({self.get_categoria_display()})"
 
+    @property
+    def group_matches_played(self):
+        return self.group_matches_total - self.group_matches_pending
+
+    @property
+    def triads_decided(self):
+        return self.triads_total - self.triads_pending
+
 class TournamentParticipant(models.Model):
     tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='participants')
     nombre = models.CharField(max_length=100)
@@ -147,6 +269,11 @@ class TournamentMatch(models.Model):
     b = models.ForeignKey(TournamentParticipant, on_delete=models.SET_NULL, null=True, blank=True, related_name='match_as_b')
     winner = models.ForeignKey(TournamentParticipant, on_delete=models.SET_NULL, null=True, blank=True, related_name='match_wins')
     is_bye = models.BooleanField(default=False)
+    # Partido de la ronda siguiente al que pasa el ganador, y en qué lado ('a' o 'b')
+    next_match = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='feeders')
+    next_slot = models.CharField(max_length=1, blank=True, choices=[('a', 'A'), ('b', 'B')])
+    # Se incrementa en cada escritura: actualizaciones por comparación (ver services_torneo.VersionConflict)
+    version = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['id']
@@ -164,6 +291,7 @@ class RallyTriad(models.Model):
     b = models.ForeignKey(TournamentParticipant, on_delete=models.SET_NULL, null=True, blank=True, related_name='rally_triad_b')
     c = models.ForeignKey(TournamentParticipant, on_delete=models.SET_NULL, null=True, blank=True, related_name='rally_triad_c')
     winner = models.ForeignKey(TournamentParticipant, on_delete=models.SET_NULL, null=True, blank=True, related_name='rally_triad_winner')
+    version = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['index']
@@ -177,6 +305,8 @@ class FootballGroup(models.Model):
     tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='football_groups')
     codigo = models.CharField(max_length=2)  # A, B, C...
     completed = models.BooleanField(default=False)
+    matches_total = models.PositiveIntegerField(default=0)
+    matches_pending = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('tournament', 'codigo')
@@ -185,6 +315,10 @@ class FootballGroup(models.Model):
     def __str__(self):
         return f"Grupo {self.codigo}"
 
+    @property
+    def matches_played(self):
+        return self.matches_total - self.matches_pending
+
 class FootballTeam(models.Model):
     group = models.ForeignKey(FootballGroup, on_delete=models.CASCADE, related_name='teams')
     participant = models.ForeignKey(TournamentParticipant, on_delete=models.CASCADE)
@@ -211,10 +345,86 @@ class FootballGroupMatch(models.Model):
     goals_home = models.IntegerField(null=True, blank=True)
     goals_away = models.IntegerField(null=True, blank=True)
     played = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('group', 'home', 'away')
         ordering = ['id']
 
     def __str__(self):
-        return f"{self.home.participant.nombre} vs {self.away.participant.nombre}"
\ No newline at end of file
+        return f"{self.home.participant.nombre} vs {self.away.participant.nombre}"
+
+class LatidoReplica(models.Model):
+    """Fila única escrita en el primario; leída en la réplica indica hasta cuándo está al día."""
+    marca = models.DateTimeField()
+
+    def __str__(self):
+        return f"Latido {self.marca:%Y-%m-%d %H:%M:%S}"
+
+# =====================
+# Registro de eventos
+# =====================
+
+class Evento(models.Model):
+    """Acción de un jurado, en orden de llegada. Solo se agregan filas (ver jurados/eventos.py).
+
+    Los eventos de torneo guardan posiciones (ronda, partido, triada) y la semilla del
+    sorteo, así reproducirlos sobre una instantánea recrea el mismo estado.
+    """
+    TIPOS = [
+        ('sesion_inicio', 'Inicio de sesión de registro'),
+        ('sesion_fin', 'Fin de sesión de registro'),
+        ('tiempo', 'Tiempo registrado'),
+        ('torneo_creado', 'Torneo creado'),
+        ('ganador', 'Ganador de partido'),
+        ('ganadores_ronda', 'Ganadores de una ronda'),
+        ('triada', 'Ganador de triada'),
+        ('resultados', 'Resultados de grupos'),
+        ('llaves', 'Llaves generadas'),
+        ('reinicio', 'Torneo reiniciado'),
+        ('instantanea', 'Instantánea manual'),
+        ('reconstruccion', 'Torneo reconstruido'),
+    ]
+
+    fecha = models.DateTimeField(default=timezone.now)
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    # Sin restricción de clave foránea: el registro sobrevive al archivado de torneos y robots
+    torneo = models.ForeignKey(Tournament, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False, related_name='+')
+    robot = models.ForeignKey(Robot, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False, related_name='+')
+    datos = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Eventos de un torneo desde la última instantánea (reconstrucción y conteo)
+            models.Index(fields=['torneo', 'id'], name='evento_torneo_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.get_tipo_display()} ({self.fecha:%Y-%m-%d %H:%M:%S})"
+
+class InstantaneaTorneo(models.Model):
+    """Estado completo de un torneo justo después del evento `evento`."""
+    torneo = models.ForeignKey(Tournament, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='+')
+    fecha = models.DateTimeField(auto_now_add=True)
+    estado = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['torneo', '-evento'], name='instantanea_torneo_idx'),
+        ]
+
+    def __str__(self):
+        return f"Instantánea del torneo {self.torneo_id} tras el evento {self.evento_id}"
+
+class AccionSincronizada(models.Model):
+    """Acción de la cola de un cliente ya procesada: reenviar la misma clave devuelve este resultado."""
+    clave = models.CharField(max_length=64, unique=True)
+    dispositivo = models.CharField(max_length=64, blank=True)
+    tipo = models.CharField(max_length=20)
+    fecha = models.DateTimeField(auto_now_add=True)
+    resultado = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    def __str__(self):
+        return f"{self.clave} ({self.tipo})"
@@ -0,0 +1,131 @@
+"""Caché en memoria del proceso para categorías y torneo activo por categoría.
+
+Casi todas las vistas empiezan buscando la categoría por nombre o el torneo activo
+de una categoría. Aquí se guardan los valores de esas filas y cada llamada arma una
+instancia nueva, así quien la modifique no afecta a las demás peticiones.
+
+Se invalida con post_save/post_delete de Categoria y Tournament (ahora y al
+confirmar la transacción) y desde services_torneo.deactivate_tournaments, que
+desactiva con un UPDATE en bloque sin señales. Las entradas vencen a los
+settings.REFERENCIAS_TTL segundos, lo que acota lo que tarda en verse un cambio
+hecho desde otro proceso.
+
+Dentro de una transacción y al leer el archivo no se usa la caché: se consulta
+como siempre. Las cargas van al primario aunque la vista lea de la réplica.
+
+Del torneo se guardan solo las columnas que no cambian al jugar; los contadores de
+avance quedan diferidos y se leen de la base si se usan.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import Http404
+
+from . import archivo
+from .models import Categoria, Tournament
+
+CAMPOS_CATEGORIA = tuple(f.attname for f in Categoria._meta.concrete_fields)
+CAMPOS_TORNEO = ('id', 'categoria', 'nombre', 'activo', 'fecha_creacion')
+
+_lock = threading.Lock()
+_categorias: Dict[str, tuple] = {}
+_torneos: Dict[str, tuple] = {}
+# Cambia en cada invalidación: una carga que empezó antes no se guarda
+_generacion = 0
+
+
+def invalidar() -> None:
+    global _generacion
+    with _lock:
+        _generacion += 1
+        _categorias.clear()
+        _torneos.clear()
+
+
+def invalidar_al_confirmar(using: str = 'default') -> None:
+    """Invalida ahora (esta petición) y al confirmar (lo que otras cargaron mientras tanto)."""
+    invalidar()
+    transaction.on_commit(invalidar, using=using)
+
+
+def al_cambiar(sender, using='default', **kwargs) -> None:
+    """Receptor de post_save/post_delete de Categoria y Tournament (conectado en apps.py)."""
+    invalidar_al_confirmar(using)
+
+
+def _usable() -> bool:
+    return not archivo.leyendo() and not connections['default'].in_atomic_block
+
+
+def _cargar(cache: Dict[str, tuple], claves: Iterable[str], consulta: Callable[[list], Dict[str, Optional[tuple]]]) -> Dict[str, Optional[tuple]]:
+    """Valores en caché de `claves`; las que faltan o vencieron se cargan con una sola consulta."""
+    ahora = time.monotonic()
+    encontrados, faltantes = {}, []
+    with _lock:
+        generacion = _generacion
+        for clave in claves:
+            entrada = cache.get(clave)
+            if entrada is not None and entrada[0] > ahora:
+                encontrados[clave] = entrada[1]
+            else:
+                faltantes.append(clave)
+    if faltantes:
+        cargados = consulta(faltantes)
+        vence = ahora + settings.REFERENCIAS_TTL
+        with _lock:
+            for clave in faltantes:
+                encontrados[clave] = cargados.get(clave)
+                if generacion == _generacion:
+                    cache[clave] = (vence, encontrados[clave])
+    return encontrados
+
+
+def _consultar_categorias(nombres: list) -> Dict[str, tuple]:
+    filas = Categoria.objects.using('default').filter(nombre__in=nombres).values_list(*CAMPOS_CATEGORIA)
+    indice = CAMPOS_CATEGORIA.index('nombre')
+    return {fila[indice]: fila for fila in filas}
+
+
+def _consultar_torneos(categorias: list) -> Dict[str, tuple]:
+    activos: Dict[str, tuple] = {}
+    filas = (
+        Tournament.objects.using('default').filter(categoria__in=categorias, activo=True)
+        .order_by('-fecha_creacion').values_list(*CAMPOS_TORNEO)
+    )
+    for fila in filas:
+        activos.setdefault(fila[1], fila)
+    return activos
+
+
+def categoria(nombre: str) -> Optional[Categoria]:
+    """Categoría por nombre (None si no existe)."""
+    if not _usable():
+        return Categoria.objects.filter(nombre=nombre).first()
+    valores = _cargar(_categorias, [nombre], _consultar_categorias)[nombre]
+    return None if valores is None else Categoria.from_db('default', CAMPOS_CATEGORIA, valores)
+
+
+def categoria_o_404(nombre: str) -> Categoria:
+    encontrada = categoria(nombre)
+    if encontrada is None:
+        raise Http404('No existe la categoría.')
+    return encontrada
+
+
+def torneos_activos(categorias: Iterable[str]) -> Dict[str, Optional[Tournament]]:
+    """Torneo activo más reciente de cada categoría (None si no hay)."""
+    categorias = list(categorias)
+    if not _usable():
+        activos = {}
+        for torneo in Tournament.objects.filter(categoria__in=categorias, activo=True).order_by('-fecha_creacion'):
+            activos.setdefault(torneo.categoria, torneo)
+        return {c: activos.get(c) for c in categorias}
+    valores = _cargar(_torneos, categorias, _consultar_torneos)
+    return {c: None if valores[c] is None else Tournament.from_db('default', CAMPOS_TORNEO, valores[c]) for c in categorias}
+
+
+def torneo_activo(categoria: str) -> Optional[Tournament]:
+    return torneos_activos([categoria])[categoria]
@@ -0,0 +1,207 @@
+"""Réplica de solo lectura opcional para tableros y vistas públicas.
+
+Si settings.DATABASES tiene el alias settings.REPLICA_DB_ALIAS, las vistas
+marcadas con @vista_de_lectura leen los modelos de jurados desde la réplica
+mientras su atraso no supere settings.REPLICA_MAX_LAG. Todo lo demás (escrituras,
+vistas de jurados, sesiones) sigue en 'default'.
+
+El atraso se mide con LatidoReplica. Si la réplica es una copia SQLite
+(METAROBOTS_REPLICA_PATH), refrescar() la copia con la API de backup en línea solo
+cuando el archivo del primario o su WAL cambiaron desde la última copia, y escribe
+el latido en la propia réplica: el primario no recibe escrituras ni se relee
+entero si no hubo cambios. Para réplicas gestionadas por el motor de base de datos
+el latido se escribe en el primario (lo trae la replicación), como mucho cada
+REPLICA_MAX_LAG / 2 segundos.
+
+Lectura de lo propio: tras una petición que escribe se guarda una cookie con la
+hora; ese navegador lee del primario hasta que la réplica la haya alcanzado.
+"""
+import contextvars
+import os
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from typing import Optional
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+COOKIE_ESCRITURA = 'mr_escritura'
+_usar_replica = contextvars.ContextVar('usar_replica', default=False)
+
+# El atraso se consulta como mucho una vez por segundo por proceso
+_cache_lock = threading.Lock()
+_cache = {'consultado': 0.0, 'marca': None}
+# Firma del primario en la última copia y momento del último latido escrito en el primario
+_ultimo = {'firma': None, 'latido': None}
+
+
+def alias() -> str:
+    return getattr(settings, 'REPLICA_DB_ALIAS', 'replica')
+
+
+def configurada() -> bool:
+    return alias() in connections.databases
+
+
+def es_copia_sqlite() -> bool:
+    return configurada() and connections.databases[alias()]['ENGINE'] == 'django.db.backends.sqlite3'
+
+
+def marca_replica(refrescar_cache: bool = False) -> Optional[datetime]:
+    """Hora del primario hasta la que la réplica está al día (None si no se puede saber)."""
+    if not configurada():
+        return None
+    from .models import LatidoReplica
+
+    ahora = time.monotonic()
+    with _cache_lock:
+        if not refrescar_cache and ahora - _cache['consultado'] < 1.0:
+            return _cache['marca']
+    try:
+        marca = LatidoReplica.objects.using(alias()).filter(pk=1).values_list('marca', flat=True).first()
+    except DatabaseError:
+        marca = None
+    with _cache_lock:
+        _cache.update(consultado=ahora, marca=marca)
+    return marca
+
+
+def atraso() -> Optional[float]:
+    """Segundos de atraso de la réplica respecto al primario."""
+    marca = marca_replica()
+    if marca is None:
+        return None
+    return max(0.0, (timezone.now() - marca).total_seconds())
+
+
+def puede_leer_replica(request) -> bool:
+    marca = marca_replica()
+    if marca is None:
+        return False
+    if (timezone.now() - marca).total_seconds() > settings.REPLICA_MAX_LAG:
+        return False
+    escritura = request.COOKIES.get(COOKIE_ESCRITURA)
+    if escritura:
+        try:
+            return marca.timestamp() >= float(escritura)
+        except ValueError:
+            return False
+    return True
+
+
+def vista_de_lectura(view):
+    """Marca una vista GET de solo lectura: sus consultas pueden ir a la réplica."""
+    @wraps(view)
+    def envoltura(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not configurada() or not puede_leer_replica(request):
+            return view(request, *args, **kwargs)
+        token = _usar_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _usar_replica.reset(token)
+    return envoltura
+
+
+def usando_replica() -> bool:
+    return _usar_replica.get()
+
+
+class ReplicaRouter:
+    """Envía a la réplica solo las lecturas de jurados hechas dentro de @vista_de_lectura."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'jurados' and _usar_replica.get():
+            return alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {'default', alias()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por la copia (o por la replicación del motor)
+        if db == alias():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Tras una petición que escribe, fija la cookie de lectura de lo propio."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and configurada() and response.status_code < 400:
+            response.set_cookie(
+                COOKIE_ESCRITURA, f'{time.time():.3f}',
+                max_age=int(settings.REPLICA_MAX_LAG) + 1, samesite='Lax', httponly=True,
+            )
+        return response
+
+
+def _firma_primario() -> tuple:
+    """(mtime, tamaño) del archivo del primario y de su WAL: cambia con cada escritura confirmada."""
+    nombre = str(connections.databases['default']['NAME'])
+    firma = []
+    for ruta in (nombre, nombre + '-wal'):
+        try:
+            info = os.stat(ruta)
+        except OSError:
+            firma.append(None)
+        else:
+            firma.append((info.st_mtime_ns, info.st_size))
+    return tuple(firma)
+
+
+def _escribir_latido(using: str, marca: datetime) -> None:
+    from .models import LatidoReplica
+
+    LatidoReplica.objects.using(using).update_or_create(pk=1, defaults={'marca': marca})
+
+
+def refrescar(paginas: int = -1, pausa: float = 0.0, forzar: bool = False) -> Optional[float]:
+    """Actualiza la réplica y su latido. Devuelve los segundos de copia (None si no se copió)."""
+    from .db_sqlite import copiar_en_linea
+
+    if not configurada():
+        return None
+    ahora = timezone.now()
+    duracion = None
+    if es_copia_sqlite():
+        # La firma se toma antes de copiar: lo que se escriba durante la copia fuerza la siguiente
+        firma = _firma_primario()
+        if forzar or firma != _ultimo['firma']:
+            inicio = time.perf_counter()
+            copiar_en_linea(
+                connections.databases['default']['NAME'], connections.databases[alias()]['NAME'],
+                paginas=paginas, pausa=pausa,
+            )
+            duracion = time.perf_counter() - inicio
+            _ultimo['firma'] = firma
+        _escribir_latido(alias(), ahora)
+    elif forzar or _ultimo['latido'] is None or time.monotonic() - _ultimo['latido'] >= settings.REPLICA_MAX_LAG / 2:
+        _escribir_latido('default', ahora)
+        _ultimo['latido'] = time.monotonic()
+    marca_replica(refrescar_cache=True)
+    return duracion
+
+
+def estado() -> dict:
+    return {
+        'configurada': configurada(),
+        'alias': alias(),
+        'copia_sqlite': es_copia_sqlite(),
+        'atraso_segundos': None if atraso() is None else round(atraso(), 3),
+        'max_atraso_segundos': settings.REPLICA_MAX_LAG,
+    }
@@ -0,0 +1,159 @@
+"""Respaldos en línea de la base SQLite mientras el evento sigue corriendo.
+
+La copia usa la API de backup por tramos (db_sqlite.copiar_en_linea), se escribe
+en un archivo '.parcial', se verifica con PRAGMA integrity_check y solo entonces
+se renombra a db-AAAAMMDD-HHMMSS.sqlite3. Se conservan los últimos N respaldos.
+
+Con journal_mode=WAL la copia es un lector más y no hace esperar a los jurados.
+Sin WAL cada tramo retiene el lock compartido y un COMMIT espera como máximo lo
+que dura el tramo más largo (max_paso_ms).
+
+Mientras corre la copia, una sonda liviana (cada settings.RESPALDOS_SONDA
+segundos) toma el lock de escritura con BEGIN IMMEDIATE y lo suelta con ROLLBACK:
+mide cuánto espera un escritor por el lock, es decir la contención entre
+escritores (los jurados) durante el respaldo, no una espera causada por la copia.
+La sonda no modifica la base, así que no reinicia la copia.
+"""
+import glob
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .db_sqlite import DemasiadosReinicios, copiar_en_linea
+
+PATRON = 'db-*.sqlite3'
+# La sonda compite con los jurados por el lock de escritura: no más de 10 veces por segundo
+SONDA_MIN = 0.1
+
+
+class RespaldoInvalido(Exception):
+    """El respaldo no pasó PRAGMA integrity_check."""
+
+
+def rotar(directorio: str, conservar: int) -> List[str]:
+    """Borra los respaldos más antiguos y deja los `conservar` más recientes."""
+    archivos = sorted(glob.glob(os.path.join(directorio, PATRON)))
+    viejos = archivos[:-conservar] if conservar > 0 else []
+    for ruta in viejos:
+        os.remove(ruta)
+    return viejos
+
+
+class Sonda(threading.Thread):
+    """Mide cada `intervalo` segundos (mínimo SONDA_MIN) la espera por el lock de escritura."""
+
+    def __init__(self, ruta: str, intervalo: float = 0.1):
+        super().__init__(name='metarobots-sonda-respaldo', daemon=True)
+        self.ruta = ruta
+        self.intervalo = max(intervalo, SONDA_MIN)
+        self.detener = threading.Event()
+        self.mediciones = 0
+        self.fallidas = 0
+        self.max_ms = 0.0
+
+    def run(self):
+        conn = sqlite3.connect(self.ruta, timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        try:
+            while not self.detener.is_set():
+                inicio = time.perf_counter()
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.execute('ROLLBACK')
+                except sqlite3.OperationalError:
+                    # "database is locked": el escritor habría esperado todo el busy timeout
+                    self.fallidas += 1
+                self.max_ms = max(self.max_ms, (time.perf_counter() - inicio) * 1000)
+                self.mediciones += 1
+                self.detener.wait(self.intervalo)
+        finally:
+            conn.close()
+
+    def terminar(self) -> None:
+        self.detener.set()
+        if self.ident is not None:
+            self.join()
+
+
+def _journal_mode(ruta: str) -> str:
+    conn = sqlite3.connect(ruta)
+    try:
+        return conn.execute('PRAGMA journal_mode').fetchone()[0].lower()
+    finally:
+        conn.close()
+
+
+def _verificar(ruta: str) -> None:
+    conn = sqlite3.connect(ruta)
+    try:
+        # El respaldo queda como archivo único (sin -wal/-shm)
+        conn.execute('PRAGMA journal_mode = DELETE')
+        resultado = [fila[0] for fila in conn.execute('PRAGMA integrity_check')]
+    finally:
+        conn.close()
+    if resultado != ['ok']:
+        raise RespaldoInvalido('; '.join(resultado[:5]))
+
+
+def respaldar(directorio: Optional[str] = None, paginas: Optional[int] = None, pausa: Optional[float] = None,
+              conservar: Optional[int] = None, max_reinicios: Optional[int] = None,
+              intervalo_sonda: Optional[float] = None) -> dict:
+    """Hace un respaldo verificado de la base 'default' y rota los anteriores.
+
+    `intervalo_sonda` (por defecto settings.RESPALDOS_SONDA) en 0 desactiva la sonda.
+    """
+    directorio = str(directorio or settings.RESPALDOS_DIR)
+    paginas = settings.RESPALDOS_PAGINAS if paginas is None else paginas
+    pausa = settings.RESPALDOS_PAUSA if pausa is None else pausa
+    conservar = settings.RESPALDOS_CONSERVAR if conservar is None else conservar
+    max_reinicios = settings.RESPALDOS_MAX_REINICIOS if max_reinicios is None else max_reinicios
+    intervalo_sonda = settings.RESPALDOS_SONDA if intervalo_sonda is None else intervalo_sonda
+
+    origen = str(connections['default'].settings_dict['NAME'])
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f'db-{timezone.localtime():%Y%m%d-%H%M%S}.sqlite3')
+    parcial = ruta + '.parcial'
+
+    inicio = time.perf_counter()
+    sonda = Sonda(origen, intervalo_sonda)
+    if intervalo_sonda > 0:
+        sonda.start()
+    try:
+        try:
+            try:
+                estado = copiar_en_linea(origen, parcial, paginas=paginas, pausa=pausa, max_reinicios=max_reinicios)
+                un_solo_paso = False
+            except DemasiadosReinicios:
+                # Demasiadas escrituras para copiar por tramos: una sola pasada con el origen en lectura
+                estado = copiar_en_linea(origen, parcial)
+                un_solo_paso = True
+        finally:
+            sonda.terminar()
+        _verificar(parcial)
+    except BaseException:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        raise
+    os.replace(parcial, ruta)
+    duracion = time.perf_counter() - inicio
+
+    return {
+        'archivo': ruta,
+        'bytes': os.path.getsize(ruta),
+        'duracion_s': round(duracion, 3),
+        'pasos': estado['pasos'],
+        'paginas': estado['paginas'],
+        'reinicios': estado['reinicios'],
+        'un_solo_paso': un_solo_paso,
+        'max_paso_ms': estado['max_paso_ms'],
+        'journal_mode_wal': _journal_mode(origen) == 'wal',
+        'max_espera_lock_escritura_ms': round(sonda.max_ms, 3),
+        'mediciones_sonda': sonda.mediciones,
+        'esperas_agotadas': sonda.fallidas,
+        'eliminados': rotar(directorio, conservar),
+    }
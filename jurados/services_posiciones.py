@@ -0,0 +1,178 @@
+"""Tabla de posiciones de la fase de grupos calculada desde los partidos.
+
+Los contadores de FootballTeam (pj, g, e, p, gf, gc, dg, pts) son una caché que
+mantiene record_group_result. Aquí se recalculan desde FootballGroupMatch con una
+sola consulta agregada para todos los grupos, y los empates se desempatan con el
+resultado directo entre los equipos igualados (matriz en memoria).
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+
+from .models import FootballGroup, FootballGroupMatch, FootballTeam, TournamentParticipant
+
+STANDING_FIELDS = ('pj', 'g', 'e', 'p', 'gf', 'gc', 'dg', 'pts')
+
+
+class Standing:
+    __slots__ = ('team_id', 'group_id', 'participant_id', 'nombre') + STANDING_FIELDS
+
+    def __init__(self, team_id: int, group_id: int, participant_id: int, nombre: str,
+                 pj: int, g: int, e: int, p: int, gf: int, gc: int):
+        self.team_id = team_id
+        self.group_id = group_id
+        self.participant_id = participant_id
+        self.nombre = nombre
+        self.pj, self.g, self.e, self.p, self.gf, self.gc = pj, g, e, p, gf, gc
+        self.dg = gf - gc
+        self.pts = 3 * g + e
+
+    def counters(self) -> Dict[str, int]:
+        return {f: getattr(self, f) for f in STANDING_FIELDS}
+
+    def __repr__(self) -> str:
+        return f'Standing({self.nombre!r}, pts={self.pts}, dg={self.dg})'
+
+
+def _in(column: str, ids: List[int]) -> str:
+    return f"{column} IN ({', '.join(['%s'] * len(ids))})"
+
+
+def _standings_sql(tournament_ids: Optional[List[int]], group_ids: Optional[List[int]] = None) -> Tuple[str, list]:
+    qn = connection.ops.quote_name
+    team = qn(FootballTeam._meta.db_table)
+    group = qn(FootballGroup._meta.db_table)
+    participant = qn(TournamentParticipant._meta.db_table)
+    match = qn(FootballGroupMatch._meta.db_table)
+    played = 'played = %s AND goals_home IS NOT NULL AND goals_away IS NOT NULL'
+    played_params: list = [True]
+    if group_ids is not None:
+        played += ' AND ' + _in('group_id', group_ids)
+        played_params += group_ids
+    sql = f"""
+        SELECT t.id, t.group_id, t.participant_id, p.nombre,
+               COUNT(r.team_id),
+               COALESCE(SUM(CASE WHEN r.gf > r.gc THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN r.gf = r.gc THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN r.gf < r.gc THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(r.gf), 0),
+               COALESCE(SUM(r.gc), 0)
+        FROM {team} t
+        INNER JOIN {group} g ON g.id = t.group_id
+        INNER JOIN {participant} p ON p.id = t.participant_id
+        LEFT JOIN (
+            SELECT home_id AS team_id, goals_home AS gf, goals_away AS gc FROM {match} WHERE {played}
+            UNION ALL
+            SELECT away_id AS team_id, goals_away AS gf, goals_home AS gc FROM {match} WHERE {played}
+        ) r ON r.team_id = t.id
+    """
+    params: list = played_params * 2
+    where = []
+    if tournament_ids is not None:
+        where.append(_in('g.tournament_id', tournament_ids))
+        params += list(tournament_ids)
+    if group_ids is not None:
+        where.append(_in('t.group_id', group_ids))
+        params += group_ids
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' GROUP BY t.id, t.group_id, t.participant_id, p.nombre'
+    return sql, params
+
+
+def compute_standings(tournament_ids: Optional[Iterable[int]] = None,
+                      group_ids: Optional[Iterable[int]] = None) -> Dict[int, Standing]:
+    """Contadores de cada equipo (por id de FootballTeam) en una sola consulta agregada.
+
+    Sin `tournament_ids` ni `group_ids` calcula todos los torneos.
+    """
+    ids = None if tournament_ids is None else list(tournament_ids)
+    groups = None if group_ids is None else list(group_ids)
+    if ids == [] or groups == []:
+        return {}
+    sql, params = _standings_sql(ids, groups)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0]: Standing(*row) for row in cursor.fetchall()}
+
+
+def _head_to_head(tournament_ids: Optional[List[int]], group_ids: Optional[List[int]] = None) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    """Matriz (equipo, rival) -> (goles a favor, goles en contra) de los partidos jugados."""
+    matches = FootballGroupMatch.objects.filter(played=True, goals_home__isnull=False, goals_away__isnull=False)
+    if tournament_ids is not None:
+        matches = matches.filter(group__tournament_id__in=tournament_ids)
+    if group_ids is not None:
+        matches = matches.filter(group_id__in=group_ids)
+    matrix: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    for home, away, gh, ga in matches.values_list('home_id', 'away_id', 'goals_home', 'goals_away'):
+        matrix[(home, away)] = (gh, ga)
+        matrix[(away, home)] = (ga, gh)
+    return matrix
+
+
+def _h2h_key(team_id: int, tied: List[int], matrix) -> Tuple[int, int, int]:
+    pts = dg = gf = 0
+    for rival in tied:
+        result = matrix.get((team_id, rival))
+        if rival == team_id or result is None:
+            continue
+        scored, conceded = result
+        pts += 3 if scored > conceded else int(scored == conceded)
+        dg += scored - conceded
+        gf += scored
+    return (-pts, -dg, -gf)
+
+
+def sort_group(rows: List[Standing], matrix) -> List[Standing]:
+    """Ordena por pts, dg, gf; los empates en esos tres se resuelven por resultado directo y luego nombre."""
+    rows = sorted(rows, key=lambda s: (-s.pts, -s.dg, -s.gf))
+    ordered: List[Standing] = []
+    i = 0
+    while i < len(rows):
+        j = i
+        while j < len(rows) and (rows[j].pts, rows[j].dg, rows[j].gf) == (rows[i].pts, rows[i].dg, rows[i].gf):
+            j += 1
+        tied = rows[i:j]
+        if len(tied) > 1:
+            ids = [s.team_id for s in tied]
+            tied.sort(key=lambda s: (_h2h_key(s.team_id, ids, matrix), s.nombre))
+        ordered += tied
+        i = j
+    return ordered
+
+
+def group_tables(tournament_ids: Optional[Iterable[int]] = None,
+                 group_ids: Optional[Iterable[int]] = None) -> Dict[int, List[Standing]]:
+    """Tabla ordenada de cada grupo (por id de FootballGroup): dos consultas en total.
+
+    `group_ids` limita el cálculo a esos grupos (p. ej. la tabla de un solo grupo).
+    """
+    ids = None if tournament_ids is None else list(tournament_ids)
+    groups = None if group_ids is None else list(group_ids)
+    standings = compute_standings(ids, groups)
+    matrix = _head_to_head(ids, groups)
+    by_group: Dict[int, List[Standing]] = {}
+    for s in standings.values():
+        by_group.setdefault(s.group_id, []).append(s)
+    return {group_id: sort_group(rows, matrix) for group_id, rows in by_group.items()}
+
+
+def find_mismatches(standings: Dict[int, Standing], tournament_ids: Optional[Iterable[int]] = None) -> List[Tuple[Standing, Dict[str, int]]]:
+    """Equipos cuyos contadores guardados difieren de los calculados (con los valores guardados)."""
+    mismatches = []
+    stored = FootballTeam.objects.all()
+    if tournament_ids is not None:
+        stored = stored.filter(group__tournament_id__in=list(tournament_ids))
+    for row in stored.values_list('pk', *STANDING_FIELDS).iterator(chunk_size=2000):
+        current = dict(zip(STANDING_FIELDS, row[1:]))
+        expected = standings.get(row[0])
+        if expected is not None and current != expected.counters():
+            mismatches.append((expected, current))
+    return mismatches
+
+
+def repair_counters(standings: Iterable[Standing], batch_size: int = 500) -> int:
+    """Sobrescribe los contadores con los valores calculados en lotes de bulk_update."""
+    teams = [FootballTeam(pk=s.team_id, **s.counters()) for s in standings]
+    FootballTeam.objects.bulk_update(teams, list(STANDING_FIELDS), batch_size=batch_size)
+    return len(teams)
@@ -1,6 +1,12 @@
 import random
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+
+from . import eventos, referencias
+from .bracket import Bracket, BracketMatch, BracketRound, get_round_name  # noqa: F401
+from .services_posiciones import STANDING_FIELDS, Standing, group_tables
 from .models import (
     Tournament,
     TournamentParticipant,
@@ -13,279 +19,488 @@ from .models import (
 )
 
 
-def shuffle_participants(participants: List[TournamentParticipant]) -> List[TournamentParticipant]:
-    shuffled = list(participants)
-    random.shuffle(shuffled)
-    return shuffled
+class VersionConflict(Exception):
+    """Otro jurado modificó la fila desde que se leyó: la escritura por comparación no se aplicó."""
 
+    # Campos que se devuelven como estado actual al informar el conflicto
+    STATE_FIELDS = {
+        'TournamentMatch': ('id', 'a_id', 'b_id', 'winner_id', 'version'),
+        'RallyTriad': ('id', 'a_id', 'b_id', 'c_id', 'winner_id', 'version'),
+        'FootballGroupMatch': ('id', 'goals_home', 'goals_away', 'played', 'version'),
+    }
 
-def get_round_name(total_participants: int, round_index: int) -> str:
-    rounds: List[str] = []
-    participants = total_participants
-    while participants > 2:
-        if participants <= 32 and participants > 16:
-            rounds.append('Dieciseisavos')
-        elif participants <= 16 and participants > 8:
-            rounds.append('Octavos')
-        elif participants <= 8 and participants > 4:
-            rounds.append('Cuartos')
-        elif participants <= 4 and participants > 2:
-            rounds.append('Semifinales')
-        else:
-            rounds.append(f'Ronda {len(rounds) + 1}')
-        participants = (participants + 1) // 2
-    return rounds[round_index] if round_index < len(rounds) else f'Ronda {round_index + 1}'
+    def __init__(self, model, pk: int):
+        super().__init__(f'{model.__name__} {pk}: versión desactualizada')
+        self.model = model
+        self.pk = pk
 
+    def current(self) -> Optional[dict]:
+        """Estado guardado de la fila (leer fuera de la transacción que falló)."""
+        return self.model.objects.filter(pk=self.pk).values(*self.STATE_FIELDS[self.model.__name__]).first()
 
-def create_initial_round(tournament: Tournament) -> TournamentRound:
-    participants = [p for p in tournament.participants.all()]
-    shuffled = shuffle_participants(participants)
-    matches: List[Tuple[Optional[TournamentParticipant], Optional[TournamentParticipant], bool]] = []
-
-    # BYE en caso de impar
-    if len(shuffled) % 2 == 1:
-        bye = shuffled.pop()
-        matches.append((bye, None, True))
-
-    for i in range(0, len(shuffled), 2):
-        a = shuffled[i]
-        b = shuffled[i + 1]
-        matches.append((a, b, False))
-
-    round_obj = TournamentRound.objects.create(
-        tournament=tournament,
-        index=0,
-        nombre=get_round_name(len(participants), 0),
-        completed=False,
-    )
-    for a, b, is_bye in matches:
-        match = TournamentMatch.objects.create(
-            round=round_obj,
-            a=a if a else None,
-            b=b if b else None,
-            is_bye=is_bye,
-        )
-        if is_bye and a:
-            match.winner = a
-            match.save()
-    return round_obj
 
+def shuffle_participants(participants: List[TournamentParticipant]) -> List[TournamentParticipant]:
+    shuffled = list(participants)
+    random.shuffle(shuffled)
+    return shuffled
 
-def create_initial_round_with_participants(tournament: Tournament, participants: List[TournamentParticipant]) -> TournamentRound:
-    shuffled = shuffle_participants(participants)
-    pairs: List[Tuple[Optional[TournamentParticipant], Optional[TournamentParticipant], bool]] = []
 
-    if len(shuffled) % 2 == 1:
-        bye = shuffled.pop()
-        pairs.append((bye, None, True))
+@transaction.atomic
+def deactivate_tournaments(categoria: str) -> List[int]:
+    """Desactiva los torneos activos de la categoría con un UPDATE y registra el reinicio de cada uno."""
+    ids = list(Tournament.objects.filter(categoria=categoria, activo=True).values_list('pk', flat=True))
+    if ids:
+        Tournament.objects.filter(pk__in=ids).update(activo=False)
+        referencias.invalidar_al_confirmar()
+    for pk in ids:
+        eventos.registrar('reinicio', pk)
+    return ids
 
-    for i in range(0, len(shuffled), 2):
-        pairs.append((shuffled[i], shuffled[i + 1], False))
 
-    round_obj = TournamentRound.objects.create(
-        tournament=tournament,
-        index=0,
-        nombre=get_round_name(len(participants), 0),
-        completed=False,
+# =========================
+# Adaptador motor de llaves <-> BD
+# =========================
+
+def _snapshot(bracket: Bracket) -> Dict[str, dict]:
+    """Estado persistido de cada ronda/partido, con los enlaces traducidos a pks."""
+    rounds = {r.pk: (r.nombre, r.completed) for r in bracket.rounds if r.pk}
+    matches = {}
+    for ri, r in enumerate(bracket.rounds):
+        for m in r.matches:
+            if m.pk:
+                matches[m.pk] = _match_row(bracket, ri, m)
+    return {'rounds': rounds, 'matches': matches}
+
+
+def _match_row(bracket: Bracket, round_index: int, m: BracketMatch) -> tuple:
+    next_pk = None
+    if m.next_match is not None and round_index + 1 < len(bracket.rounds):
+        next_pk = bracket.rounds[round_index + 1].matches[m.next_match].pk
+    return (m.a, m.b, m.winner, m.is_bye, next_pk, m.next_slot or '')
+
+
+def load_bracket(tournament: Tournament) -> Bracket:
+    """Carga las llaves del torneo en el motor (dos consultas)."""
+    rounds = [
+        BracketRound(index, nombre, completed=completed, pk=pk)
+        for pk, index, nombre, completed in tournament.rounds.order_by('index').values_list('id', 'index', 'nombre', 'completed')
+    ]
+    by_pk = {r.pk: r for r in rounds}
+    position: Dict[int, Tuple[BracketRound, int]] = {}
+    links = []
+    versions: Dict[int, int] = {}
+    rows = (
+        TournamentMatch.objects.filter(round__tournament=tournament)
+        .order_by('round__index', 'id')
+        .values_list('id', 'round_id', 'a_id', 'b_id', 'winner_id', 'is_bye', 'next_match_id', 'next_slot', 'version')
     )
-    for a, b, is_bye in pairs:
-        match = TournamentMatch.objects.create(round=round_obj, a=a if a else None, b=b if b else None, is_bye=is_bye)
-        if is_bye and a:
-            match.winner = a
-            match.save()
-    return round_obj
+    for pk, round_id, a, b, winner, is_bye, next_pk, next_slot, version in rows:
+        versions[pk] = version
+        round_obj = by_pk[round_id]
+        match = BracketMatch(a, b, winner, is_bye, pk=pk)
+        position[pk] = (round_obj, len(round_obj.matches))
+        round_obj.matches.append(match)
+        links.append((match, next_pk, next_slot))
+    for match, next_pk, next_slot in links:
+        if next_pk in position:
+            match.next_match = position[next_pk][1]
+            match.next_slot = next_slot
+    bracket = Bracket(rounds)
+    bracket.origin = _snapshot(bracket)
+    bracket.origin['versions'] = versions
+    bracket.infer_links()
+    return bracket
+
+
+# Filas por UPDATE de compara y reserva: cada una aporta dos parámetros y un término al OR,
+# lejos del límite de variables (999 en SQLite antiguos) y de profundidad de expresiones (1000)
+CAS_BATCH = 200
+
+
+def _reserve_versions(model, expected: Dict[int, int]) -> None:
+    """Compara y reserva (pk -> versión leída): sube la versión solo de las filas que siguen así.
+
+    Se hace en lotes de CAS_BATCH filas. Si alguna cambió se lanza VersionConflict; quien
+    llama está en una transacción, así que los lotes anteriores se deshacen con ella.
+    """
+    pks = list(expected)
+    for start in range(0, len(pks), CAS_BATCH):
+        chunk = pks[start:start + CAS_BATCH]
+        condition = Q()
+        for pk in chunk:
+            condition |= Q(pk=pk, version=expected[pk])
+        if model.objects.filter(condition).update(version=F('version') + 1) != len(chunk):
+            stale = dict(model.objects.filter(pk__in=chunk).values_list('pk', 'version'))
+            raise VersionConflict(model, next(pk for pk in chunk if stale.get(pk) != expected[pk] + 1))
+
+
+@transaction.atomic
+def persist_bracket(tournament: Tournament, bracket: Bracket) -> List[TournamentRound]:
+    """Guarda en un lote lo que cambió respecto a `bracket.origin`. Devuelve las rondas creadas.
+
+    Los partidos modificados se escriben por comparación de versión: si alguno cambió
+    desde load_bracket se lanza VersionConflict y la transacción se deshace.
+    """
+    origin = bracket.origin or {'rounds': {}, 'matches': {}}
+    versions = origin.get('versions', {})
+    kept = {r.pk for r in bracket.rounds if r.pk}
+    stale = [pk for pk in origin['rounds'] if pk not in kept]
+    if stale:
+        TournamentRound.objects.filter(pk__in=stale).delete()
+
+    new_rounds = [r for r in bracket.rounds if r.pk is None]
+    created = TournamentRound.objects.bulk_create([
+        TournamentRound(tournament=tournament, index=r.index, nombre=r.nombre, completed=r.completed)
+        for r in new_rounds
+    ])
+    for r, obj in zip(new_rounds, created):
+        r.pk = obj.pk
+    TournamentRound.objects.bulk_update([
+        TournamentRound(pk=r.pk, nombre=r.nombre, completed=r.completed)
+        for r in bracket.rounds
+        if r.pk in origin['rounds'] and origin['rounds'][r.pk] != (r.nombre, r.completed)
+    ], ['nombre', 'completed'])
+
+    # Partidos nuevos de atrás hacia adelante: el partido siguiente ya tiene pk al crearlos
+    for ri in range(len(bracket.rounds) - 1, -1, -1):
+        pending = [m for m in bracket.rounds[ri].matches if m.pk is None]
+        if not pending:
+            continue
+        objs = []
+        for m in pending:
+            a, b, winner, is_bye, next_pk, next_slot = _match_row(bracket, ri, m)
+            objs.append(TournamentMatch(
+                round_id=bracket.rounds[ri].pk, a_id=a, b_id=b, winner_id=winner, is_bye=is_bye,
+                next_match_id=next_pk, next_slot=next_slot,
+            ))
+        for m, obj in zip(pending, TournamentMatch.objects.bulk_create(objs)):
+            m.pk = obj.pk
+
+    changed = []
+    for ri, r in enumerate(bracket.rounds):
+        for m in r.matches:
+            row = _match_row(bracket, ri, m)
+            if m.pk in origin['matches'] and origin['matches'][m.pk] != row:
+                a, b, winner, is_bye, next_pk, next_slot = row
+                changed.append(TournamentMatch(
+                    pk=m.pk, a_id=a, b_id=b, winner_id=winner, is_bye=is_bye, next_match_id=next_pk, next_slot=next_slot,
+                    version=versions.get(m.pk, 0) + 1,
+                ))
+    if changed:
+        _reserve_versions(TournamentMatch, {obj.pk: obj.version - 1 for obj in changed})
+        TournamentMatch.objects.bulk_update(changed, ['a', 'b', 'winner', 'is_bye', 'next_match', 'next_slot'])
+    for obj in changed:
+        versions[obj.pk] = obj.version
+    bracket.origin = _snapshot(bracket)
+    bracket.origin['versions'] = versions
+    return created
 
 
-def generate_next_round(tournament: Tournament) -> Optional[TournamentRound]:
-    current_round = tournament.rounds.order_by('-index').first()
-    if current_round is None:
-        return None
-
-    winners: List[TournamentParticipant] = []
-    for m in current_round.matches.all():
-        if m.is_bye and m.a:
-            winners.append(m.a)
-        elif m.winner:
-            winners.append(m.winner)
+def create_initial_round(tournament: Tournament) -> TournamentRound:
+    return create_initial_round_with_participants(tournament, list(tournament.participants.all()))
 
-    if len(winners) <= 1:
-        return None
 
-    if len(winners) == 2:
-        next_round = TournamentRound.objects.create(
-            tournament=tournament,
-            index=current_round.index + 1,
-            nombre='Final - Oro',
-            completed=False,
-        )
-        TournamentMatch.objects.create(round=next_round, a=winners[0], b=winners[1])
-        return next_round
-
-    random.shuffle(winners)
-    next_round = TournamentRound.objects.create(
-        tournament=tournament,
-        index=current_round.index + 1,
-        nombre=get_round_name(len(winners), next_round_index_hint(current_round.index + 1)),
-        completed=False,
-    )
-    # Si cantidad impar de ganadores, dar BYE al último
-    bye_participant = None
-    if len(winners) % 2 == 1:
-        bye_participant = winners.pop()
-    for i in range(0, len(winners), 2):
-        a = winners[i]
-        b = winners[i + 1]
-        TournamentMatch.objects.create(round=next_round, a=a, b=b)
-    if bye_participant is not None:
-        bye_match = TournamentMatch.objects.create(round=next_round, a=bye_participant, b=None, is_bye=True)
-        bye_match.winner = bye_participant
-        bye_match.save()
-    return next_round
+def create_initial_round_with_participants(tournament: Tournament, participants: List[TournamentParticipant]) -> TournamentRound:
+    bracket = Bracket.create([p.id for p in participants])
+    return persist_bracket(tournament, bracket)[0]
 
 
-def next_round_index_hint(idx: int) -> int:
-    return idx
+@transaction.atomic
+def generate_next_round(tournament: Tournament, seed: Optional[int] = None) -> Optional[TournamentRound]:
+    seed = eventos.nueva_semilla() if seed is None else seed
+    bracket = load_bracket(tournament)
+    if bracket.advance(random.Random(seed)) is None:
+        return None
+    created = persist_bracket(tournament, bracket)[0]
+    eventos.registrar('llaves', tournament.pk, origen='siguiente', semilla=seed)
+    return created
 
 
+@transaction.atomic
 def create_football_groups(tournament: Tournament, max_group_size: int = 5) -> None:
     teams = list(tournament.participants.all())
     if not teams:
         return
     num_groups = (len(teams) + max_group_size - 1) // max_group_size
-    for g in range(num_groups):
-        codigo = chr(65 + g)  # 'A', 'B', ...
-        grp = FootballGroup.objects.create(tournament=tournament, codigo=codigo)
-        slice_teams = teams[g * max_group_size:(g + 1) * max_group_size]
-        ft_teams: List[FootballTeam] = []
-        for p in slice_teams:
-            ft_teams.append(FootballTeam.objects.create(group=grp, participant=p))
-        # todos contra todos
-        for i in range(len(ft_teams)):
-            for j in range(i + 1, len(ft_teams)):
-                FootballGroupMatch.objects.create(group=grp, home=ft_teams[i], away=ft_teams[j], played=False)
-
-
-def record_group_result(match: FootballGroupMatch, goals_home: int, goals_away: int) -> None:
+    sizes = [len(teams[g * max_group_size:(g + 1) * max_group_size]) for g in range(num_groups)]
+    totals = [n * (n - 1) // 2 for n in sizes]
+    groups = FootballGroup.objects.bulk_create([
+        FootballGroup(tournament=tournament, codigo=chr(65 + g), matches_total=totals[g], matches_pending=totals[g])  # 'A', 'B', ...
+        for g in range(num_groups)
+    ])
+    Tournament.objects.filter(pk=tournament.pk).update(
+        group_matches_total=F('group_matches_total') + sum(totals),
+        group_matches_pending=F('group_matches_pending') + sum(totals),
+    )
+    ft_teams = FootballTeam.objects.bulk_create([
+        FootballTeam(group=grp, participant=p)
+        for g, grp in enumerate(groups)
+        for p in teams[g * max_group_size:(g + 1) * max_group_size]
+    ])
+    # todos contra todos dentro de cada grupo
+    by_group: dict = {}
+    for team in ft_teams:
+        by_group.setdefault(team.group_id, []).append(team)
+    FootballGroupMatch.objects.bulk_create([
+        FootballGroupMatch(group_id=group_id, home=group_teams[i], away=group_teams[j], played=False)
+        for group_id, group_teams in by_group.items()
+        for i in range(len(group_teams))
+        for j in range(i + 1, len(group_teams))
+    ])
+
+
+def team_line(goals_for: int, goals_against: int) -> Dict[str, int]:
+    """Aporte de un partido jugado a los contadores de un equipo."""
+    won, drawn = goals_for > goals_against, goals_for == goals_against
+    return {
+        'pj': 1,
+        'g': int(won),
+        'e': int(drawn),
+        'p': int(not won and not drawn),
+        'gf': goals_for,
+        'gc': goals_against,
+        'dg': goals_for - goals_against,
+        'pts': 3 if won else int(drawn),
+    }
+
+
+def _line_delta(new: Dict[str, int], old: Optional[Dict[str, int]]) -> Dict[str, int]:
+    delta = {f: new[f] - (old[f] if old else 0) for f in STANDING_FIELDS}
+    return {f: d for f, d in delta.items() if d}
+
+
+def _by_pk(values: Dict[int, int]) -> Case:
+    """Valor por fila para un UPDATE de conjunto (0 para las demás)."""
+    return Case(*[When(pk=pk, then=Value(v)) for pk, v in values.items()], default=Value(0))
+
+
+def record_group_result(match: FootballGroupMatch, goals_home: int, goals_away: int, version: Optional[int] = None) -> None:
+    """Registra (o corrige) un resultado aplicando solo la diferencia a los contadores.
+
+    Es record_group_results con un solo partido. Con `version` (la que vio el
+    jurado) se lanza VersionConflict si otro corrigió el partido antes.
+    """
+    versions = record_group_results({match.pk: (goals_home, goals_away)}, None if version is None else {match.pk: version})
     match.goals_home = goals_home
     match.goals_away = goals_away
     match.played = True
-    match.save()
-
-    home = match.home
-    away = match.away
-    # actualizar stats
-    home.pj += 1
-    away.pj += 1
-    home.gf += goals_home
-    home.gc += goals_away
-    away.gf += goals_away
-    away.gc += goals_home
-    home.dg = home.gf - home.gc
-    away.dg = away.gf - away.gc
-    if goals_home > goals_away:
-        home.g += 1
-        away.p += 1
-        home.pts += 3
-    elif goals_home < goals_away:
-        away.g += 1
-        home.p += 1
-        away.pts += 3
-    else:
-        home.e += 1
-        away.e += 1
-        home.pts += 1
-        away.pts += 1
-    home.save()
-    away.save()
-    
+    match.version = versions[match.pk]
+
+
+@transaction.atomic
+def record_group_results(results: Dict[int, Tuple[int, int]], versions: Optional[Dict[int, int]] = None,
+                         tournament: Optional[Tournament] = None) -> Dict[int, int]:
+    """Registra varios resultados (pk del partido -> (goles local, goles visitante)) en una transacción.
+
+    Los marcadores anteriores se releen dentro de la transacción y los contadores
+    de equipos, grupos y torneos se actualizan con un UPDATE por tabla sumando con
+    F() la diferencia de todos los partidos, así que dos jurados registrando a la vez
+    no pierden cambios y re-ingresar un marcador no duplica pj/gf/pts. Cada partido se
+    escribe por comparación de versión (VersionConflict si otro lo cambió; con
+    `versions` se compara además con la versión que vio el jurado). Lanza ValueError si
+    algún partido no existe (o no es de `tournament`) o tiene goles negativos.
+    Devuelve la versión nueva de cada partido.
+    """
+    rows = FootballGroupMatch.objects.select_for_update().filter(pk__in=list(results))
+    if tournament is not None:
+        rows = rows.filter(group__tournament=tournament)
+    current = {
+        row[0]: row[1:]
+        for row in rows.values_list(
+            'pk', 'group_id', 'group__tournament_id', 'home_id', 'away_id', 'played', 'goals_home', 'goals_away', 'version',
+        )
+    }
+    missing = [pk for pk in results if pk not in current]
+    if missing:
+        raise ValueError(f'Partidos inexistentes: {", ".join(map(str, missing))}')
+    if any(gh < 0 or ga < 0 for gh, ga in results.values()):
+        raise ValueError('Los goles no pueden ser negativos.')
+    for pk, version in (versions or {}).items():
+        if pk in results and current[pk][-1] != version:
+            raise VersionConflict(FootballGroupMatch, pk)
+
+    _reserve_versions(FootballGroupMatch, {pk: current[pk][-1] for pk in results})
+    FootballGroupMatch.objects.bulk_update([
+        FootballGroupMatch(pk=pk, goals_home=gh, goals_away=ga, played=True) for pk, (gh, ga) in results.items()
+    ], ['goals_home', 'goals_away', 'played'])
+
+    team_deltas: Dict[int, Dict[str, int]] = {}
+    newly_played_groups: Dict[int, int] = {}
+    newly_played_tournaments: Dict[int, int] = {}
+    for pk, (goals_home, goals_away) in results.items():
+        group_id, tournament_id, home_id, away_id, played, old_home, old_away, _ = current[pk]
+        was_played = played and old_home is not None and old_away is not None
+        if not played:
+            newly_played_groups[group_id] = newly_played_groups.get(group_id, 0) + 1
+            newly_played_tournaments[tournament_id] = newly_played_tournaments.get(tournament_id, 0) + 1
+        for team_id, new, old in (
+            (home_id, team_line(goals_home, goals_away), team_line(old_home, old_away) if was_played else None),
+            (away_id, team_line(goals_away, goals_home), team_line(old_away, old_home) if was_played else None),
+        ):
+            totals = team_deltas.setdefault(team_id, {})
+            for f, d in _line_delta(new, old).items():
+                totals[f] = totals.get(f, 0) + d
+
+    fields = {f for totals in team_deltas.values() for f, d in totals.items() if d}
+    if fields:
+        FootballTeam.objects.filter(pk__in=list(team_deltas)).update(**{
+            f: F(f) + _by_pk({team_id: totals[f] for team_id, totals in team_deltas.items() if totals.get(f)})
+            for f in fields
+        })
+    if newly_played_groups:
+        groups = FootballGroup.objects.filter(pk__in=list(newly_played_groups))
+        groups.update(matches_pending=F('matches_pending') - _by_pk(newly_played_groups))
+        groups.update(completed=Case(When(matches_pending=0, then=Value(True)), default=Value(False)))
+        Tournament.objects.filter(pk__in=list(newly_played_tournaments)).update(
+            group_matches_pending=F('group_matches_pending') - _by_pk(newly_played_tournaments),
+        )
+    by_tournament: Dict[int, Dict[int, Tuple[int, int]]] = {}
+    for pk, goals in results.items():
+        by_tournament.setdefault(current[pk][1], {})[pk] = goals
+    for tournament_id, tournament_results in by_tournament.items():
+        eventos.registrar('resultados', tournament_id, resultados=tournament_results)
+    return {pk: current[pk][-1] + 1 for pk in results}
+
 
 def are_all_group_matches_played(tournament: Tournament) -> bool:
-    groups = tournament.football_groups.all()
-    if not groups.exists():
-        return False
-    for g in groups:
-        for m in g.matches.all():
-            if not m.played:
-                return False
-    return True
+    """Un solo EXISTS sobre los contadores del torneo."""
+    return Tournament.objects.filter(pk=tournament.pk, group_matches_total__gt=0, group_matches_pending=0).exists()
 
 
-def get_group_top_two(group: FootballGroup) -> List[FootballTeam]:
-    # Order explicitly to avoid relying solely on Meta ordering
-    return list(group.teams.order_by('-pts', '-dg', '-gf', 'participant__nombre')[:2])
+def get_group_top_two(group: FootballGroup, tables: Optional[Dict[int, List[Standing]]] = None) -> List[Standing]:
+    """Dos primeros del grupo. Quien recorre varios grupos pasa `tables` (group_tables del torneo, calculadas una vez)."""
+    if tables is None:
+        tables = group_tables(group_ids=[group.id])
+    return tables.get(group.id, [])[:2]
 
 
-def seed_knockout_from_groups(tournament: Tournament) -> Optional[TournamentRound]:
+@transaction.atomic
+def seed_knockout_from_groups(tournament: Tournament, seed: Optional[int] = None) -> Optional[TournamentRound]:
     # Do nothing if rounds already exist
     if tournament.rounds.exists():
         return None
-    groups = list(tournament.football_groups.order_by('codigo').all())
-    if not groups:
+    tables = group_tables([tournament.id])
+    if not tables:
         return None
-    # Collect top-2 from every group, ordered by tournament seeding rules
-    qualified: List[TournamentParticipant] = []
-    for g in groups:
-        top_two = get_group_top_two(g)
-        for team in top_two:
-            qualified.append(team.participant)
+    # Top-2 de cada grupo (en orden de código) según la tabla calculada desde los partidos
+    group_ids = tournament.football_groups.order_by('codigo').values_list('id', flat=True)
+    qualified = [s.participant_id for group_id in group_ids for s in tables.get(group_id, [])[:2]]
     if not qualified:
         return None
     # Create initial knockout round with all qualified, shuffling and handling BYEs as needed
-    return create_initial_round_with_participants(tournament, qualified)
-
+    seed = eventos.nueva_semilla() if seed is None else seed
+    created = persist_bracket(tournament, Bracket.create(qualified, random.Random(seed)))[0]
+    eventos.registrar('llaves', tournament.pk, origen='grupos', semilla=seed)
+    return created
 
-def truncate_rounds_after(tournament: Tournament, base_index: int) -> None:
-    """Delete all rounds with index greater than base_index to allow regeneration."""
-    rounds_to_delete = tournament.rounds.filter(index__gt=base_index)
-    # Cascade will remove matches
-    for r in rounds_to_delete:
-        r.delete()
 
-
-def regenerate_following_from(tournament: Tournament, base_round: TournamentRound) -> None:
+@transaction.atomic
+def regenerate_following_from(tournament: Tournament, base_round: TournamentRound, seed: Optional[int] = None) -> None:
     """After editing winners in base_round, remove later rounds and rebuild chain."""
-    truncate_rounds_after(tournament, base_round.index)
-    # Only build subsequent rounds when current round is completed
-    if all(m.is_bye or m.winner_id for m in base_round.matches.all()):
-        base_round.completed = True
-        base_round.save()
-        # Generate chain until cannot
-        while True:
-            nxt = generate_next_round(tournament)
-            if nxt is None:
-                break
+    seed = eventos.nueva_semilla() if seed is None else seed
+    bracket = load_bracket(tournament)
+    bracket.rebuild_from(base_round.index, random.Random(seed))
+    persist_bracket(tournament, bracket)
+    eventos.registrar('llaves', tournament.pk, origen='regenerar', ronda=base_round.index, semilla=seed)
+
+
+@transaction.atomic
+def set_match_winner(tournament: Tournament, match: TournamentMatch, winner: Optional[TournamentParticipant],
+                     version: Optional[int] = None, seed: Optional[int] = None) -> None:
+    """Registra el ganador y actualiza solo lo que depende de él.
+
+    El motor propaga el cambio por la cadena next_match (sin re-sorteo), re-sortea
+    desde la ronda si las llaves no tienen enlaces, y genera la ronda siguiente al
+    completarse la última. Lo modificado se guarda en un solo lote.
+
+    Con `version` (la que vio el jurado) se lanza VersionConflict si el partido cambió.
+    `seed` fija el sorteo de las rondas que se generen (se guarda en el evento).
+    """
+    seed = eventos.nueva_semilla() if seed is None else seed
+    bracket = load_bracket(tournament)
+    if version is not None and bracket.origin['versions'].get(match.pk) != version:
+        raise VersionConflict(TournamentMatch, match.pk)
+    round_index, match_index = bracket.locate(match.pk)
+    bracket.set_winner(round_index, match_index, winner.id if winner else None, random.Random(seed))
+    persist_bracket(tournament, bracket)
+    eventos.registrar('ganador', tournament.pk, ronda=round_index, partido=match_index,
+                      ganador=winner.id if winner else None, semilla=seed)
+    match.winner = winner
+    match.version = bracket.origin['versions'].get(match.pk, match.version)
+
+@transaction.atomic
+def set_round_winners(tournament: Tournament, round_obj: TournamentRound, winners: Dict[int, Optional[int]],
+                      versions: Optional[Dict[int, int]] = None, seed: Optional[int] = None) -> int:
+    """Registra los ganadores de varios partidos de una ronda (pk del partido -> id del participante).
+
+    Se validan juntos (ValueError si alguno no pertenece a la ronda o no es válido),
+    las rondas siguientes se propagan o regeneran una sola vez y todo se guarda en un
+    lote. Con `versions` (pk -> versión vista) se lanza VersionConflict si alguno cambió.
+    """
+    seed = eventos.nueva_semilla() if seed is None else seed
+    bracket = load_bracket(tournament)
+    current = bracket.origin['versions']
+    for pk, version in (versions or {}).items():
+        if pk in winners and current.get(pk) != version:
+            raise VersionConflict(TournamentMatch, pk)
+    positions = {m.pk: mi for mi, m in enumerate(bracket.rounds[round_obj.index].matches)}
+    unknown = [pk for pk in winners if pk not in positions]
+    if unknown:
+        raise ValueError(f'Partidos que no pertenecen a la ronda: {", ".join(map(str, unknown))}')
+    by_position = {positions[pk]: winner for pk, winner in winners.items()}
+    bracket.set_round_winners(round_obj.index, by_position, random.Random(seed))
+    persist_bracket(tournament, bracket)
+    eventos.registrar('ganadores_ronda', tournament.pk, ronda=round_obj.index, ganadores=by_position, semilla=seed)
+    return len(winners)
 
 # =========================
 # Rally helpers (triadas)
 # =========================
 
+@transaction.atomic
 def create_rally_triads(tournament: Tournament) -> None:
     participants = list(tournament.participants.all())
     if not participants:
         return
-    import random
     random.shuffle(participants)
     RallyTriad.objects.filter(tournament=tournament).delete()
-    idx = 0
-    for i in range(0, len(participants), 3):
+    triads = []
+    for idx, i in enumerate(range(0, len(participants), 3)):
         triad_part = participants[i:i+3]
         # Completar con None si faltan
         a = triad_part[0] if len(triad_part) > 0 else None
         b = triad_part[1] if len(triad_part) > 1 else None
         c = triad_part[2] if len(triad_part) > 2 else None
-        RallyTriad.objects.create(tournament=tournament, index=idx, a=a, b=b, c=c)
-        idx += 1
+        triads.append(RallyTriad(tournament=tournament, index=idx, a=a, b=b, c=c))
+    RallyTriad.objects.bulk_create(triads)
+    Tournament.objects.filter(pk=tournament.pk).update(triads_total=len(triads), triads_pending=len(triads))
+
+
+@transaction.atomic
+def set_triad_winner(triad: RallyTriad, winner_id: Optional[int], version: Optional[int] = None) -> None:
+    """Fija el ganador de la triada y ajusta el contador de triadas pendientes.
+
+    Con `version` se lanza VersionConflict si la triada cambió desde que se leyó.
+    """
+    previous, current = RallyTriad.objects.select_for_update().filter(pk=triad.pk).values_list('winner_id', 'version').get()
+    if version is not None and version != current:
+        raise VersionConflict(RallyTriad, triad.pk)
+    if not RallyTriad.objects.filter(pk=triad.pk, version=current).update(winner_id=winner_id, version=current + 1):
+        raise VersionConflict(RallyTriad, triad.pk)
+    triad.winner_id = winner_id
+    triad.version = current + 1
+    delta = (previous is not None) - (winner_id is not None)
+    if delta:
+        Tournament.objects.filter(pk=triad.tournament_id).update(triads_pending=F('triads_pending') + delta)
+    eventos.registrar('triada', triad.tournament_id, triada=triad.index, ganador=winner_id)
 
 def rally_triads_completed(tournament: Tournament) -> bool:
-    triads = RallyTriad.objects.filter(tournament=tournament)
-    if not triads.exists():
-        return False
-    for t in triads:
-        if t.winner_id is None:
-            return False
-    return True
-
-def seed_semifinals_from_triads(tournament: Tournament) -> Optional[TournamentRound]:
+    """Un solo EXISTS sobre los contadores del torneo."""
+    return Tournament.objects.filter(pk=tournament.pk, triads_total__gt=0, triads_pending=0).exists()
+
+
+@transaction.atomic
+def seed_semifinals_from_triads(tournament: Tournament, seed: Optional[int] = None) -> Optional[TournamentRound]:
     if tournament.rounds.exists():
         return None
     winners = list(
@@ -295,18 +510,7 @@ def seed_semifinals_from_triads(tournament: Tournament) -> Optional[TournamentRo
     )
     if len(winners) < 2:
         return None
-    import random
-    random.shuffle(winners)
-    # Si ganadores == 4 → semifinales; si 2 → final directa
-    name = 'Semifinales' if len(winners) == 4 else 'Final - Oro'
-    round_obj = TournamentRound.objects.create(tournament=tournament, index=0, nombre=name, completed=False)
-    # Parear en 1v1, BYE si impar
-    if len(winners) % 2 == 1:
-        bye = winners.pop()
-        m = TournamentMatch.objects.create(round=round_obj, a=bye, b=None, is_bye=True)
-        m.winner = bye
-        m.save()
-    for i in range(0, len(winners), 2):
-        TournamentMatch.objects.create(round=round_obj, a=winners[i], b=winners[i+1])
-    return round_obj
-
+    seed = eventos.nueva_semilla() if seed is None else seed
+    created = persist_bracket(tournament, Bracket.create([w.id for w in winners], random.Random(seed)))[0]
+    eventos.registrar('llaves', tournament.pk, origen='triadas', semilla=seed)
+    return created
@@ -0,0 +1,279 @@
+"""Sincronización por lotes para las tabletas de los jurados (Wi-Fi intermitente).
+
+El cliente guarda cada acción en una cola local con un id propio (p. ej. un UUID)
+y sube la cola cuando hay conexión con POST /api/sincronizar/ (con X-CSRFToken):
+
+    {"dispositivo": "mesa-2", "desde": 1520, "acciones": [
+        {"id": "5f0c…", "tipo": "ganador", "torneo": 7, "partido": 31, "ganador": 12, "version": 0},
+        {"id": "9a41…", "tipo": "resultados", "torneo": 9, "resultados": {"40": [2, 1]}, "versiones": {"40": 0}}
+    ]}
+
+Las acciones se aplican en orden dentro de una transacción, cada una en su
+savepoint: la que falla (conflicto de versión, dato inválido) se deshace sola y
+las demás siguen. Cada resultado, bueno o malo, queda guardado con la clave del
+cliente; una clave ya procesada no se vuelve a aplicar y devuelve lo guardado,
+así reintentar un lote tras un corte es seguro.
+
+La respuesta trae el resultado de cada acción y el delta desde el cursor `desde`
+(id del último evento que el cliente conoce): los eventos nuevos del registro
+(jurados/eventos.py) y el estado actual de los torneos que cambiaron, con las
+versiones para las próximas acciones. Las acciones sobre un torneo devuelven su
+id en "torneo".
+"""
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import eventos
+from .db_sqlite import transaccion_lectura
+from .models import (
+    AccionSincronizada, Evento, FootballGroupMatch, RallyTriad, Robot, SesionRegistro, TiempoRegistro,
+    Tournament, TournamentMatch,
+)
+from .services_torneo import (
+    VersionConflict,
+    are_all_group_matches_played,
+    rally_triads_completed,
+    record_group_results,
+    seed_knockout_from_groups,
+    seed_semifinals_from_triads,
+    set_match_winner,
+    set_round_winners,
+    set_triad_winner,
+)
+
+MAX_ACCIONES = 200
+MAX_EVENTOS = 500
+
+
+class LoteInvalido(Exception):
+    """El lote no tiene la forma esperada; no se aplica ninguna acción."""
+
+
+def _version(accion: dict) -> Optional[int]:
+    return None if accion.get('version') in (None, '') else int(accion['version'])
+
+
+def _objeto(accion: dict, campo: str) -> dict:
+    """Campo que debe ser un objeto {pk: valor}; ValueError (acción fallida) si llega con otra forma."""
+    valores = accion.get(campo) or {}
+    if not isinstance(valores, dict):
+        raise ValueError(f'"{campo}" debe ser un objeto {{id: valor}}.')
+    return valores
+
+
+def _por_pk(accion: dict, campo: str) -> Dict[int, int]:
+    return {int(pk): int(v) for pk, v in _objeto(accion, campo).items()}
+
+
+def _iniciar_sesion(accion: dict) -> dict:
+    robot = Robot.objects.select_related('categoria').get(pk=accion['robot'], activo=True)
+    sesion = SesionRegistro.iniciar(robot)
+    eventos.registrar('sesion_inicio', robot_id=robot.id, sesion=sesion.id)
+    return {'sesion': sesion.id}
+
+
+def _finalizar_sesion(accion: dict) -> dict:
+    robot = Robot.objects.get(pk=accion['robot'], activo=True)
+    sesion = SesionRegistro.objects.vigentes().filter(robot=robot).first()
+    if sesion is None:
+        raise ValueError('No hay sesión activa')
+    sesion.finalizar()
+    eventos.registrar('sesion_fin', robot_id=robot.id, sesion=sesion.id)
+    return {'sesion': sesion.id}
+
+
+def _tiempo(accion: dict) -> dict:
+    """Tiempo manual; `registrado_en` (epoch en ms) conserva la hora en que lo anotó el jurado."""
+    robot = Robot.objects.get(pk=accion['robot'], activo=True)
+    tiempo = Decimal(str(accion['tiempo']))
+    if tiempo <= 0:
+        raise ValueError('El tiempo debe ser mayor a 0.')
+    valido = bool(accion.get('valido', True))
+    registro = TiempoRegistro.objects.create(
+        robot=robot, tiempo=tiempo, metodo_registro='manual', valido=valido,
+        observaciones=str(accion.get('observaciones') or '').strip(),
+    )
+    if accion.get('registrado_en') not in (None, ''):
+        fecha = datetime.fromtimestamp(float(accion['registrado_en']) / 1000, tz=dt_timezone.utc)
+        if fecha < registro.fecha_registro:
+            # auto_now_add ignora el valor al crear: se corrige con un UPDATE (como al archivar)
+            TiempoRegistro.objects.filter(pk=registro.pk).update(fecha_registro=fecha)
+    eventos.registrar('tiempo', robot_id=robot.id, accion='alta', registro=registro.id, tiempo=tiempo, valido=valido)
+    return {'registro': registro.id}
+
+
+def _ganador(accion: dict) -> dict:
+    torneo = Tournament.objects.get(pk=accion['torneo'])
+    partido = TournamentMatch.objects.get(pk=accion['partido'], round__tournament=torneo)
+    ganador = torneo.participants.get(pk=accion['ganador']) if accion.get('ganador') else None
+    set_match_winner(torneo, partido, ganador, _version(accion))
+    return {'torneo': torneo.id, 'version': partido.version}
+
+
+def _ganadores_ronda(accion: dict) -> dict:
+    torneo = Tournament.objects.get(pk=accion['torneo'])
+    ronda = torneo.rounds.get(pk=accion['ronda'])
+    ganadores = _por_pk(accion, 'ganadores')
+    if not ganadores:
+        raise ValueError('No se indicó ningún ganador.')
+    return {'torneo': torneo.id, 'registrados': set_round_winners(torneo, ronda, ganadores, _por_pk(accion, 'versiones'))}
+
+
+def _triada(accion: dict) -> dict:
+    torneo = Tournament.objects.get(pk=accion['torneo'], categoria='rally')
+    triada = torneo.rally_triads.get(pk=accion['triada'])
+    ganador = int(accion['ganador'])
+    if ganador not in (triada.a_id, triada.b_id, triada.c_id):
+        raise ValueError('Ganador inválido para esta triada.')
+    set_triad_winner(triada, ganador, _version(accion))
+    semifinales = rally_triads_completed(torneo) and seed_semifinals_from_triads(torneo) is not None
+    return {'torneo': torneo.id, 'version': triada.version, 'llaves_generadas': semifinales}
+
+
+def _resultados(accion: dict) -> dict:
+    torneo = Tournament.objects.get(pk=accion['torneo'], categoria='futbol')
+    resultados = {int(pk): (int(gl), int(gv)) for pk, (gl, gv) in _objeto(accion, 'resultados').items()}
+    if not resultados:
+        raise ValueError('No se indicó ningún resultado.')
+    versiones = record_group_results(resultados, _por_pk(accion, 'versiones'), tournament=torneo)
+    llaves = are_all_group_matches_played(torneo) and seed_knockout_from_groups(torneo) is not None
+    return {'torneo': torneo.id, 'versiones': versiones, 'llaves_generadas': llaves}
+
+
+ACCIONES = {
+    'iniciar_sesion': _iniciar_sesion,
+    'finalizar_sesion': _finalizar_sesion,
+    'tiempo': _tiempo,
+    'ganador': _ganador,
+    'ganadores_ronda': _ganadores_ronda,
+    'triada': _triada,
+    'resultados': _resultados,
+}
+
+
+def _validar(acciones, desde) -> None:
+    if not isinstance(acciones, list):
+        raise LoteInvalido('"acciones" debe ser una lista.')
+    if len(acciones) > MAX_ACCIONES:
+        raise LoteInvalido(f'Como máximo {MAX_ACCIONES} acciones por lote.')
+    for posicion, accion in enumerate(acciones, 1):
+        if not isinstance(accion, dict) or not isinstance(accion.get('id'), str) or not 0 < len(accion['id']) <= 64:
+            raise LoteInvalido(f'Acción {posicion}: falta el id del cliente (texto de hasta 64 caracteres).')
+        if accion.get('tipo') not in ACCIONES:
+            raise LoteInvalido(f'Acción {posicion}: tipo desconocido {accion.get("tipo")!r}.')
+    if desde is not None and (isinstance(desde, bool) or not isinstance(desde, int) or desde < 0):
+        raise LoteInvalido('"desde" debe ser el id de un evento.')
+
+
+def _aplicar(accion: dict) -> dict:
+    """Aplica una acción en su savepoint; los errores esperables se devuelven como resultado."""
+    try:
+        with transaction.atomic():
+            return {'ok': True, **ACCIONES[accion['tipo']](accion)}
+    except VersionConflict as conflicto:
+        return {'ok': False, 'error': 'conflicto', 'actual': conflicto.current()}
+    except ObjectDoesNotExist as error:
+        return {'ok': False, 'error': f'No existe: {error}'}
+    except (ValueError, TypeError, KeyError, ArithmeticError) as error:
+        return {'ok': False, 'error': str(error)}
+
+
+def estado_torneos(ids: Iterable[int]) -> Dict[int, dict]:
+    """Estado actual (con versiones) de los torneos: cuatro consultas para todos."""
+    ids = list(ids)
+    estado = {
+        pk: {'activo': activo, 'partidos': [], 'triadas': [], 'partidos_grupo': []}
+        for pk, activo in Tournament.objects.filter(pk__in=ids).values_list('pk', 'activo')
+    }
+    consultas = (
+        ('partidos', 'round__tournament_id', TournamentMatch.objects.filter(round__tournament__in=ids).order_by('round__index', 'id').values(
+            'id', 'round__tournament_id', 'round_id', 'round__index', 'a_id', 'b_id', 'winner_id', 'is_bye', 'version')),
+        ('triadas', 'tournament_id', RallyTriad.objects.filter(tournament__in=ids).values(
+            'id', 'tournament_id', 'index', 'a_id', 'b_id', 'c_id', 'winner_id', 'version')),
+        ('partidos_grupo', 'group__tournament_id', FootballGroupMatch.objects.filter(group__tournament__in=ids).values(
+            'id', 'group__tournament_id', 'group_id', 'goals_home', 'goals_away', 'played', 'version')),
+    )
+    for clave, torneo_de, filas in consultas:
+        for fila in filas:
+            estado[fila.pop(torneo_de)][clave].append(fila)
+    return estado
+
+
+def delta(desde: Optional[int], tocados: Iterable[int] = ()) -> dict:
+    """Eventos posteriores a `desde` (hasta MAX_EVENTOS) y el estado de los torneos que cambiaron.
+
+    Sin `desde` (primera sincronización) solo se devuelve el cursor actual y los torneos tocados.
+    """
+    nuevos: List[Evento] = []
+    if desde is not None:
+        nuevos = list(Evento.objects.filter(id__gt=desde).order_by('id')[:MAX_EVENTOS + 1])
+    completo = len(nuevos) <= MAX_EVENTOS
+    nuevos = nuevos[:MAX_EVENTOS]
+    if nuevos:
+        cursor = nuevos[-1].id
+    elif desde is not None:
+        cursor = desde
+    else:
+        cursor = Evento.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    torneos = set(tocados) | {e.torneo_id for e in nuevos if e.torneo_id is not None}
+    return {
+        'cursor': cursor,
+        'completo': completo,
+        'eventos': [
+            {'id': e.id, 'fecha': e.fecha, 'tipo': e.tipo, 'torneo': e.torneo_id, 'robot': e.robot_id, 'datos': e.datos}
+            for e in nuevos
+        ],
+        'torneos': estado_torneos(torneos),
+    }
+
+
+def sincronizar(dispositivo: str, acciones: list, desde: Optional[int] = None) -> dict:
+    """Aplica en orden las acciones nuevas del lote y devuelve sus resultados y el delta.
+
+    Lanza LoteInvalido (sin aplicar nada) si el lote está mal formado. Solo el lote
+    con acciones nuevas abre la transacción de escritura; el delta se lee después,
+    en una transacción de lectura que no espera a los demás jurados.
+    """
+    _validar(acciones, desde)
+    procesadas = dict(
+        AccionSincronizada.objects.filter(clave__in=[a['id'] for a in acciones]).values_list('clave', 'resultado')
+    )
+    if any(a['id'] not in procesadas for a in acciones):
+        resultados, tocados = _aplicar_lote(dispositivo, acciones, procesadas)
+    else:
+        resultados, tocados = [{'id': a['id'], 'duplicada': True, **procesadas[a['id']]} for a in acciones], set()
+    with transaccion_lectura():
+        cambios = delta(desde, tocados)
+    return {'resultados': resultados, 'delta': cambios, 'hora_servidor': timezone.now()}
+
+
+@transaction.atomic
+def _aplicar_lote(dispositivo: str, acciones: list, procesadas: dict):
+    resultados = []
+    tocados = set()
+    for accion in acciones:
+        clave = accion['id']
+        if clave in procesadas:
+            resultados.append({'id': clave, 'duplicada': True, **procesadas[clave]})
+            continue
+        # La clave se reserva antes de aplicar: un reenvío simultáneo del lote espera o falla aquí
+        try:
+            with transaction.atomic():
+                registro = AccionSincronizada.objects.create(clave=clave, dispositivo=dispositivo, tipo=accion['tipo'])
+        except IntegrityError:
+            procesadas[clave] = AccionSincronizada.objects.get(clave=clave).resultado
+            resultados.append({'id': clave, 'duplicada': True, **procesadas[clave]})
+            continue
+        resultado = _aplicar(accion)
+        AccionSincronizada.objects.filter(pk=registro.pk).update(resultado=resultado)
+        procesadas[clave] = resultado
+        # El id sale del torneo que se modificó, no del campo enviado por el cliente
+        if resultado['ok'] and resultado.get('torneo') is not None:
+            tocados.add(resultado['torneo'])
+        resultados.append({'id': clave, 'duplicada': False, **resultado})
+    return resultados, tocados
@@ -0,0 +1,58 @@
+"""Tareas periódicas en hilos de fondo del proceso que atiende peticiones.
+
+Se inician desde wsgi.py/asgi.py, así que `runserver` (proceso hijo del
+autoreload) y los servidores WSGI/ASGI las ejecutan, pero no los comandos de
+manage.py ni las pruebas.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_tareas: Dict[str, Tuple[threading.Thread, threading.Event]] = {}
+_lock = threading.Lock()
+
+
+def iniciar_tarea_periodica(nombre: str, intervalo: float, funcion: Callable[[], object]) -> Optional[threading.Thread]:
+    """Ejecuta `funcion` cada `intervalo` segundos en un hilo daemon (una sola vez por proceso)."""
+    if not intervalo or intervalo <= 0:
+        return None
+    with _lock:
+        if nombre in _tareas:
+            return _tareas[nombre][0]
+        detener = threading.Event()
+
+        def bucle():
+            while not detener.wait(intervalo):
+                try:
+                    funcion()
+                except Exception:
+                    logger.exception('Falló la tarea periódica %s', nombre)
+                finally:
+                    close_old_connections()
+
+        hilo = threading.Thread(target=bucle, name=f'metarobots-{nombre}', daemon=True)
+        _tareas[nombre] = (hilo, detener)
+        hilo.start()
+        return hilo
+
+
+def detener_tareas() -> None:
+    with _lock:
+        for hilo, detener in _tareas.values():
+            detener.set()
+        _tareas.clear()
+
+
+def iniciar_tareas_fondo() -> None:
+    from . import replica, respaldos
+    from .models import SesionRegistro
+
+    iniciar_tarea_periodica('sesiones-vencidas', settings.SESIONES_REAPER_INTERVALO, SesionRegistro.cerrar_vencidas)
+    if replica.configurada():
+        iniciar_tarea_periodica('replica', settings.REPLICA_REFRESCO_INTERVALO, replica.refrescar)
+    iniciar_tarea_periodica('respaldos', settings.RESPALDOS_INTERVALO, respaldos.respaldar)
@@ -1,3 +1,1499 @@
-from django.test import TestCase
+import importlib
+import math
+import os
+import random
+import threading
+import time
+import sqlite3
+import tempfile
+import urllib.error
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, IntegrityError, connection, connections, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import db_sqlite, metricas, replica, respaldos, tareas
+from .bracket import Bracket, get_round_name
+from .models import (
+    AccionSincronizada,
+    Categoria,
+    FootballGroupMatch,
+    FootballTeam,
+    Robot,
+    SesionRegistro,
+    TiempoRegistro,
+    Tournament,
+    TournamentMatch,
+    TournamentParticipant,
+)
+from .services_posiciones import STANDING_FIELDS, Standing, compute_standings, group_tables, sort_group
+
+
+class TorneosMixin:
+    """Torneos y robots creados por las vistas, como lo hace un jurado (compartido por las pruebas de torneos)."""
+
+    def crear_torneo(self, categoria='sumo_rc', participantes=8, prefijo='P', nombre='T'):
+        """Torneo activo de la categoría; `participantes` es una cantidad (prefijo0, prefijo1…) o una lista de nombres."""
+        if isinstance(participantes, int):
+            participantes = [f'{prefijo}{i}' for i in range(participantes)]
+        self.client.post(f'/torneos/categoria/{categoria}/nuevo/', {'nombre': nombre, 'participantes': '\n'.join(participantes)})
+        return Tournament.objects.get(categoria=categoria, activo=True)
+
+    def crear_robots_con_tiempo(self, cantidad, categoria='rally'):
+        """Robots R0, R1… de la categoría con un tiempo válido de 10 + i segundos (para el Top 12 de Rally)."""
+        categoria, _ = Categoria.objects.get_or_create(nombre=categoria)
+        robots = []
+        for i in range(cantidad):
+            robot = Robot.objects.create(categoria=categoria, nombre=f'R{i}', autor_principal='A')
+            TiempoRegistro.objects.create(robot=robot, tiempo=10 + i)
+            robots.append(robot)
+        return robots
+
+
+class LatenciasTests(TestCase):
+    def setUp(self):
+        self.registro = metricas.RegistroLatencias(ventana=10, max_dispositivos=2)
+
+    def test_histograma_por_buckets_y_percentiles(self):
+        hist = metricas.HistogramaLatencia(ventana=3)
+        for ms in (0.5, 4, 30, 7000):
+            hist.registrar(ms)
+        resumen = hist.resumen()
+        self.assertEqual((resumen['total'], resumen['ventana'], resumen['max']), (4, 3, 7000))
+        self.assertEqual(resumen['buckets']['<=5'], 1)
+        self.assertEqual(resumen['buckets']['<=50'], 1)
+        self.assertEqual(resumen['buckets']['>5000'], 1)
+        self.assertEqual(resumen['p50'], 30)
+
+    def test_saltos_repetidas_y_reinicios_de_secuencia(self):
+        for secuencia in (1, 2, 5, 5, 1):
+            self.registro.registrar('esp-1', {metricas.ETAPA_SERVIDOR: 1}, secuencia)
+        estado = self.registro.resumen()['dispositivos']['esp-1']['secuencia']
+        self.assertEqual(estado, {'ultima': 1, 'saltos': 2, 'repetidas': 1, 'reinicios': 1})
+
+    def test_dispositivos_extra_van_a_otros(self):
+        for i in range(5):
+            self.registro.registrar(f'esp-{i}', {metricas.ETAPA_SERVIDOR: 1}, 1)
+        dispositivos = self.registro.resumen()['dispositivos']
+        self.assertEqual(set(dispositivos), {'esp-0', 'esp-1', metricas.DISPOSITIVO_OTROS})
+        otros = dispositivos[metricas.DISPOSITIVO_OTROS]
+        self.assertEqual(otros[metricas.ETAPA_SERVIDOR]['total'], 3)
+        self.assertIsNone(otros['secuencia'])
+
+    def test_endpoint_de_diagnostico(self):
+        categoria = Categoria.objects.create(nombre='velocista')
+        robot = Robot.objects.create(categoria=categoria, nombre='R1', autor_principal='A')
+        SesionRegistro.iniciar(robot)
+        metricas.latencias.limpiar()
+        self.addCleanup(metricas.latencias.limpiar)
+        respuesta = self.client.post(
+            '/api/registrar-tiempo/', {'categoria': 'velocista', 'tiempo': '12.5', 'dispositivo': 'esp-9', 'secuencia': 3},
+            content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        datos = self.client.get('/api/diagnostico/latencias/', {'etapas': 'servidor'}).json()
+        self.assertEqual(set(datos['etapas']), {metricas.ETAPA_SERVIDOR})
+        self.assertEqual(datos['etapas'][metricas.ETAPA_SERVIDOR]['total'], 1)
+        self.assertEqual(datos['dispositivos']['esp-9']['secuencia']['ultima'], 3)
+
+
+class SimuladorEsp32Tests(SimpleTestCase):
+    """Sin servidor real: se reemplazan los subprocesos y el HTTP para probar argumentos, flujo y reporte."""
+    modulo = 'jurados.management.commands.simular_esp32'
+
+    def test_argumentos_invalidos(self):
+        with self.assertRaisesMessage(CommandError, 'al menos un dispositivo'):
+            call_command('simular_esp32', dispositivos=0, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'al menos un dispositivo'):
+            call_command('simular_esp32', '--categorias', ' , ', stdout=StringIO())
+
+    def test_clasificar_error(self):
+        from jurados.management.commands.simular_esp32 import clasificar_error
+
+        self.assertEqual(clasificar_error(500, '{"error": "database is locked"}'), '500 database locked')
+        self.assertEqual(clasificar_error(400, '{"error": "No hay sesión activa"}'), '400 sin sesión activa')
+        self.assertEqual(clasificar_error(502, '<html>'), '502')
+
+    def test_corrida_en_seco(self):
+        semilla = mock.Mock(stdout='{"velocista": [1, 2]}\n')
+        with mock.patch(f'{self.modulo}.subprocess.run', return_value=semilla) as run, \
+                mock.patch(f'{self.modulo}.subprocess.Popen') as popen, \
+                mock.patch(f'{self.modulo}.Command._esperar_servidor'), \
+                mock.patch(f'{self.modulo}.Command._obtener_csrf', return_value='token'), \
+                mock.patch(f'{self.modulo}.Command._post', return_value=(5.0, 200, '{}')), \
+                mock.patch(f'{self.modulo}.urllib.request.urlopen', side_effect=urllib.error.URLError('apagado')):
+            salida = StringIO()
+            call_command(
+                'simular_esp32', '--dispositivos', '2', '--duracion', '0.05', '--pausa', '0.01',
+                '--categorias', 'velocista', '--puerto', '8123', stdout=salida,
+            )
+        self.assertEqual(run.call_count, 2)
+        self.assertIn('127.0.0.1:8123', popen.call_args.args[0])
+        popen.return_value.terminate.assert_called_once_with()
+        texto = salida.getvalue()
+        self.assertIn('registrar_tiempo', texto)
+        self.assertRegex(texto, r'peticiones=\d+ ok=\d+')
+        self.assertNotIn('error', texto)
+        for llamada in run.call_args_list + [popen.call_args]:
+            env = llamada.kwargs['env']
+            self.assertIn('metarobots-carga-', env['METAROBOTS_DB_PATH'])
+            self.assertEqual(os.path.dirname(env['METAROBOTS_RESPALDOS_DIR']), os.path.dirname(env['METAROBOTS_DB_PATH']))
+
+    def test_entorno_del_servidor_no_toca_las_bases_reales(self):
+        from jurados.management.commands.simular_esp32 import entorno_desechable
+
+        reales = {
+            'METAROBOTS_DB_PATH': '/srv/db.sqlite3',
+            'METAROBOTS_REPLICA_PATH': '/srv/replica.sqlite3',
+            'METAROBOTS_ARCHIVE_PATH': '/srv/archivo.sqlite3',
+            'METAROBOTS_RESPALDOS_DIR': '/srv/respaldos',
+            'METAROBOTS_RESPALDOS_INTERVALO': '300',
+            'METAROBOTS_RESPALDOS_CONSERVAR': '12',
+            'METAROBOTS_REPLICA_INTERVALO': '30',
+        }
+        with mock.patch.dict(os.environ, reales):
+            env = entorno_desechable('/tmp/carga')
+        self.assertNotIn('METAROBOTS_REPLICA_PATH', env)
+        for variable in ('METAROBOTS_DB_PATH', 'METAROBOTS_ARCHIVE_PATH', 'METAROBOTS_RESPALDOS_DIR'):
+            self.assertTrue(env[variable].startswith('/tmp/carga/'), variable)
+        self.assertEqual(env['METAROBOTS_RESPALDOS_INTERVALO'], '0')
+        self.assertEqual(env['METAROBOTS_REPLICA_INTERVALO'], '0')
+
+
+class SesionesVencidasTests(TestCase):
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='velocista', ttl_sesion=60)
+        self.robot = Robot.objects.create(categoria=self.categoria, nombre='R1', autor_principal='A')
+        self.hace_rato = timezone.now() - timedelta(seconds=120)
+
+    def test_ttl_por_defecto_no_vence(self):
+        categoria = Categoria.objects.create(nombre='rally')
+        robot = Robot.objects.create(categoria=categoria, nombre='R2', autor_principal='A')
+        sesion = SesionRegistro.iniciar(robot, ahora=self.hace_rato)
+        self.assertEqual(categoria.ttl_sesion, 0)
+        self.assertIsNone(sesion.expira_en)
+        self.assertIn(sesion, SesionRegistro.objects.vigentes())
+
+    def test_vigentes_y_vencidas(self):
+        vencida = SesionRegistro.iniciar(self.robot, ahora=self.hace_rato)
+        self.assertEqual(list(SesionRegistro.objects.vencidas()), [vencida])
+        self.assertFalse(SesionRegistro.objects.vigentes().exists())
+        self.assertTrue(SesionRegistro.objects.vigentes(ahora=self.hace_rato).exists())
+
+    def test_api_rechaza_sesion_vencida(self):
+        SesionRegistro.iniciar(self.robot, ahora=self.hace_rato)
+        respuesta = self.client.post(
+            '/api/registrar-tiempo/', {'categoria': 'velocista', 'tiempo': '12.5'}, content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(TiempoRegistro.objects.exists())
+
+    def test_comando_cierra_vencidas(self):
+        vencida = SesionRegistro.iniciar(self.robot, ahora=self.hace_rato)
+        otro = Robot.objects.create(categoria=self.categoria, nombre='R2', autor_principal='A')
+        vigente = SesionRegistro.iniciar(otro)
+        salida = StringIO()
+        call_command('cerrar_sesiones_vencidas', stdout=salida)
+        self.assertIn('cerradas: 1', salida.getvalue())
+        vencida.refresh_from_db()
+        vigente.refresh_from_db()
+        self.assertEqual((vencida.activa, vencida.fecha_fin), (False, vencida.expira_en))
+        self.assertTrue(vigente.activa)
+
+    def test_migracion_asigna_vencimiento_a_sesiones_abiertas(self):
+        sesion = SesionRegistro.objects.create(robot=self.robot, activa=True)
+        migracion = importlib.import_module('jurados.migrations.0004_categoria_ttl_sesion_sesionregistro_expira_en')
+        migracion.asignar_expiracion(apps, mock.Mock(connection=connection))
+        sesion.refresh_from_db()
+        self.assertEqual(sesion.expira_en, sesion.fecha_inicio + timedelta(seconds=60))
+
+    def test_tarea_periodica_se_ejecuta_y_se_detiene(self):
+        ejecutada = threading.Event()
+        self.addCleanup(tareas.detener_tareas)
+        self.assertIsNone(tareas.iniciar_tarea_periodica('prueba', 0, ejecutada.set))
+        hilo = tareas.iniciar_tarea_periodica('prueba', 0.01, ejecutada.set)
+        self.assertIs(tareas.iniciar_tarea_periodica('prueba', 0.01, ejecutada.set), hilo)
+        self.assertTrue(ejecutada.wait(2))
+        tareas.detener_tareas()
+        hilo.join(2)
+        self.assertFalse(hilo.is_alive())
+
+    def test_servidor_inicia_el_cierre_de_vencidas(self):
+        with mock.patch.object(tareas, 'iniciar_tarea_periodica') as iniciar, self.settings(SESIONES_REAPER_INTERVALO=30):
+            tareas.iniciar_tareas_fondo()
+        iniciar.assert_any_call('sesiones-vencidas', 30, SesionRegistro.cerrar_vencidas)
+
+
+class PragmasSqliteTests(SimpleTestCase):
+    # Las conexiones se abren a archivos temporales propios, no a las bases de prueba
+    databases = {'default', 'archivo'}
+
+    def test_sentencias_validadas(self):
+        self.assertEqual(
+            db_sqlite.sentencias_pragmas({'journal_mode': 'WAL', 'cache_size': '-20000', 'temp_store': ''}),
+            ['PRAGMA journal_mode = WAL', 'PRAGMA cache_size = -20000'],
+        )
+        with self.assertRaises(ValueError):
+            db_sqlite.sentencias_pragmas({'writable_schema': 'ON'})
+        with self.assertRaises(ValueError):
+            db_sqlite.sentencias_pragmas({'synchronous': 'OFF; DROP TABLE x'})
+
+    def _pragmas(self, alias):
+        if connection.vendor != 'sqlite':
+            self.skipTest('PRAGMAs de SQLite')
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        conexion = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(carpeta.name, 'db.sqlite3')}, alias)
+        self.addCleanup(conexion.close)
+        with conexion.cursor() as cursor:
+            return {
+                nombre: cursor.execute(f'PRAGMA {nombre}').fetchone()[0]
+                for nombre in ('journal_mode', 'busy_timeout')
+            }
+
+    def test_se_aplican_a_la_base_principal(self):
+        with self.settings(SQLITE_PRAGMAS={'journal_mode': 'WAL', 'busy_timeout': 1234}):
+            self.assertEqual(self._pragmas('default'), {'journal_mode': 'wal', 'busy_timeout': 1234})
+
+    def test_no_se_aplican_al_archivo_ni_a_la_replica(self):
+        with self.settings(SQLITE_PRAGMAS={'journal_mode': 'WAL', 'busy_timeout': 1234}):
+            for alias in ('archivo', 'replica'):
+                self.assertNotEqual(self._pragmas(alias)['journal_mode'], 'wal')
+
+
+class TransaccionLecturaTests(TransactionTestCase):
+    def test_lectura_empieza_diferida_y_escritura_inmediata(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Modos de transacción de SQLite')
+        modo = connection.transaction_mode
+        with CaptureQueriesContext(connection) as consultas:
+            with db_sqlite.transaccion_lectura():
+                Categoria.objects.count()
+            with transaction.atomic():
+                Categoria.objects.count()
+        inicios = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('BEGIN')]
+        self.assertEqual(inicios, ['BEGIN DEFERRED', f'BEGIN {modo}'])
+        self.assertEqual(connection.transaction_mode, modo)
+
+
+class LecturaConexionCerradaTests(SimpleTestCase):
+    """Proceso nuevo o conexión cerrada (CONN_MAX_AGE): la lectura diferida debe sobrevivir a la reconexión.
+
+    La base de prueba en memoria no se puede cerrar; se usa una base en un archivo temporal.
+    """
+    databases = {'default'}
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Modos de transacción de SQLite')
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.ruta = os.path.join(carpeta.name, 'db.sqlite3')
+        original = connections[DEFAULT_DB_ALIAS]
+        self.conexion = DatabaseWrapper({**original.settings_dict, 'NAME': self.ruta}, DEFAULT_DB_ALIAS)
+        connections[DEFAULT_DB_ALIAS] = self.conexion
+        self.addCleanup(connections.__setitem__, DEFAULT_DB_ALIAS, original)
+        self.addCleanup(self.conexion.close)
+
+    def otro_jurado_puede_escribir(self):
+        otra = sqlite3.connect(self.ruta, timeout=0, isolation_level=None)
+        try:
+            otra.execute('BEGIN IMMEDIATE')
+            otra.execute('ROLLBACK')
+            return True
+        except sqlite3.OperationalError:
+            return False
+        finally:
+            otra.close()
+
+    def leer(self):
+        with self.conexion.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM sqlite_master')
+        return self.otro_jurado_puede_escribir()
+
+    def test_sin_conectar_y_tras_cerrar(self):
+        self.assertFalse(hasattr(self.conexion, 'transaction_mode'))
+        with db_sqlite.transaccion_lectura():
+            self.assertTrue(self.leer())
+        self.conexion.close()
+        with db_sqlite.transaccion_lectura():
+            self.assertTrue(self.leer())
+        self.assertEqual(self.conexion.transaction_mode, self.conexion.settings_dict['OPTIONS']['transaction_mode'])
+        with transaction.atomic():
+            self.assertFalse(self.leer())
+
+    def test_verificar_posiciones_sin_conectar(self):
+        comando = 'jurados.management.commands.verificar_posiciones'
+        escritores = []
+        with mock.patch(f'{comando}.compute_standings', side_effect=lambda torneos: escritores.append(self.leer()) or []), \
+                mock.patch(f'{comando}.find_mismatches', return_value=[]):
+            salida = StringIO()
+            call_command('verificar_posiciones', stdout=salida)
+        self.assertEqual(escritores, [True])
+        self.assertIn('Equipos revisados: 0', salida.getvalue())
+
+
+class IndicesConsultasFrecuentesTests(TestCase):
+    """Cada consulta caliente debe resolverse con su índice (EXPLAIN QUERY PLAN)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='velocista')
+        cls.robot = Robot.objects.create(categoria=cls.categoria, nombre='R1', autor_principal='A')
+
+    def assertUsaIndice(self, queryset, indice):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN es específico de SQLite')
+        plan = queryset.explain()
+        self.assertIn(indice, plan, plan)
+
+    def test_mejor_tiempo(self):
+        qs = self.robot.tiempos.filter(valido=True).order_by('tiempo')[:1]
+        self.assertUsaIndice(qs, 'tiempo_robot_valido_idx')
+
+    def test_historial_por_robot(self):
+        qs = TiempoRegistro.objects.filter(robot=self.robot).order_by('-fecha_registro')
+        self.assertUsaIndice(qs, 'tiempo_robot_fecha_idx')
+
+    def test_historial_por_clave(self):
+        qs = TiempoRegistro.objects.historial(self.robot, (timezone.now(), 10))[:26]
+        self.assertUsaIndice(qs, 'tiempo_robot_fecha_idx')
+        self.assertNotIn('TEMP B-TREE', qs.explain())
+
+    def test_tiempos_recientes(self):
+        qs = TiempoRegistro.objects.filter(robot=self.robot, fecha_registro__gte=timezone.now())
+        self.assertUsaIndice(qs, 'tiempo_robot_fecha_idx')
+
+    def test_sesion_activa_por_categoria(self):
+        qs = SesionRegistro.objects.vigentes().filter(robot__categoria=self.categoria)
+        self.assertUsaIndice(qs, 'sesion_activa_robot_idx')
+
+    def test_sesiones_vencidas(self):
+        self.assertUsaIndice(SesionRegistro.objects.vencidas(), 'sesion_activa_expira_idx')
+
+    def test_robots_activos_por_categoria(self):
+        qs = Robot.objects.filter(categoria=self.categoria, activo=True).order_by('nombre')
+        self.assertUsaIndice(qs, 'robot_activo_cat_idx')
+
+    def test_torneo_activo_por_categoria(self):
+        qs = Tournament.objects.filter(categoria='sumo_rc', activo=True).order_by('-fecha_creacion')[:1]
+        self.assertUsaIndice(qs, 'torneo_activo_cat_idx')
+
+
+class RobotNombreUnicoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='rally')
+        cls.robot = Robot.objects.create(categoria=cls.categoria, nombre='Flash', autor_principal='A')
+
+    def test_rechaza_mismo_nombre_con_otras_mayusculas(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Robot.objects.create(categoria=self.categoria, nombre='fLASH', autor_principal='B')
+
+    def test_busqueda_por_nombre_usa_indice_unico(self):
+        qs = Robot.objects.por_nombre(self.categoria, 'FLASH')
+        self.assertEqual(list(qs), [self.robot])
+        if connection.vendor == 'sqlite':
+            self.assertIn('robot_categoria_nombre_ci_uniq', qs.explain())
+
+    def test_agregar_robot_reactiva_inactivo(self):
+        Robot.objects.filter(pk=self.robot.pk).update(activo=False)
+        self.client.post('/categoria/rally/agregar-robot/', {'nombre': 'flash', 'autor_principal': 'C'})
+        self.robot.refresh_from_db()
+        self.assertTrue(self.robot.activo)
+        self.assertEqual(self.robot.autor_principal, 'C')
+        self.assertEqual(Robot.objects.count(), 1)
+
+    def test_migracion_renombra_duplicados_previos(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('DROP INDEX de SQLite')
+        # Se deshace con el rollback de la prueba (DDL transaccional en SQLite)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX robot_categoria_nombre_ci_uniq')
+        duplicado = Robot.objects.create(categoria=self.categoria, nombre='FLASH', autor_principal='B')
+        otra = Robot.objects.create(categoria=Categoria.objects.create(nombre='velocista'), nombre='flash', autor_principal='C')
+        migracion = importlib.import_module('jurados.migrations.0006_robot_nombre_unico_sin_mayusculas')
+        migracion.renombrar_duplicados(apps, mock.Mock(connection=connection))
+        nombres = dict(Robot.objects.values_list('pk', 'nombre'))
+        self.assertEqual(nombres[self.robot.pk], 'Flash')
+        self.assertEqual(nombres[duplicado.pk], f'FLASH (#{duplicado.pk})')
+        self.assertEqual(nombres[otra.pk], 'flash')
+
+
+class CreacionTorneoEnBloqueTests(TestCase):
+    def crear(self, categoria, cantidad):
+        participantes = '\n'.join(f'Equipo {i}' for i in range(cantidad))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(f'/torneos/categoria/{categoria}/nuevo/', {'nombre': 'T', 'participantes': participantes})
+        self.consultas = ctx.captured_queries
+        return len(ctx.captured_queries)
+
+    def lotes_de_partidos(self):
+        return sum(q['sql'].startswith('INSERT INTO "jurados_tournamentmatch"') for q in self.consultas)
+
+    def test_sumo_en_cantidad_constante_de_consultas(self):
+        # Las dos mediciones reemplazan un torneo activo (el reinicio también se registra)
+        self.crear('sumo_rc', 2)
+        pequeno = self.crear('sumo_rc', 16)
+        self.assertEqual(self.lotes_de_partidos(), 1)
+        # 96 partidos de 8 columnas: caben en un INSERT mientras no superen el límite de
+        # parámetros del motor (999 en SQLite); si lo superan, cada lote suma una consulta
+        grande = self.crear('sumo_rc', 192)
+        campos = [f for f in TournamentMatch._meta.concrete_fields if not f.primary_key]
+        lotes = math.ceil(96 / connection.ops.bulk_batch_size(campos, [None] * 96))
+        self.assertEqual(self.lotes_de_partidos(), lotes)
+        self.assertEqual(grande - pequeno, lotes - 1)
+        torneo = Tournament.objects.get(activo=True)
+        self.assertEqual(TournamentMatch.objects.filter(round__tournament=torneo).count(), 96)
+
+    def test_llave_grande_se_inserta_en_lotes(self):
+        # 128 partidos de 8 columnas superan los 999 parámetros de SQLite: dos lotes, una consulta más
+        if connection.vendor != 'sqlite' or connection.features.max_query_params != 999:
+            self.skipTest('Límite de parámetros de SQLite')
+        self.crear('sumo_rc', 2)
+        pequeno = self.crear('sumo_rc', 16)
+        grande = self.crear('sumo_rc', 256)
+        self.assertEqual(self.lotes_de_partidos(), 2)
+        self.assertEqual(grande, pequeno + 1)
+
+    def test_bye_nace_con_ganador(self):
+        self.crear('sumo_rc', 5)
+        bye = TournamentMatch.objects.get(is_bye=True)
+        self.assertEqual(bye.winner_id, bye.a_id)
+
+    def test_futbol_en_cantidad_constante_de_consultas(self):
+        self.crear('futbol', 2)
+        self.assertEqual(self.crear('futbol', 10), self.crear('futbol', 40))
+        torneo = Tournament.objects.get(activo=True)
+        self.assertEqual(FootballGroupMatch.objects.filter(group__tournament=torneo).count(), 8 * 10)
+
+
+class RegeneracionIncrementalTests(TorneosMixin, TestCase):
+    def setUp(self):
+        self.torneo = self.crear_torneo()
+
+    def marcar(self, match, winner_id):
+        self.client.post(f'/torneos/{self.torneo.id}/marcar-ganador/{match.id}/{winner_id}/')
+
+    def jugar_ronda(self, index):
+        for m in TournamentMatch.objects.filter(round__tournament=self.torneo, round__index=index):
+            self.marcar(m, m.a_id)
+
+    def estado(self):
+        return list(
+            TournamentMatch.objects.filter(round__tournament=self.torneo)
+            .order_by('round__index', 'id').values_list('id', 'a_id', 'b_id', 'winner_id')
+        )
+
+    def test_cambio_de_ganador_solo_toca_la_cadena_siguiente(self):
+        self.jugar_ronda(0)
+        self.jugar_ronda(1)
+        antes = {m[0]: m for m in self.estado()}
+        # Cambiar el ganador de un partido de cuartos cuyo ganador también ganó la semifinal
+        semi = TournamentMatch.objects.filter(round__tournament=self.torneo, round__index=1).first()
+        cuarto = TournamentMatch.objects.get(next_match=semi, next_slot='a')
+        self.marcar(cuarto, cuarto.b_id)
+
+        despues = {m[0]: m for m in self.estado()}
+        self.assertEqual(set(antes), set(despues))  # no se recrearon partidos
+        cambiados = {mid for mid in antes if antes[mid] != despues[mid]}
+        final = TournamentMatch.objects.get(pk=semi.next_match_id)
+        self.assertEqual(cambiados, {cuarto.id, semi.id, final.id})
+        semi.refresh_from_db()
+        self.assertEqual(semi.a_id, cuarto.b_id)
+        self.assertIsNone(semi.winner_id)
+        self.assertIsNone(getattr(final, f'{semi.next_slot}_id'))
+
+
+class MotorLlavesTests(SimpleTestCase):
+    """El motor de llaves funciona sin base de datos."""
+
+    def jugar(self, bracket, index):
+        for mi, m in enumerate(bracket.rounds[index].matches):
+            if not m.is_bye:
+                bracket.set_winner(index, mi, m.a)
+
+    def test_nombres_de_ronda(self):
+        self.assertEqual(get_round_name(8, 0), 'Cuartos')
+        self.assertEqual(get_round_name(8, 1), 'Semifinales')
+        self.assertEqual(get_round_name(8, 2), 'Final - Oro')
+        self.assertEqual(get_round_name(12, 0), 'Octavos')
+        self.assertEqual(get_round_name(12, 1), 'Cuartos')
+
+    def test_bye_y_avance_hasta_la_final(self):
+        bracket = Bracket.create(range(5), rng=random.Random(1))
+        self.assertTrue(bracket.rounds[0].matches[0].is_bye)
+        self.jugar(bracket, 0)
+        self.assertEqual([r.nombre for r in bracket.rounds], ['Cuartos', 'Semifinales'])
+        self.jugar(bracket, 1)
+        self.assertEqual(bracket.rounds[-1].nombre, 'Final - Oro')
+        self.jugar(bracket, 2)
+        self.assertEqual(len(bracket.rounds), 3)
+        self.assertTrue(all(r.completed for r in bracket.rounds))
+
+    def test_edicion_retroactiva_solo_toca_la_cadena(self):
+        bracket = Bracket.create(range(8), rng=random.Random(2))
+        self.jugar(bracket, 0)
+        self.jugar(bracket, 1)
+        cuarto = bracket.rounds[0].matches[0]
+        semi = bracket.rounds[1].matches[cuarto.next_match]
+        if semi.winner != cuarto.a:
+            bracket.set_winner(1, cuarto.next_match, cuarto.a)
+        tocados = bracket.set_winner(0, 0, cuarto.b)
+        self.assertEqual([ri for ri, _ in tocados], [0, 1, 2])
+        self.assertEqual(getattr(semi, cuarto.next_slot), cuarto.b)
+        self.assertIsNone(semi.winner)
+        self.assertFalse(bracket.rounds[1].completed)
+
+    def test_ganador_invalido(self):
+        bracket = Bracket.create([1, 2])
+        with self.assertRaises(ValueError):
+            bracket.set_winner(0, 0, 3)
+
+    def test_ronda_completa_en_bloque(self):
+        bracket = Bracket.create(range(8), rng=random.Random(4))
+        ganadores = {mi: m.b for mi, m in enumerate(bracket.rounds[0].matches)}
+        with self.assertRaises(ValueError):
+            bracket.set_round_winners(0, {**ganadores, 3: 99})
+        self.assertTrue(all(m.winner is None for m in bracket.rounds[0].matches))
+        bracket.set_round_winners(0, ganadores)
+        self.assertEqual(len(bracket.rounds), 2)
+        semis = {p for m in bracket.rounds[1].matches for p in (m.a, m.b)}
+        self.assertEqual(semis, set(ganadores.values()))
+
+    def test_serializacion(self):
+        bracket = Bracket.create(range(6), rng=random.Random(3))
+        self.jugar(bracket, 0)
+        copia = Bracket.from_dict(bracket.to_dict())
+        self.assertEqual(copia.to_dict(), bracket.to_dict())
+        self.assertEqual([r.completed for r in copia.rounds], [r.completed for r in bracket.rounds])
+
+
+class AdaptadorLlavesTests(TorneosMixin, TestCase):
+    def setUp(self):
+        self.torneo = self.crear_torneo()
+
+    def test_llaves_antiguas_recuperan_enlaces(self):
+        for m in TournamentMatch.objects.filter(round__tournament=self.torneo):
+            self.client.post(f'/torneos/{self.torneo.id}/marcar-ganador/{m.id}/{m.a_id}/')
+        TournamentMatch.objects.update(next_match=None, next_slot='')
+        semis = set(TournamentMatch.objects.filter(round__index=1).values_list('id', flat=True))
+
+        cuarto = TournamentMatch.objects.filter(round__index=0).first()
+        self.client.post(f'/torneos/{self.torneo.id}/marcar-ganador/{cuarto.id}/{cuarto.b_id}/')
+        # No se re-sortea: las semifinales siguen siendo los mismos partidos, ahora enlazados
+        self.assertEqual(set(TournamentMatch.objects.filter(round__index=1).values_list('id', flat=True)), semis)
+        cuarto.refresh_from_db()
+        self.assertIn(cuarto.next_match_id, semis)
+        self.assertEqual(getattr(cuarto.next_match, f'{cuarto.next_slot}_id'), cuarto.b_id)
+
+    def test_rally_top12_en_sesion(self):
+        self.crear_robots_con_tiempo(3)
+        self.client.get('/rally/llaves-top12/')
+        motor = Bracket.from_dict(self.client.session['rally_top12_bracket']['motor'])
+        partido = motor.rounds[0].matches[1]
+        self.client.post('/rally/llaves-top12/', {'round_index': 0, 'match_index': 1, 'winner_id': partido.a})
+        respuesta = self.client.get('/rally/llaves-top12/')
+        self.assertEqual([r['nombre'] for r in respuesta.context['rounds']], ['Semifinales', 'Final - Oro'])
+
+
+class ResultadoFutbolTests(TorneosMixin, TestCase):
+    def setUp(self):
+        self.torneo = self.crear_torneo('futbol', 3, prefijo='E')
+        self.partido = FootballGroupMatch.objects.filter(group__tournament=self.torneo).first()
+
+    def registrar(self, gh, ga):
+        url = f'/futbol/{self.torneo.id}/resultado/{self.partido.id}/'
+        self.client.post(url, {'goals_home': gh, 'goals_away': ga})
+
+    def contadores(self, team_id):
+        return FootballTeam.objects.values('pj', 'g', 'e', 'p', 'gf', 'gc', 'dg', 'pts').get(pk=team_id)
+
+    def test_reingresar_no_duplica(self):
+        self.registrar(2, 0)
+        self.registrar(2, 0)
+        self.assertEqual(self.contadores(self.partido.home_id), dict(pj=1, g=1, e=0, p=0, gf=2, gc=0, dg=2, pts=3))
+
+    def test_contadores_de_avance(self):
+        self.registrar(2, 0)
+        self.registrar(1, 1)
+        self.torneo.refresh_from_db()
+        self.assertEqual((self.torneo.group_matches_played, self.torneo.group_matches_total), (1, 3))
+        pendientes = FootballGroupMatch.objects.filter(group__tournament=self.torneo, played=False)
+        for partido in pendientes:
+            self.client.post(f'/futbol/{self.torneo.id}/resultado/{partido.id}/', {'goals_home': 0, 'goals_away': 0})
+        self.partido.group.refresh_from_db()
+        self.assertTrue(self.partido.group.completed)
+        self.assertTrue(self.torneo.rounds.exists())
+
+    def test_correccion_aplica_diferencia(self):
+        self.registrar(2, 0)
+        self.registrar(1, 1)
+        self.assertEqual(self.contadores(self.partido.home_id), dict(pj=1, g=0, e=1, p=0, gf=1, gc=1, dg=0, pts=1))
+        self.assertEqual(self.contadores(self.partido.away_id), dict(pj=1, g=0, e=1, p=0, gf=1, gc=1, dg=0, pts=1))
+
+
+class TriadasTests(TorneosMixin, TestCase):
+    def test_contador_de_triadas_pendientes(self):
+        self.crear_robots_con_tiempo(6)
+        self.client.post('/rally/crear-torneo-top12/')
+        torneo = Tournament.objects.get(activo=True)
+        self.assertEqual((torneo.triads_decided, torneo.triads_total), (0, 2))
+        primera, segunda = torneo.rally_triads.all()
+        for _ in range(2):  # elegir dos veces el mismo ganador no descuenta dos veces
+            self.client.post(f'/rally/triadas/{torneo.id}/winner/{primera.id}/{primera.a_id}/')
+        torneo.refresh_from_db()
+        self.assertEqual(torneo.triads_pending, 1)
+        self.assertFalse(torneo.rounds.exists())
+        self.client.post(f'/rally/triadas/{torneo.id}/winner/{segunda.id}/{segunda.b_id}/')
+        self.assertTrue(torneo.rounds.exists())
+
+
+class PosicionesTests(TorneosMixin, TestCase):
+    def setUp(self):
+        self.torneo = self.crear_torneo('futbol', 3, prefijo='E')
+        self.partidos = list(FootballGroupMatch.objects.filter(group__tournament=self.torneo))
+
+    def registrar(self, partido, gh, ga):
+        self.client.post(f'/futbol/{self.torneo.id}/resultado/{partido.id}/', {'goals_home': gh, 'goals_away': ga})
+
+    def test_tabla_en_consultas_constantes_con_desempate_directo(self):
+        # Empate circular (cada uno gana uno): el resultado directo no separa, decide el nombre
+        for partido in self.partidos:
+            gana_local = partido.home.participant.nombre != 'E0' or partido.away.participant.nombre != 'E2'
+            self.registrar(partido, *((1, 0) if gana_local else (0, 1)))
+        with self.assertNumQueries(2):
+            tabla = next(iter(group_tables([self.torneo.id]).values()))
+        self.assertEqual([s.pts for s in tabla], [3, 3, 3])
+        self.assertEqual([s.nombre for s in tabla], ['E0', 'E1', 'E2'])
+
+    def test_resultado_directo_desempata(self):
+        a = Standing(1, 1, 1, 'A', pj=2, g=1, e=0, p=1, gf=2, gc=2)
+        b = Standing(2, 1, 2, 'B', pj=2, g=1, e=0, p=1, gf=2, gc=2)
+        self.assertEqual(sort_group([a, b], {(2, 1): (1, 0), (1, 2): (0, 1)}), [b, a])
+
+    def test_dos_primeros_de_un_grupo(self):
+        from .services_torneo import get_group_top_two
+
+        self.crear_torneo('futbol', ['X', 'Y', 'Z'], nombre='Otro')
+        self.registrar(self.partidos[0], 2, 1)
+        grupo = self.partidos[0].group
+        self.assertEqual(set(group_tables(group_ids=[grupo.id])), {grupo.id})
+        with self.assertNumQueries(2):
+            solo = get_group_top_two(grupo)
+        tablas = group_tables([self.torneo.id])
+        with self.assertNumQueries(0):
+            compartidas = get_group_top_two(grupo, tablas)
+        self.assertEqual(solo[0].team_id, self.partidos[0].home_id)
+        self.assertEqual([s.team_id for s in solo], [s.team_id for s in compartidas])
+
+    def test_verificar_y_reparar_contadores(self):
+        self.registrar(self.partidos[0], 2, 1)
+        FootballTeam.objects.filter(pk=self.partidos[0].home_id).update(pts=9, gf=0)
+        salida = StringIO()
+        call_command('verificar_posiciones', '--reparar', stdout=salida)
+        self.assertIn('Equipos reparados: 1', salida.getvalue())
+        equipo = FootballTeam.objects.get(pk=self.partidos[0].home_id)
+        self.assertEqual((equipo.pts, equipo.gf, equipo.dg), (3, 2, 1))
+        salida = StringIO()
+        call_command('verificar_posiciones', stdout=salida)
+        self.assertIn('con diferencias: 0', salida.getvalue())
+
+
+class ReplicaTests(SimpleTestCase):
+    def setUp(self):
+        self.ahora = timezone.now()
+        self.request = RequestFactory().get('/dashboard/')
+
+    def leer(self, atraso, cookie=None):
+        if cookie is not None:
+            self.request.COOKIES[replica.COOKIE_ESCRITURA] = str(cookie)
+        with mock.patch.object(replica, 'marca_replica', return_value=self.ahora - timedelta(seconds=atraso)):
+            return replica.puede_leer_replica(self.request)
+
+    def test_atraso_maximo(self):
+        self.assertTrue(self.leer(1))
+        self.assertFalse(self.leer(3600))
+
+    def test_lee_lo_propio_en_el_primario(self):
+        self.assertFalse(self.leer(5, cookie=self.ahora.timestamp()))
+        self.assertTrue(self.leer(5, cookie=self.ahora.timestamp() - 60))
+
+    def test_router_solo_dentro_de_vista_de_lectura(self):
+        router = replica.ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Robot))
+        token = replica._usar_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Robot), replica.alias())
+            self.assertEqual(router.db_for_write(Robot), 'default')
+        finally:
+            replica._usar_replica.reset(token)
+
+    def refrescar(self, copia_sqlite, firmas=()):
+        replica._ultimo.update(firma=None, latido=None)
+        self.addCleanup(replica._ultimo.update, firma=None, latido=None)
+        with mock.patch.object(replica, 'configurada', return_value=True), \
+                mock.patch.object(replica, 'es_copia_sqlite', return_value=copia_sqlite), \
+                mock.patch.object(replica, '_firma_primario', side_effect=list(firmas)), \
+                mock.patch.object(replica, 'marca_replica'), \
+                mock.patch.object(replica, '_escribir_latido') as latido, \
+                mock.patch.object(db_sqlite, 'copiar_en_linea') as copiar, \
+                mock.patch.dict(connections.databases, {replica.alias(): {'NAME': 'replica.sqlite3'}}):
+            for _ in range(max(len(firmas), 2)):
+                replica.refrescar()
+        return copiar.call_count, [c.args[0] for c in latido.call_args_list]
+
+    def test_copia_sqlite_solo_si_el_primario_cambio(self):
+        copias, latidos = self.refrescar(True, firmas=[('a',), ('a',), ('b',)])
+        self.assertEqual(copias, 2)
+        # El latido va a la réplica en cada pasada, nunca al primario
+        self.assertEqual(latidos, [replica.alias()] * 3)
+
+    def test_replica_del_motor_limita_los_latidos_en_el_primario(self):
+        copias, latidos = self.refrescar(False)
+        self.assertEqual((copias, latidos), (0, ['default']))
+
+
+class ArchivoTests(TorneosMixin, TestCase):
+    databases = {'default', 'archivo'}
+
+    def test_archivar_torneo_y_tiempos(self):
+        torneo = self.crear_torneo(participantes=['A', 'B', 'C'], nombre='Viejo')
+        Tournament.objects.update(activo=False)
+        categoria = Categoria.objects.create(nombre='rally')
+        robot = Robot.objects.create(categoria=categoria, nombre='R', autor_principal='A')
+        TiempoRegistro.objects.create(robot=robot, tiempo=12)
+        hace_un_ano = timezone.now() - timedelta(days=365)
+        TiempoRegistro.objects.update(fecha_registro=hace_un_ano)
+
+        call_command('archivar', '--dias', '30', '--pausa', '0', stdout=StringIO())
+
+        self.assertFalse(Tournament.objects.exists())
+        self.assertFalse(TiempoRegistro.objects.exists())
+        archivado = Tournament.objects.using('archivo').get(pk=torneo.pk)
+        self.assertEqual(archivado.fecha_creacion, torneo.fecha_creacion)
+        self.assertEqual(TournamentMatch.objects.using('archivo').count(), 2)
+        self.assertEqual(TiempoRegistro.objects.using('archivo').get().fecha_registro, hace_un_ano)
+        self.assertEqual(self.client.get(f'/torneos/{torneo.pk}/').status_code, 404)
+        respuesta = self.client.get(f'/torneos/{torneo.pk}/?archivo=1')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Viejo')
+        self.assertTrue(respuesta.context['en_archivo'])
+
+    def test_migraciones_de_datos_del_archivo_no_tocan_la_principal(self):
+        # `archivar` migra el archivo con --database; el router manda las escrituras a default
+        Categoria.objects.create(nombre='velocista', ttl_sesion=60)
+        self.crear_torneo('futbol', 3, prefijo='E')
+        editor = mock.Mock(connection=connections['archivo'])
+        with CaptureQueriesContext(connection) as consultas:
+            for modulo, funcion in (
+                ('0004_categoria_ttl_sesion_sesionregistro_expira_en', 'asignar_expiracion'),
+                ('0006_robot_nombre_unico_sin_mayusculas', 'renombrar_duplicados'),
+                ('0008_contadores_avance', 'calcular_contadores'),
+            ):
+                getattr(importlib.import_module(f'jurados.migrations.{modulo}'), funcion)(apps, editor)
+        self.assertEqual(consultas.captured_queries, [])
+
+    def test_robot_recreado_usa_el_del_archivo(self):
+        hace_un_ano = timezone.now() - timedelta(days=365)
+
+        def tiempo_antiguo(nombre):
+            categoria, _ = Categoria.objects.get_or_create(nombre='rally')
+            robot = Robot.objects.create(categoria=categoria, nombre=nombre, autor_principal='A')
+            TiempoRegistro.objects.create(robot=robot, tiempo=12)
+            TiempoRegistro.objects.update(fecha_registro=hace_un_ano)
+            call_command('archivar', '--dias', '30', '--sin-torneos', '--pausa', '0', stdout=StringIO())
+            return robot
+
+        original = tiempo_antiguo('Flash')
+        # Se borra la categoría (con el robot) y se vuelven a crear con otros ids
+        Categoria.objects.all().delete()
+        tiempo_antiguo('FLASH')
+
+        archivados = Robot.objects.using('archivo')
+        self.assertEqual(list(archivados.values_list('pk', 'nombre')), [(original.pk, 'Flash')])
+        self.assertEqual(Categoria.objects.using('archivo').get().pk, original.categoria_id)
+        self.assertEqual(set(TiempoRegistro.objects.using('archivo').values_list('robot_id', flat=True)), {original.pk})
+
+    def test_copia_incompleta_falla(self):
+        from . import archivo
+
+        categoria = Categoria.objects.create(nombre='rally')
+        Categoria.objects.using('archivo').create(pk=categoria.pk + 100, nombre='rally')
+        with self.assertRaises(archivo.ArchivoInconsistente):
+            archivo._copiar([(Categoria, [categoria])], 'archivo')
+
+    def test_sin_esquema_muestra_el_primario(self):
+        from . import archivo
+
+        torneo = self.crear_torneo(participantes=['A', 'B'], nombre='Actual')
+        archivo._con_esquema.clear()
+        self.addCleanup(archivo._con_esquema.clear)
+        with mock.patch.object(connections['archivo'].introspection, 'table_names', return_value=[]):
+            respuesta = self.client.get(f'/torneos/{torneo.pk}/?archivo=1')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Actual')
+        self.assertTrue(respuesta.context['sin_archivo'])
+        self.assertFalse(respuesta.context['en_archivo'])
+
+
+class RespaldoTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.origen = os.path.join(self.tmp.name, 'origen.sqlite3')
+        conn = sqlite3.connect(self.origen)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('CREATE TABLE t (x TEXT)')
+        conn.executemany('INSERT INTO t VALUES (?)', [('x' * 200,)] * 2000)
+        conn.commit()
+        conn.close()
+
+    def test_respaldo_por_tramos_verificado_y_rotado(self):
+        destino = os.path.join(self.tmp.name, 'respaldos')
+        for nombre in ('db-20000101-000000.sqlite3', 'db-20000102-000000.sqlite3'):
+            os.makedirs(destino, exist_ok=True)
+            open(os.path.join(destino, nombre), 'w').close()
+        with mock.patch.dict(connections['default'].settings_dict, {'NAME': self.origen}):
+            r = respaldos.respaldar(destino, paginas=20, pausa=0, conservar=2)
+        self.assertGreater(r['pasos'], 1)
+        # La sonda toma y suelta el lock sin escribir: no reinicia la copia
+        self.assertEqual(r['reinicios'], 0)
+        self.assertGreater(r['mediciones_sonda'], 0)
+        self.assertEqual(sorted(os.listdir(destino)), ['db-20000102-000000.sqlite3', os.path.basename(r['archivo'])])
+        conn = sqlite3.connect(r['archivo'])
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM t').fetchone()[0], 2000)
+        conn.close()
+
+    def test_sonda_mide_la_espera_por_el_lock_de_escritura(self):
+        # En WAL la copia no hace esperar a nadie: lo que mide la sonda es otro escritor con el lock
+        escribiendo = threading.Event()
+
+        def jurado():
+            escritor = sqlite3.connect(self.origen, isolation_level=None)
+            escritor.execute('BEGIN IMMEDIATE')
+            escritor.execute("INSERT INTO t VALUES ('y')")
+            escribiendo.set()
+            time.sleep(0.3)
+            escritor.execute('COMMIT')
+            escritor.close()
+
+        hilo = threading.Thread(target=jurado)
+        hilo.start()
+        escribiendo.wait(2)
+        destino = os.path.join(self.tmp.name, 'respaldos')
+        with mock.patch.dict(connections['default'].settings_dict, {'NAME': self.origen}):
+            r = respaldos.respaldar(destino, paginas=20, pausa=0.05, conservar=2, intervalo_sonda=0.1)
+            sin_sonda = respaldos.respaldar(destino, paginas=-1, pausa=0, conservar=2, intervalo_sonda=0)
+        hilo.join()
+        self.assertTrue(r['journal_mode_wal'])
+        self.assertGreater(r['max_espera_lock_escritura_ms'], 100)
+        self.assertEqual(r['esperas_agotadas'], 0)
+        self.assertEqual(sin_sonda['mediciones_sonda'], 0)
+
+    def test_sonda_no_baja_del_intervalo_minimo(self):
+        self.assertEqual(respaldos.Sonda(self.origen, 0.001).intervalo, respaldos.SONDA_MIN)
+
+
+class HistorialTiemposTests(TestCase):
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre='rally')
+        self.robot = Robot.objects.create(categoria=categoria, nombre='R', autor_principal='A')
+        TiempoRegistro.objects.bulk_create([TiempoRegistro(robot=self.robot, tiempo=10 + i) for i in range(60)])
+        # Varios tiempos con la misma fecha: el id desempata
+        base = timezone.now()
+        for i, pk in enumerate(TiempoRegistro.objects.order_by('id').values_list('id', flat=True)):
+            TiempoRegistro.objects.filter(pk=pk).update(fecha_registro=base - timedelta(seconds=i // 4))
+
+    def test_paginas_cubren_todo_sin_repetir(self):
+        respuesta = self.client.get(f'/robot/{self.robot.id}/')
+        vistos = [t.id for t in respuesta.context['tiempos']]
+        cursor = respuesta.context['cursor_siguiente']
+        while cursor:
+            datos = self.client.get(f'/robot/{self.robot.id}/tiempos-anteriores/', {'cursor': cursor, 'formato': 'json'}).json()
+            vistos += [t['id'] for t in datos['tiempos']]
+            cursor = datos['cursor_siguiente']
+        esperado = list(TiempoRegistro.objects.order_by('-fecha_registro', '-id').values_list('id', flat=True))
+        self.assertEqual(vistos, esperado)
+
+    def test_fragmento_html(self):
+        cursor = self.client.get(f'/robot/{self.robot.id}/').context['cursor_siguiente']
+        respuesta = self.client.get(f'/robot/{self.robot.id}/tiempos-anteriores/', {'cursor': cursor})
+        self.assertEqual(respuesta.content.count(b'<tr'), 25)
+        self.assertIn('X-Cursor-Siguiente', respuesta.headers)
+        self.assertEqual(self.client.get(f'/robot/{self.robot.id}/tiempos-anteriores/', {'cursor': 'x'}).status_code, 400)
+
+
+class CategoriaPaginadaTests(TestCase):
+    assertUsaIndice = IndicesConsultasFrecuentesTests.assertUsaIndice
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='rally')
+        robots = Robot.objects.bulk_create([
+            Robot(categoria=self.categoria, nombre=f'{"Alfa" if i % 2 else "beta"}-{i:02d}', autor_principal='A')
+            for i in range(50)
+        ])
+        # Un tiempo por robot (decreciente) y uno inválido más rápido que no cuenta
+        TiempoRegistro.objects.bulk_create(
+            [TiempoRegistro(robot=r, tiempo=100 - i) for i, r in enumerate(robots)]
+            + [TiempoRegistro(robot=robots[0], tiempo=1, valido=False)]
+        )
+
+    def test_prefijo_usa_indice(self):
+        qs = Robot.objects.listado(self.categoria, 'alf')
+        self.assertUsaIndice(qs, 'robot_categoria_nombre_ci_uniq')
+        self.assertNotIn('TEMP B-TREE', qs.explain())
+        self.assertEqual(qs.count(), 25)
+        self.assertEqual(Robot.objects.listado(self.categoria, 'BETA-1').count(), 5)
+
+    def test_primera_pantalla(self):
+        respuesta = self.client.get('/categoria/rally/')
+        self.assertEqual(len(respuesta.context['robots']), 24)
+        self.assertEqual(len(respuesta.context['ranking']), 20)
+        self.assertEqual(respuesta.context['ranking_siguiente'], 20)
+        respuesta = self.client.get('/categoria/rally/', {'q': 'alfa', 'pagina': 2})
+        self.assertEqual([r.nombre for r in respuesta.context['robots']], ['Alfa-49'])
+
+    def test_ranking_incremental(self):
+        posiciones, desde = [], 0
+        while desde is not None:
+            datos = self.client.get('/categoria/rally/ranking/', {'desde': desde, 'formato': 'json'}).json()
+            posiciones += datos['ranking']
+            desde = datos['desde_siguiente']
+        self.assertEqual([p['posicion'] for p in posiciones], list(range(1, 51)))
+        self.assertEqual(Decimal(posiciones[0]['mejor_tiempo']), Decimal('51'))
+        fragmento = self.client.get('/categoria/rally/ranking/', {'desde': 40})
+        self.assertEqual(fragmento.content.count(b'<tr'), 10)
+        self.assertNotIn('X-Desde-Siguiente', fragmento.headers)
+        self.assertEqual(self.client.get('/categoria/rally/ranking/', {'desde': 'x'}).status_code, 400)
+
+
+class AdminTablasGrandesTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser('admin', 'a@a.com', 'x'))
+        self.categoria = Categoria.objects.create(nombre='rally')
+        self.robot = Robot.objects.create(categoria=self.categoria, nombre='R1', autor_principal='A')
+        self.otro = Robot.objects.create(categoria=self.categoria, nombre='R2', autor_principal='A')
+        TiempoRegistro.objects.bulk_create([TiempoRegistro(robot=self.robot, tiempo=10 + i) for i in range(30)])
+
+    def accion(self, modelo, accion, ids, **extra):
+        return self.client.post(f'/admin/jurados/{modelo}/', {
+            'action': accion, '_selected_action': ids, 'index': 0, **extra,
+        })
+
+    def test_conteo_sin_count_de_tabla(self):
+        from jurados.admin import ConteoEstimadoPaginator
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(ConteoEstimadoPaginator(TiempoRegistro.objects.all(), 25).count, 30)
+        self.assertNotIn('COUNT(', ctx.captured_queries[0]['sql'])
+        filtrado = ConteoEstimadoPaginator(TiempoRegistro.objects.filter(tiempo__lt=15), 25)
+        self.assertEqual(filtrado.count, 5)
+        respuesta = self.client.get('/admin/jurados/tiemporegistro/', {'categoria': self.categoria.pk})
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_acciones_en_un_update(self):
+        ids = list(TiempoRegistro.objects.values_list('pk', flat=True)[:10])
+        with CaptureQueriesContext(connection) as ctx:
+            self.accion('tiemporegistro', 'invalidar_tiempos', ids)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 1)
+        self.assertEqual(TiempoRegistro.objects.filter(valido=False).count(), 10)
+
+        self.accion('tiemporegistro', 'reasignar_robot', ids, robot_destino=self.otro.pk)
+        self.assertEqual(self.otro.tiempos.count(), 10)
+        self.accion('tiemporegistro', 'reasignar_robot', ids, robot_destino=9999)
+        self.assertEqual(self.otro.tiempos.count(), 10)
+
+        sesion = SesionRegistro.objects.create(robot=self.robot, activa=True)
+        self.accion('sesionregistro', 'cerrar_sesiones', [sesion.pk])
+        sesion.refresh_from_db()
+        self.assertFalse(sesion.activa)
+        self.assertIsNotNone(sesion.fecha_fin)
+
+    def test_changelists_de_torneos(self):
+        for modelo in ('tournament', 'tournamentparticipant', 'tournamentround', 'tournamentmatch',
+                       'rallytriad', 'footballgroup', 'footballteam', 'footballgroupmatch'):
+            self.assertEqual(self.client.get(f'/admin/jurados/{modelo}/').status_code, 200, modelo)
+
+
+class DashboardConsultasTests(TestCase):
+    def poblar(self, n):
+        from .services_torneo import create_football_groups, create_initial_round, generate_next_round
+        futbol = Tournament.objects.create(categoria='futbol', nombre=f'F{n}')
+        sumo = Tournament.objects.create(categoria='sumo_rc', nombre=f'S{n}')
+        for torneo in (futbol, sumo):
+            torneo.participants.bulk_create([TournamentParticipant(tournament=torneo, nombre=f'P{i}') for i in range(n)])
+        create_football_groups(futbol, max_group_size=4)
+        create_initial_round(sumo)
+        generate_next_round(sumo)
+        velocista, _ = Categoria.objects.get_or_create(nombre='velocista')
+        robots = Robot.objects.bulk_create([
+            Robot(categoria=velocista, nombre=f'V{n}-{i}', autor_principal='A') for i in range(n)
+        ])
+        TiempoRegistro.objects.bulk_create([TiempoRegistro(robot=r, tiempo=20 + i) for i, r in enumerate(robots)])
+
+    def consultas(self):
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.client.get('/dashboard/')
+        self.assertEqual(respuesta.status_code, 200)
+        return len(ctx.captured_queries), respuesta
+
+    def test_consultas_constantes(self):
+        self.poblar(4)
+        pocas, _ = self.consultas()
+        self.poblar(16)
+        muchas, respuesta = self.consultas()
+        self.assertEqual(pocas, muchas)
+        self.assertLessEqual(muchas, 7)
+        self.assertEqual(len(respuesta.context['futbol']['grupos']), 4)
+        self.assertEqual(len(respuesta.context['velocista_ranking']), 20)
+        self.assertEqual(respuesta.context['velocista_ranking'][0]['nombre'], 'V4-0')
+
+
+class ConcurrenciaOptimistaTests(TorneosMixin, TestCase):
+    def setUp(self):
+        self.torneo = self.crear_torneo()
+        self.partido = TournamentMatch.objects.filter(round__tournament=self.torneo).first()
+
+    def test_ganador_con_version_vieja_devuelve_409(self):
+        url = f'/torneos/{self.torneo.id}/marcar-ganador/{self.partido.id}/{self.partido.a_id}/'
+        ok = self.client.post(url, {'version': 0}, headers={'x-requested-with': 'XMLHttpRequest'})
+        self.assertEqual(ok.json(), {'success': True, 'version': 1})
+        # Un segundo jurado que vio la versión 0 elige al otro competidor
+        otro = f'/torneos/{self.torneo.id}/marcar-ganador/{self.partido.id}/{self.partido.b_id}/'
+        conflicto = self.client.post(otro, {'version': 0}, headers={'x-requested-with': 'XMLHttpRequest'})
+        self.assertEqual(conflicto.status_code, 409)
+        self.assertEqual(conflicto.json()['actual']['winner_id'], self.partido.a_id)
+        self.assertEqual(conflicto.json()['actual']['version'], 1)
+        pagina = self.client.post(f'/torneos/{self.torneo.id}/guardar-ganador/{self.partido.id}/', {
+            'winner_participant_id': self.partido.b_id, 'version': 0,
+        })
+        self.assertEqual(pagina.status_code, 409)
+        self.assertContains(pagina, 'Conflicto de edición', status_code=409)
+        self.partido.refresh_from_db()
+        self.assertEqual(self.partido.winner_id, self.partido.a_id)
+
+    def test_persistir_sobre_estado_viejo_se_deshace(self):
+        from .services_torneo import VersionConflict, load_bracket, persist_bracket
+        bracket = load_bracket(self.torneo)
+        bracket.set_winner(0, 0, self.partido.a_id)
+        # Otro jurado guarda el mismo partido entre la lectura y la escritura
+        TournamentMatch.objects.filter(pk=self.partido.pk).update(winner=self.partido.b_id, version=5)
+        with self.assertRaises(VersionConflict):
+            persist_bracket(self.torneo, bracket)
+        self.partido.refresh_from_db()
+        self.assertEqual((self.partido.winner_id, self.partido.version), (self.partido.b_id, 5))
+
+    def test_compara_y_reserva_por_lotes(self):
+        from . import services_torneo
+        from .services_torneo import VersionConflict, load_bracket, persist_bracket
+
+        partidos = list(TournamentMatch.objects.filter(round__index=0, round__tournament=self.torneo).order_by('id'))
+        bracket = load_bracket(self.torneo)
+        for i, partido in enumerate(partidos):
+            bracket.set_winner(0, i, partido.a_id)
+        # El último partido (segundo lote) lo cambió otro jurado: se deshace también el primer lote
+        TournamentMatch.objects.filter(pk=partidos[-1].pk).update(version=7)
+        with mock.patch.object(services_torneo, 'CAS_BATCH', 2), CaptureQueriesContext(connection) as ctx:
+            with self.assertRaises(VersionConflict) as conflicto, transaction.atomic():
+                persist_bracket(self.torneo, bracket)
+        self.assertEqual(conflicto.exception.pk, partidos[-1].pk)
+        reservas = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "jurados_tournamentmatch" SET "version"')]
+        self.assertEqual(len(reservas), 2)
+        self.assertEqual(
+            list(TournamentMatch.objects.filter(pk__in=[p.pk for p in partidos]).order_by('id').values_list('version', flat=True)),
+            [0, 0, 0, 7],
+        )
+
+    def test_ronda_en_bloque(self):
+        ronda = self.torneo.rounds.get()
+        partidos = list(ronda.matches.all())
+        url = f'/torneos/{self.torneo.id}/guardar-ronda/{ronda.id}/'
+        invalido = self.client.post(url, {**{f'ganador_{m.id}': m.a_id for m in partidos}, f'ganador_{partidos[0].id}': partidos[1].a_id},
+                                    headers={'x-requested-with': 'XMLHttpRequest'})
+        self.assertEqual(invalido.status_code, 400)
+        self.assertFalse(TournamentMatch.objects.filter(round=ronda, winner__isnull=False).exists())
+
+        datos = {f'ganador_{m.id}': m.b_id for m in partidos}
+        datos.update({f'version_{m.id}': m.version for m in partidos})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(url, datos)
+        inserciones = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "jurados_tournamentround"')]
+        self.assertEqual(len(inserciones), 1)
+        semis = self.torneo.rounds.get(index=1)
+        self.assertEqual(
+            {p for m in semis.matches.all() for p in (m.a_id, m.b_id)},
+            {m.b_id for m in partidos},
+        )
+        # Reenviar el formulario con las versiones viejas es un conflicto
+        self.assertEqual(self.client.post(url, datos).status_code, 409)
+
+    def test_resultado_y_triada(self):
+        futbol = self.crear_torneo('futbol', ['A', 'B', 'C'], nombre='F')
+        partido = FootballGroupMatch.objects.filter(group__tournament=futbol).first()
+        url = f'/futbol/{futbol.id}/resultado/{partido.id}/'
+        self.client.post(url, {'goals_home': 2, 'goals_away': 0, 'version': 0})
+        conflicto = self.client.post(url, {'goals_home': 0, 'goals_away': 3, 'version': 0}, headers={'accept': 'application/json'})
+        self.assertEqual(conflicto.status_code, 409)
+        self.assertEqual((conflicto.json()['actual']['goals_home'], conflicto.json()['actual']['goals_away']), (2, 0))
+        self.assertEqual(FootballTeam.objects.get(pk=partido.away_id).gf, 0)
+
+        self.crear_robots_con_tiempo(3)
+        self.client.post('/rally/crear-torneo-top12/')
+        triada = Tournament.objects.get(categoria='rally', activo=True).rally_triads.get()
+        triada.version = 3
+        triada.save(update_fields=['version'])
+        url = f'/rally/triadas/{triada.tournament_id}/winner/{triada.id}/{triada.a_id}/'
+        self.assertEqual(self.client.post(url, {'version': 2}).status_code, 409)
+        self.assertEqual(self.client.post(url, {'version': 3}).status_code, 302)
+        triada.refresh_from_db()
+        self.assertEqual((triada.winner_id, triada.version), (triada.a_id, 4))
+
+
+class ResultadosEnBloqueTests(TorneosMixin, TestCase):
+    def setUp(self):
+        self.torneo = self.crear_torneo('futbol', 8, prefijo='E')
+        self.partidos = list(FootballGroupMatch.objects.filter(group__tournament=self.torneo).order_by('id'))
+
+    def test_grupo_completo_y_sembrado_una_vez(self):
+        grupo = self.partidos[0].group_id
+        del_grupo = [m for m in self.partidos if m.group_id == grupo]
+        datos = {}
+        for m in del_grupo:
+            datos.update({f'gl_{m.id}': 1, f'gv_{m.id}': 0, f'version_{m.id}': m.version})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(f'/futbol/{self.torneo.id}/resultados/', datos)
+        actualizaciones = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "jurados_footballteam"')]
+        self.assertEqual(len(actualizaciones), 1)
+        for standing in compute_standings([self.torneo.id]).values():
+            self.assertEqual(FootballTeam.objects.values(*STANDING_FIELDS).get(pk=standing.team_id), standing.counters())
+        self.torneo.refresh_from_db()
+        self.assertEqual(self.torneo.group_matches_played, len(del_grupo))
+        self.assertFalse(self.torneo.rounds.exists())
+
+        resto = {str(m.id): [0, 2] for m in self.partidos if m.group_id != grupo}
+        respuesta = self.client.post(f'/futbol/{self.torneo.id}/resultados/', {'resultados': resto}, content_type='application/json')
+        self.assertTrue(respuesta.json()['llaves_generadas'])
+        self.assertEqual(self.torneo.rounds.count(), 1)
+
+    def test_lote_invalido_no_escribe_nada(self):
+        primero, segundo = self.partidos[:2]
+        respuesta = self.client.post(f'/futbol/{self.torneo.id}/resultados/', {
+            f'gl_{primero.id}': 1, f'gv_{primero.id}': 1, f'gl_{segundo.id}': 2, f'gv_{segundo.id}': '',
+        }, headers={'x-requested-with': 'XMLHttpRequest'})
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = self.client.post(f'/futbol/{self.torneo.id}/resultados/', {
+            'resultados': {str(primero.id): [1, 1], '999999': [0, 0]},
+        }, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(FootballGroupMatch.objects.filter(played=True).exists())
+        self.assertFalse(FootballTeam.objects.filter(pj__gt=0).exists())
+
+    def test_goles_negativos_en_un_partido(self):
+        partido = self.partidos[0]
+        url = f'/futbol/{self.torneo.id}/resultado/{partido.id}/'
+        respuesta = self.client.post(url, {'goals_home': -1, 'goals_away': 0}, headers={'x-requested-with': 'XMLHttpRequest'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['error'], 'Los goles no pueden ser negativos.')
+        respuesta = self.client.post(url, {'goals_home': -1, 'goals_away': 0}, follow=True)
+        self.assertRedirects(respuesta, f'/futbol/{self.torneo.id}/')
+        self.assertContains(respuesta, 'Los goles no pueden ser negativos.')
+        self.assertFalse(FootballGroupMatch.objects.filter(played=True).exists())
+
+
+class RegistroEventosTests(TorneosMixin, TestCase):
+    def setUp(self):
+        self.torneo = self.crear_torneo()
+
+    def jugar_ronda(self, index, lado='a_id'):
+        for m in TournamentMatch.objects.filter(round__tournament=self.torneo, round__index=index):
+            self.client.post(f'/torneos/{self.torneo.id}/marcar-ganador/{m.id}/{getattr(m, lado)}/')
+
+    def llaves(self):
+        """Estado por posición: los partidos recreados al reconstruir tienen otros ids."""
+        return list(
+            TournamentMatch.objects.filter(round__tournament=self.torneo)
+            .order_by('round__index', 'id').values_list('round__index', 'a_id', 'b_id', 'winner_id', 'is_bye')
+        )
+
+    def test_si_falla_el_evento_no_queda_la_accion(self):
+        from .models import Evento
+
+        categoria = Categoria.objects.create(nombre='velocista')
+        robot = Robot.objects.create(categoria=categoria, nombre='Rayo', autor_principal='A')
+        sesion = SesionRegistro.iniciar(robot)
+        registro = TiempoRegistro.objects.create(robot=robot, tiempo=Decimal('12.5'))
+        base = f'/robot/{robot.id}'
+
+        def estado():
+            return (
+                list(SesionRegistro.objects.order_by('id').values_list('id', 'activa')),
+                list(TiempoRegistro.objects.order_by('id').values_list('id', 'tiempo', 'valido')),
+            )
+
+        antes = estado()
+        for url, datos in (
+            (f'{base}/iniciar-sesion/', {}),
+            (f'{base}/finalizar-sesion/', {}),
+            (f'{base}/agregar-tiempo-manual/', {'tiempo': '11.1', 'valido': 'on'}),
+            (f'{base}/editar-tiempo/{registro.id}/', {'tiempo': '9.9'}),
+            (f'{base}/eliminar-tiempo/{registro.id}/', {}),
+        ):
+            with self.subTest(url=url), mock.patch('jurados.views.eventos.registrar', side_effect=DatabaseError('disco lleno')):
+                with self.assertRaises(DatabaseError):
+                    self.client.post(url, datos)
+                self.assertEqual(estado(), antes)
+        self.assertTrue(SesionRegistro.objects.get(pk=sesion.pk).activa)
+        self.assertFalse(Evento.objects.filter(robot=robot).exists())
+
+    def test_acciones_quedan_registradas(self):
+        from .models import Evento, InstantaneaTorneo
+        self.jugar_ronda(0)
+        tipos = list(Evento.objects.filter(torneo=self.torneo).values_list('tipo', flat=True))
+        self.assertEqual(tipos, ['torneo_creado'] + ['ganador'] * 4)
+        self.assertTrue(InstantaneaTorneo.objects.filter(torneo=self.torneo, evento__tipo='torneo_creado').exists())
+
+        categoria = Categoria.objects.create(nombre='velocista')
+        robot = Robot.objects.create(categoria=categoria, nombre='Rayo', autor_principal='A')
+        self.client.post(f'/robot/{robot.id}/iniciar-sesion/')
+        self.client.post('/api/registrar-tiempo/', {'categoria': 'velocista', 'tiempo': '9.5'}, content_type='application/json')
+        self.assertEqual(list(Evento.objects.filter(robot=robot).values_list('tipo', flat=True)), ['sesion_inicio', 'tiempo'])
+
+        self.client.post('/torneos/categoria/sumo_rc/reiniciar/', {'pin': '0000'})
+        self.assertEqual(Evento.objects.filter(torneo=self.torneo).last().tipo, 'reinicio')
+
+    def test_reconstruir_hasta_un_evento(self):
+        from .models import Evento
+        self.jugar_ronda(0)
+        hasta = Evento.objects.filter(torneo=self.torneo).last().id
+        esperado = self.llaves()
+        # Error del jurado: cambia los ganadores de cuartos y juega las semifinales
+        self.jugar_ronda(0, 'b_id')
+        self.jugar_ronda(1)
+        self.assertNotEqual(self.llaves(), esperado)
+
+        salida = StringIO()
+        call_command('reconstruir_torneo', torneo=self.torneo.id, hasta=hasta, simular=True, stdout=salida)
+        self.assertIn('simulación', salida.getvalue())
+        self.assertNotEqual(self.llaves(), esperado)
+
+        call_command('reconstruir_torneo', torneo=self.torneo.id, hasta=hasta, stdout=StringIO())
+        self.assertEqual(self.llaves(), esperado)
+        reconstruccion = Evento.objects.filter(torneo=self.torneo).last()
+        self.assertEqual((reconstruccion.tipo, reconstruccion.datos['hasta']), ('reconstruccion', hasta))
+        # Se puede seguir jugando sobre el estado reconstruido
+        self.jugar_ronda(1)
+        self.assertTrue(self.torneo.rounds.get(index=1).completed)
+
+    def test_instantanea_y_cola_dan_el_mismo_estado(self):
+        from . import eventos
+        from .models import Evento, InstantaneaTorneo
+        with self.settings(EVENTOS_INSTANTANEA_CADA=3):
+            self.jugar_ronda(0)
+            self.jugar_ronda(1)
+            self.jugar_ronda(2)
+        self.assertGreater(InstantaneaTorneo.objects.filter(torneo=self.torneo).count(), 2)
+        ultimo = Evento.objects.filter(torneo=self.torneo).last().id
+        esperado = self.llaves()
+        # Desde la instantánea de creación (reproduce todo) y desde la más cercana (solo la cola)
+        InstantaneaTorneo.objects.filter(torneo=self.torneo).exclude(evento__tipo='torneo_creado').update(torneo_id=0)
+        completo = eventos.reconstruir(self.torneo.id, ultimo)
+        self.assertEqual(completo['reproducidos'], 7)
+        self.assertEqual(self.llaves(), esperado)
+        InstantaneaTorneo.objects.filter(torneo_id=0).update(torneo_id=self.torneo.id)
+        cola = eventos.reconstruir(self.torneo.id, ultimo)
+        self.assertLess(cola['reproducidos'], 3)
+        self.assertEqual(self.llaves(), esperado)
+
+    def test_reconstruir_resultados_de_futbol(self):
+        from . import eventos
+        from .models import Evento
+        futbol = self.crear_torneo('futbol', ['A', 'B', 'C'], nombre='F')
+        partidos = list(FootballGroupMatch.objects.filter(group__tournament=futbol).order_by('id'))
+        self.client.post(f'/futbol/{futbol.id}/resultados/', {'resultados': {str(partidos[0].id): [2, 1]}},
+                         content_type='application/json')
+        hasta = Evento.objects.filter(torneo=futbol).last().id
+        resto = {str(m.id): [0, 0] for m in partidos[1:]}
+        self.client.post(f'/futbol/{futbol.id}/resultados/', {'resultados': resto}, content_type='application/json')
+        self.assertTrue(futbol.rounds.exists())
+
+        eventos.reconstruir(futbol.id, hasta)
+        futbol.refresh_from_db()
+        self.assertFalse(futbol.rounds.exists())
+        self.assertEqual(futbol.group_matches_played, 1)
+        self.assertEqual(FootballGroupMatch.objects.filter(group__tournament=futbol, played=True).count(), 1)
+        for standing in compute_standings([futbol.id]).values():
+            self.assertEqual(FootballTeam.objects.values(*STANDING_FIELDS).get(pk=standing.team_id), standing.counters())
+        # Las versiones no bajan: el formulario anterior a la reconstrucción da conflicto
+        actual = FootballGroupMatch.objects.get(pk=partidos[1].pk)
+        self.assertGreater(actual.version, 1)
+
+
+class SincronizacionTests(TorneosMixin, TestCase):
+    def setUp(self):
+        self.torneo = self.crear_torneo(participantes=4)
+        self.partidos = list(TournamentMatch.objects.filter(round__tournament=self.torneo).order_by('id'))
+        categoria = Categoria.objects.create(nombre='velocista')
+        self.robot = Robot.objects.create(categoria=categoria, nombre='Rayo', autor_principal='A')
+
+    def sincronizar(self, acciones, desde=None):
+        return self.client.post('/api/sincronizar/', {'dispositivo': 'mesa-1', 'acciones': acciones, 'desde': desde},
+                                content_type='application/json')
+
+    def test_lote_en_orden_e_idempotente(self):
+        primero, segundo = self.partidos
+        acciones = [
+            {'id': 'a1', 'tipo': 'iniciar_sesion', 'robot': self.robot.id},
+            {'id': 'a2', 'tipo': 'tiempo', 'robot': self.robot.id, 'tiempo': '12.5', 'registrado_en': 1_000_000_000_000},
+            {'id': 'a3', 'tipo': 'ganador', 'torneo': self.torneo.id, 'partido': primero.id, 'ganador': primero.a_id, 'version': 0},
+            # Vio la versión 0 del mismo partido: conflicto, solo se deshace esta acción
+            {'id': 'a4', 'tipo': 'ganador', 'torneo': self.torneo.id, 'partido': primero.id, 'ganador': primero.b_id, 'version': 0},
+            {'id': 'a5', 'tipo': 'ganador', 'torneo': self.torneo.id, 'partido': segundo.id, 'ganador': segundo.b_id},
+        ]
+        respuesta = self.sincronizar(acciones).json()
+        self.assertEqual([r['ok'] for r in respuesta['resultados']], [True, True, True, False, True])
+        self.assertEqual(respuesta['resultados'][3]['error'], 'conflicto')
+        self.assertEqual(respuesta['resultados'][3]['actual']['winner_id'], primero.a_id)
+        tiempo = TiempoRegistro.objects.get(robot=self.robot)
+        self.assertEqual(tiempo.fecha_registro.year, 2001)
+        final = respuesta['delta']['torneos'][str(self.torneo.id)]['partidos'][-1]
+        self.assertEqual(final['round__index'], 1)
+        self.assertEqual({final['a_id'], final['b_id']}, {primero.a_id, segundo.b_id})
+
+        version = TournamentMatch.objects.get(pk=primero.pk).version
+
+        # El corte de Wi-Fi hizo perder la respuesta: el cliente reenvía el lote completo
+        reenvio = self.sincronizar(acciones + [{'id': 'a6', 'tipo': 'finalizar_sesion', 'robot': self.robot.id}]).json()
+        self.assertEqual([r['duplicada'] for r in reenvio['resultados']], [True] * 5 + [False])
+        self.assertEqual(reenvio['resultados'][3]['error'], 'conflicto')
+        self.assertEqual(TiempoRegistro.objects.filter(robot=self.robot).count(), 1)
+        self.assertEqual(TournamentMatch.objects.get(pk=primero.pk).version, version)
+
+    def test_delta_desde_el_cursor(self):
+        cursor = self.sincronizar([]).json()['delta']['cursor']
+        # Otro jurado marca un ganador desde la página
+        partido = self.partidos[0]
+        self.client.post(f'/torneos/{self.torneo.id}/marcar-ganador/{partido.id}/{partido.a_id}/')
+        delta = self.sincronizar([], desde=cursor).json()['delta']
+        self.assertEqual([e['tipo'] for e in delta['eventos']], ['ganador'])
+        self.assertGreater(delta['cursor'], cursor)
+        partidos = {p['id']: p for p in delta['torneos'][str(self.torneo.id)]['partidos']}
+        self.assertEqual((partidos[partido.id]['winner_id'], partidos[partido.id]['version']), (partido.a_id, 1))
+        self.assertEqual(self.sincronizar([], desde=delta['cursor']).json()['delta']['eventos'], [])
+
+    def test_lote_mal_formado_no_aplica_nada(self):
+        respuesta = self.sincronizar([
+            {'id': 'b1', 'tipo': 'iniciar_sesion', 'robot': self.robot.id},
+            {'id': 'b2', 'tipo': 'borrar_todo'},
+        ])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(SesionRegistro.objects.exists())
+        self.assertEqual(self.sincronizar([{'tipo': 'tiempo'}]).status_code, 400)
+
+    def test_campos_con_forma_incorrecta_solo_fallan_su_accion(self):
+        futbol = self.crear_torneo('futbol', ['A', 'B', 'C'], nombre='F')
+        ronda = self.torneo.rounds.get()
+        respuesta = self.sincronizar([
+            {'id': 'c1', 'tipo': 'iniciar_sesion', 'robot': self.robot.id},
+            {'id': 'c2', 'tipo': 'resultados', 'torneo': futbol.id, 'resultados': [1, 2]},
+            {'id': 'c3', 'tipo': 'ganadores_ronda', 'torneo': self.torneo.id, 'ronda': ronda.id,
+             'ganadores': {str(self.partidos[0].id): self.partidos[0].a_id}, 'versiones': [0]},
+            {'id': 'c4', 'tipo': 'finalizar_sesion', 'robot': self.robot.id},
+        ])
+        self.assertEqual(respuesta.status_code, 200)
+        resultados = respuesta.json()['resultados']
+        self.assertEqual([r['ok'] for r in resultados], [True, False, False, True])
+        self.assertIn('"resultados" debe ser un objeto', resultados[1]['error'])
+        self.assertIn('"versiones" debe ser un objeto', resultados[2]['error'])
+        self.assertEqual(SesionRegistro.objects.filter(robot=self.robot, activa=False).count(), 1)
+        self.assertFalse(FootballGroupMatch.objects.filter(played=True).exists())
+        self.assertEqual(AccionSincronizada.objects.count(), 4)
+
+    def test_torneo_mal_escrito_no_rompe_el_lote(self):
+        partido = self.partidos[0]
+        respuesta = self.sincronizar([
+            # "torneo" sobra en un tiempo: se ignora, no tumba el lote
+            {'id': 'd1', 'tipo': 'tiempo', 'robot': self.robot.id, 'tiempo': '11.2', 'torneo': 'abc'},
+            {'id': 'd2', 'tipo': 'ganador', 'torneo': 'abc', 'partido': partido.id, 'ganador': partido.a_id},
+            {'id': 'd3', 'tipo': 'ganador', 'torneo': [self.torneo.id], 'partido': partido.id, 'ganador': partido.a_id},
+            {'id': 'd4', 'tipo': 'ganador', 'torneo': self.torneo.id, 'partido': partido.id, 'ganador': partido.a_id},
+        ])
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual([r['ok'] for r in datos['resultados']], [True, False, False, True])
+        self.assertEqual(datos['resultados'][3]['torneo'], self.torneo.id)
+        self.assertEqual(list(datos['delta']['torneos']), [str(self.torneo.id)])
+        self.assertEqual(AccionSincronizada.objects.count(), 4)
+
+
+class CacheReferenciasTests(TorneosMixin, TransactionTestCase):
+    """Fuera de transacción (como las vistas en producción): TestCase envuelve todo en atomic y la caché no se usa."""
+
+    def setUp(self):
+        from . import referencias
+        self.referencias = referencias
+        referencias.invalidar()
+        self.addCleanup(referencias.invalidar)
+
+    def test_consultas_en_cero_y_se_invalida(self):
+        primero = self.crear_torneo(participantes=['A', 'B'], nombre='Primero')
+        self.client.get('/torneos/categoria/sumo_rc/')
+        with self.assertNumQueries(0):
+            respuesta = self.client.get('/torneos/categoria/sumo_rc/')
+        self.assertRedirects(respuesta, f'/torneos/{primero.id}/', fetch_redirect_response=False)
+
+        # Crear otro desactiva el anterior con un UPDATE en bloque y guarda el nuevo
+        segundo = self.crear_torneo(participantes=['A', 'B'], nombre='Segundo')
+        respuesta = self.client.get('/torneos/categoria/sumo_rc/')
+        self.assertRedirects(respuesta, f'/torneos/{segundo.id}/', fetch_redirect_response=False)
+        self.client.post('/torneos/categoria/sumo_rc/reiniciar/', {'pin': '0000'})
+        respuesta = self.client.get('/torneos/categoria/sumo_rc/')
+        self.assertRedirects(respuesta, '/torneos/categoria/sumo_rc/nuevo/', fetch_redirect_response=False)
+
+    def test_instancias_nuevas_y_contadores_al_dia(self):
+        Categoria.objects.create(nombre='velocista', ttl_sesion=60)
+        categoria = self.referencias.categoria('velocista')
+        categoria.ttl_sesion = 0
+        with self.assertNumQueries(0):
+            self.assertEqual(self.referencias.categoria('velocista').ttl_sesion, 60)
+        Categoria.objects.filter(pk=categoria.pk).update(ttl_sesion=5)
+        Categoria.objects.get(pk=categoria.pk).save()
+        self.assertEqual(self.referencias.categoria('velocista').ttl_sesion, 5)
+        self.assertIsNone(self.referencias.categoria('rally'))
+
+        torneo = self.crear_torneo(participantes=['A', 'B'])
+        self.assertEqual(self.referencias.torneo_activo('sumo_rc').pk, torneo.pk)
+        # Los contadores no se guardan en la caché: se leen de la base al usarlos
+        Tournament.objects.filter(pk=torneo.pk).update(triads_total=4)
+        self.assertEqual(self.referencias.torneo_activo('sumo_rc').triads_total, 4)
+
+    def test_dashboard_lee_los_contadores_juntos(self):
+        futbol = self.crear_torneo('futbol', 6, prefijo='E')
+        self.client.get('/dashboard/')
+        Tournament.objects.filter(pk=futbol.pk).update(group_matches_total=6, group_matches_pending=2)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/dashboard/')
+        self.assertContains(respuesta, '4 de 6 partidos jugados')
+        contadores = [q['sql'] for q in consultas.captured_queries if 'group_matches_' in q['sql']]
+        self.assertEqual(len(contadores), 1)
+
+    def test_dentro_de_una_transaccion_no_se_usa(self):
+        torneo = self.crear_torneo(participantes=['A', 'B'])
+        self.referencias.torneo_activo('sumo_rc')
+        with transaction.atomic():
+            Tournament.objects.filter(pk=torneo.pk).update(nombre='Dentro')
+            self.assertEqual(self.referencias.torneo_activo('sumo_rc').nombre, 'Dentro')
+            transaction.set_rollback(True)
+        self.assertEqual(self.referencias.torneo_activo('sumo_rc').nombre, 'T')
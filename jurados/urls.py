@@ -19,14 +19,18 @@ urlpatterns = [
     path('torneos/<int:torneo_id>/', views.torneo_detalle, name='torneo_detalle'),
     path('torneos/<int:torneo_id>/ver-llaves/', views.torneo_ver_llaves, name='torneo_ver_llaves'),
     path('torneos/<int:torneo_id>/guardar-ganador/<int:match_id>/', views.torneo_guardar_ganador, name='torneo_guardar_ganador'),
+    path('torneos/<int:torneo_id>/guardar-ronda/<int:round_id>/', views.torneo_guardar_ronda, name='torneo_guardar_ronda'),
     path('torneos/categoria/<str:categoria>/', views.torneo_categoria, name='torneo_categoria'),
     path('torneos/categoria/<str:categoria>/reiniciar/', views.torneo_reiniciar, name='torneo_reiniciar'),
     path('torneos/categoria/<str:categoria>/nuevo/', views.torneo_nuevo, name='torneo_nuevo'),
     path('torneos/<int:torneo_id>/marcar-ganador/<int:match_id>/<int:winner_participant_id>/', views.torneo_marcar_ganador, name='torneo_marcar_ganador'),
     path('futbol/<int:torneo_id>/', views.futbol_grupos, name='futbol_grupos'),
     path('futbol/<int:torneo_id>/resultado/<int:match_id>/', views.futbol_registrar_resultado, name='futbol_registrar_resultado'),
+    path('futbol/<int:torneo_id>/resultados/', views.futbol_registrar_resultados, name='futbol_registrar_resultados'),
     path('categoria/<str:categoria_nombre>/', views.categoria_detalle, name='categoria_detalle'),
+    path('categoria/<str:categoria_nombre>/ranking/', views.categoria_ranking, name='categoria_ranking'),
     path('robot/<int:robot_id>/', views.robot_detalle, name='robot_detalle'),
+    path('robot/<int:robot_id>/tiempos-anteriores/', views.robot_tiempos_anteriores, name='robot_tiempos_anteriores'),
     
     # CRUD de robots
     path('categoria/<str:categoria_nombre>/agregar-robot/', views.agregar_robot, name='agregar_robot'),
@@ -47,4 +51,8 @@ urlpatterns = [
     
     # API para ESP32
     path('api/registrar-tiempo/', views.api_registrar_tiempo, name='api_registrar_tiempo'),
+    # Sincronización por lotes de las tabletas de jurados
+    path('api/sincronizar/', views.api_sincronizar, name='api_sincronizar'),
+    path('api/diagnostico/latencias/', views.api_diagnostico_latencias, name='api_diagnostico_latencias'),
+    path('api/diagnostico/replica/', views.api_diagnostico_replica, name='api_diagnostico_replica'),
 ]
@@ -5,27 +5,58 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.db import transaction, IntegrityError
+from django.db.models import Prefetch, prefetch_related_objects
 from django.conf import settings
 from django.views.decorators.http import require_GET
 from django.urls import reverse
+from django.core.paginator import Paginator
 import json
+import time
+from datetime import datetime, timezone as dt_timezone
 from decimal import Decimal
 
+from . import archivo, eventos, metricas, referencias, replica, sincronizacion
+from .bracket import Bracket
 from .models import Categoria, Robot, SesionRegistro, TiempoRegistro
-from .models import Tournament, TournamentParticipant, TournamentRound, TournamentMatch, FootballGroup, FootballGroupMatch
+from .models import Tournament, TournamentParticipant, TournamentRound, TournamentMatch, FootballGroup, FootballGroupMatch, FootballTeam
 from .services_torneo import (
     create_initial_round,
+    create_initial_round_with_participants,
     generate_next_round,
     create_football_groups,
     record_group_result,
+    record_group_results,
     are_all_group_matches_played,
     seed_knockout_from_groups,
     regenerate_following_from,
+    set_match_winner,
+    set_round_winners,
     create_rally_triads,
     rally_triads_completed,
+    set_triad_winner,
     seed_semifinals_from_triads,
+    deactivate_tournaments,
+    VersionConflict,
 )
 
+def _version_enviada(request):
+    """Versión que el jurado tenía a la vista (campo `version` del formulario); None si no la envió."""
+    valor = request.POST.get('version', '').strip()
+    return int(valor) if valor else None
+
+def _respuesta_conflicto(request, conflicto, volver):
+    """409 con el estado actual: JSON para fetch/XHR, página con enlace de vuelta para formularios."""
+    datos = {
+        'success': False,
+        'error': 'conflicto',
+        'mensaje': 'Otro jurado modificó este registro. Revisa el estado actual antes de volver a guardar.',
+        'actual': conflicto.current(),
+    }
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest' or 'application/json' in request.headers.get('accept', ''):
+        return JsonResponse(datos, status=409)
+    objeto = conflicto.model.objects.filter(pk=conflicto.pk).first()
+    return render(request, 'jurados/conflicto.html', {**datos, 'objeto': objeto, 'volver': volver}, status=409)
+
 def home(request):
     """Vista principal con selección de categorías"""
     return render(request, 'jurados/home.html')
@@ -50,9 +81,11 @@ def parse_time_input(value: str) -> Decimal:
         return Decimal('-1')
 
 @require_GET
+@replica.vista_de_lectura
+@archivo.vista_con_archivo
 def tiempos_rally(request):
     """Tabla de mejores tiempos de Rally, de menor a mayor."""
-    categoria = get_object_or_404(Categoria, nombre='rally')
+    categoria = referencias.categoria_o_404('rally')
     robots = Robot.objects.filter(categoria=categoria, activo=True)
     ranking = []
     for robot in robots:
@@ -66,7 +99,7 @@ def tiempos_rally(request):
                 'mejor_tiempo': mejor,
             })
     ranking.sort(key=lambda x: x['mejor_tiempo'])
-    rally_active = Tournament.objects.filter(categoria='rally', activo=True).order_by('-fecha_creacion').first()
+    rally_active = referencias.torneo_activo('rally')
     triadas_pendientes = False
     if rally_active:
         triadas_pendientes = rally_active.rally_triads.exists() and not rally_active.rounds.exists()
@@ -80,7 +113,7 @@ def tiempos_rally(request):
 @require_http_methods(["GET", "POST"])
 def rally_llaves_top12(request):
     """Llaves al azar con Top 12 de Rally, con selección de ganadores (estado en sesión)."""
-    categoria = get_object_or_404(Categoria, nombre='rally')
+    categoria = referencias.categoria_o_404('rally')
 
     def build_top12_list():
         robots = Robot.objects.filter(categoria=categoria, activo=True)
@@ -92,52 +125,18 @@ def rally_llaves_top12(request):
         ranking_local.sort(key=lambda x: x['tiempo'])
         return ranking_local[:12]
 
-    def seed_initial_round(participants_list):
-        import random
-        shuffled = participants_list[:]
-        random.shuffle(shuffled)
-        matches_local = []
-        for i in range(0, len(shuffled), 2):
-            a = shuffled[i]
-            b = shuffled[i+1] if i+1 < len(shuffled) else None
-            matches_local.append({
-                'a_id': a['id'], 'a_nombre': a['nombre'],
-                'b_id': b['id'] if b else None, 'b_nombre': b['nombre'] if b else None,
-                'winner_id': a['id'] if b is None else None,
-                'is_bye': b is None,
-            })
-        return {'matches': matches_local}
-
-    def winners_of_round(round_obj):
-        wins = []
-        for m in round_obj['matches']:
-            if m['winner_id']:
-                wins.append({'id': m['winner_id'], 'nombre': m['a_nombre'] if m['winner_id']==m['a_id'] else m['b_nombre']})
-        return wins
-
-    def all_set(round_obj):
-        for m in round_obj['matches']:
-            if not m['winner_id']:
-                return False
-        return True
-
-    def make_next_round(prev_round):
-        winners = winners_of_round(prev_round)
-        if len(winners) <= 1:
-            return None
-        import random
-        random.shuffle(winners)
-        pairs = []
-        for i in range(0, len(winners), 2):
-            a = winners[i]
-            b = winners[i+1] if i+1 < len(winners) else None
-            pairs.append({
-                'a_id': a['id'], 'a_nombre': a['nombre'],
-                'b_id': b['id'] if b else None, 'b_nombre': b['nombre'] if b else None,
-                'winner_id': a['id'] if b is None else None,
-                'is_bye': b is None,
-            })
-        return {'matches': pairs}
+    def rounds_context(bracket_obj, nombres):
+        return [
+            {'nombre': r.nombre, 'matches': [
+                {
+                    'a_id': m.a, 'a_nombre': nombres.get(str(m.a)),
+                    'b_id': m.b, 'b_nombre': nombres.get(str(m.b)),
+                    'winner_id': m.winner, 'is_bye': m.is_bye,
+                }
+                for m in r.matches
+            ]}
+            for r in bracket_obj.rounds
+        ]
 
     # Reset bracket if requested
     if request.method == 'POST' and request.POST.get('reset') == '1':
@@ -145,16 +144,17 @@ def rally_llaves_top12(request):
             del request.session['rally_top12_bracket']
         return redirect('jurados:rally_llaves_top12')
 
-    # Initialize bracket in session if missing
-    bracket = request.session.get('rally_top12_bracket')
-    if not bracket:
+    # Initialize bracket in session if missing (o si quedó en el formato anterior)
+    state = request.session.get('rally_top12_bracket')
+    if not state or 'motor' not in state:
         top12 = build_top12_list()
-        initial = seed_initial_round(top12)
-        bracket = {
-            'rounds': [initial],
+        state = {
+            'motor': Bracket.create([r['id'] for r in top12]).to_dict(),
+            'nombres': {str(r['id']): r['nombre'] for r in top12},
             'num_participants': len(top12),
         }
-        request.session['rally_top12_bracket'] = bracket
+        request.session['rally_top12_bracket'] = state
+    bracket = Bracket.from_dict(state['motor'])
 
     # Handle winner selection
     if request.method == 'POST' and request.POST.get('winner_id'):
@@ -166,45 +166,36 @@ def rally_llaves_top12(request):
             messages.error(request, 'Datos de partido inválidos.')
             return redirect('jurados:rally_llaves_top12')
         try:
-            match_obj = bracket['rounds'][r_idx]['matches'][m_idx]
-        except (IndexError, KeyError):
+            bracket.set_winner(r_idx, m_idx, winner_id)
+        except IndexError:
             messages.error(request, 'Partido no encontrado.')
             return redirect('jurados:rally_llaves_top12')
-        # Validar ganador pertenezca al match
-        if winner_id not in filter(None, [match_obj.get('a_id'), match_obj.get('b_id')]):
+        except ValueError:
             messages.error(request, 'Ganador inválido para este partido.')
             return redirect('jurados:rally_llaves_top12')
-        match_obj['winner_id'] = winner_id
-        # Si ronda completa, generar siguiente
-        if all_set(bracket['rounds'][r_idx]):
-            nxt = make_next_round(bracket['rounds'][r_idx])
-            if nxt:
-                # truncar rondas futuras si existían
-                bracket['rounds'] = bracket['rounds'][:r_idx+1]
-                bracket['rounds'].append(nxt)
-        request.session['rally_top12_bracket'] = bracket
+        state['motor'] = bracket.to_dict()
+        request.session['rally_top12_bracket'] = state
         return redirect('jurados:rally_llaves_top12')
 
     return render(request, 'jurados/rally_llaves_top12.html', {
         'categoria': categoria,
-        'rounds': bracket['rounds'],
-        'num_participants': bracket['num_participants'],
+        'rounds': rounds_context(bracket, state['nombres']),
+        'num_participants': state['num_participants'],
     })
 
 @require_http_methods(["POST"])
 def rally_crear_torneo_top12(request):
     """Crea un Tournament persistente para Rally con el Top 12 y redirige a llaves (misma UX que Sumo)."""
-    categoria = get_object_or_404(Categoria, nombre='rally')
+    categoria = referencias.categoria_o_404('rally')
     # Si ya hay un torneo activo de rally, no crear otro; redirigir al existente
-    existente = Tournament.objects.filter(categoria='rally', activo=True).order_by('-fecha_creacion').first()
+    existente = referencias.torneo_activo('rally')
     if existente:
         # Si hay triadas pendientes, continúa ese flujo
         if existente.rally_triads.exists() and not existente.rounds.exists():
             messages.info(request, 'Ya existe una eliminatoria activa de Rally. Continuamos en llaves iniciales.')
             return redirect('jurados:rally_triadas', torneo_id=existente.id)
         # Si el existente está en otro formato (o ya tiene rondas), reinicia creando triadas
-        existente.activo = False
-        existente.save()
+        deactivate_tournaments('rally')
     robots = Robot.objects.filter(categoria=categoria, activo=True)
     ranking = []
     for r in robots:
@@ -216,13 +207,16 @@ def rally_crear_torneo_top12(request):
     if not top12:
         messages.error(request, 'No hay suficientes tiempos para crear el torneo (se requieren al menos 2).')
         return redirect('jurados:tiempos_rally')
-    # Desactivar torneos rally previos
-    Tournament.objects.filter(categoria='rally', activo=True).update(activo=False)
-    torneo = Tournament.objects.create(categoria='rally', nombre='Rally - Eliminatorias Top 12', activo=True)
-    for p in top12:
-        TournamentParticipant.objects.create(tournament=torneo, nombre=p['nombre'])
-    # Crear triadas iniciales (3 por llave)
-    create_rally_triads(torneo)
+    with transaction.atomic():
+        # Desactivar torneos rally previos
+        deactivate_tournaments('rally')
+        torneo = Tournament.objects.create(categoria='rally', nombre='Rally - Eliminatorias Top 12', activo=True)
+        TournamentParticipant.objects.bulk_create([
+            TournamentParticipant(tournament=torneo, nombre=p['nombre']) for p in top12
+        ])
+        # Crear triadas iniciales (3 por llave)
+        create_rally_triads(torneo)
+        eventos.registrar('torneo_creado', torneo.id, instantanea=True)
     messages.success(request, 'Torneo de Rally (Top 12) creado. Selecciona el ganador de cada triada para pasar a semifinales.')
     return redirect('jurados:rally_triadas', torneo_id=torneo.id)
 
@@ -261,8 +255,13 @@ def rally_triada_winner(request, torneo_id, triad_id, winner_id):
     if winner_id not in [getattr(triad.a, 'id', None), getattr(triad.b, 'id', None), getattr(triad.c, 'id', None)]:
         messages.error(request, 'Ganador inválido para esta triada.')
         return redirect('jurados:rally_triadas', torneo_id=torneo.id)
-    triad.winner_id = winner_id
-    triad.save()
+    try:
+        set_triad_winner(triad, winner_id, _version_enviada(request))
+    except ValueError:
+        messages.error(request, 'Versión inválida.')
+        return redirect('jurados:rally_triadas', torneo_id=torneo.id)
+    except VersionConflict as conflicto:
+        return _respuesta_conflicto(request, conflicto, reverse('jurados:rally_triadas', args=[torneo.id]))
     # Si todas completas, sembrar semifinales
     if rally_triads_completed(torneo):
         if not torneo.rounds.exists():
@@ -271,118 +270,231 @@ def rally_triada_winner(request, torneo_id, triad_id, winner_id):
     return redirect('jurados:rally_triadas', torneo_id=torneo.id)
 
 @require_GET
+@replica.vista_de_lectura
 def dashboard(request):
-    """Vista de dashboard TV con categorías: Fútbol, Sumo RC, Velocista"""
-    # Obtener torneo activo de fútbol (si existe) y sus grupos y rondas
-    torneo_futbol = Tournament.objects.filter(categoria='futbol', activo=True).first()
+    """Vista de dashboard TV con categorías: Fútbol, Sumo RC, Velocista.
+
+    Número fijo de consultas sin importar cuántos grupos, rondas o robots haya:
+    torneos activos (una), contadores de fútbol, rondas, partidos, grupos, equipos y
+    el ranking de velocista.
+    """
+    # Torneo activo más reciente de cada categoría del tablero (caché de referencias; una consulta si no está)
+    torneos = referencias.torneos_activos(['futbol', 'sumo_rc'])
+    torneo_futbol = torneos['futbol']
+    torneo_sumo = torneos['sumo_rc']
+    if torneo_futbol:
+        # La caché de referencias no guarda los contadores: se leen juntos para el tablero
+        torneo_futbol.refresh_from_db(fields=['group_matches_total', 'group_matches_pending'])
+    prefetch_related_objects(
+        [t for t in torneos.values() if t],
+        Prefetch('rounds__matches', queryset=TournamentMatch.objects.select_related('a', 'b', 'winner')),
+    )
+    if torneo_futbol:
+        prefetch_related_objects(
+            [torneo_futbol],
+            Prefetch('football_groups__teams', queryset=FootballTeam.objects.select_related('participant')),
+        )
+
     futbol_data = None
+    last_round_futbol = None
     if torneo_futbol:
-        grupos = torneo_futbol.football_groups.prefetch_related('teams__participant', 'matches__home__participant', 'matches__away__participant').all()
-        rounds = torneo_futbol.rounds.prefetch_related('matches__a', 'matches__b', 'matches__winner').all()
-        last_round_futbol = rounds.order_by('-index').first()
+        rounds_futbol = list(torneo_futbol.rounds.all())
+        last_round_futbol = rounds_futbol[-1] if rounds_futbol else None
         futbol_data = {
             'torneo': torneo_futbol,
-            'grupos': grupos,
-            'rounds': rounds,
+            'grupos': torneo_futbol.football_groups.all(),
+            'rounds': rounds_futbol,
         }
-    # Obtener torneos activos para sumo_rc y velocista si existen (en velocista mostramos ranking de robots)
-    torneo_sumo = Tournament.objects.filter(categoria='sumo_rc', activo=True).first()
-    rounds_sumo = torneo_sumo.rounds.prefetch_related('matches__a', 'matches__b', 'matches__winner').all() if torneo_sumo else []
-    last_round_sumo = rounds_sumo.order_by('-index').first() if torneo_sumo else None
-
-    # Para velocista usamos ranking desde modelos existentes
-    categoria_velocista = Categoria.objects.filter(nombre='velocista').first()
-    robots_vel = []
-    if categoria_velocista:
-        robots_queryset = categoria_velocista.robots.filter(activo=True)
-        ranking = []
-        for robot in robots_queryset:
-            mt = robot.mejor_tiempo()
-            if mt:
-                ranking.append({'nombre': robot.nombre, 'mejor_tiempo': mt, 'autor_principal': robot.autor_principal})
-        ranking.sort(key=lambda x: x['mejor_tiempo'])
-        robots_vel = ranking
+    rounds_sumo = list(torneo_sumo.rounds.all()) if torneo_sumo else []
+    last_round_sumo = rounds_sumo[-1] if rounds_sumo else None
+
+    # Ranking de velocista: una consulta con el mejor tiempo válido de cada robot
+    robots_vel = [
+        {'nombre': robot.nombre, 'mejor_tiempo': robot.mejor, 'autor_principal': robot.autor_principal}
+        for robot in Robot.objects.filter(categoria__nombre='velocista', activo=True)
+        .con_mejor_tiempo().filter(mejor__isnull=False).order_by('mejor', 'id')
+    ]
 
     context = {
         'futbol': futbol_data,
         'sumo_rounds': rounds_sumo,
-        'futbol_last_round': last_round_futbol if torneo_futbol else None,
+        'futbol_last_round': last_round_futbol,
         'sumo_last_round': last_round_sumo,
         'velocista_ranking': robots_vel,
     }
     return render(request, 'jurados/dashboard.html', context)
 
 @require_GET
+@replica.vista_de_lectura
+@archivo.vista_con_archivo
 def dashboard_rally(request, torneo_id: int = None):
     """Tablero TV para Rally: muestra llaves iniciales (triadas) y eliminatorias (semis/final)."""
     torneo = None
+    # En el archivo todos los torneos están inactivos
+    vigentes = Tournament.objects.filter(categoria='rally') if archivo.leyendo() else Tournament.objects.filter(categoria='rally', activo=True)
     if torneo_id:
-        torneo = Tournament.objects.filter(id=torneo_id, categoria='rally', activo=True).first()
+        torneo = vigentes.filter(id=torneo_id).first()
     if not torneo:
-        torneo = Tournament.objects.filter(categoria='rally', activo=True).order_by('-fecha_creacion').first()
+        torneo = vigentes.order_by('-fecha_creacion').first() if archivo.leyendo() else referencias.torneo_activo('rally')
     triads = []
     rounds = []
     if torneo:
         triads = list(torneo.rally_triads.select_related('a','b','c','winner').order_by('index'))
         rounds = list(torneo.rounds.prefetch_related('matches__a','matches__b','matches__winner').all())
+        if triads and 'triads_total' in torneo.get_deferred_fields():
+            # La caché de referencias no guarda los contadores: se leen juntos para el tablero
+            torneo.refresh_from_db(fields=['triads_total', 'triads_pending'])
     return render(request, 'jurados/dashboard_rally.html', {
         'torneo': torneo,
         'triads': triads,
         'rounds': rounds,
     })
 
+ROBOTS_POR_PAGINA = 24
+RANKING_POR_PAGINA = 20
+
+
+def _pagina_ranking(categoria, desde=0):
+    """Robots con tiempo válido ordenados por mejor tiempo desde la posición `desde` y la posición siguiente."""
+    robots = list(
+        Robot.objects.listado(categoria).con_mejor_tiempo()
+        .filter(mejor__isnull=False).order_by('mejor', 'id')[desde:desde + RANKING_POR_PAGINA + 1]
+    )
+    siguiente = desde + RANKING_POR_PAGINA if len(robots) > RANKING_POR_PAGINA else None
+    return robots[:RANKING_POR_PAGINA], siguiente
+
+
+@replica.vista_de_lectura
+@archivo.vista_con_archivo
 def categoria_detalle(request, categoria_nombre):
     """Vista de detalle de una categoría específica"""
     if categoria_nombre not in ['rally', 'velocista']:
         messages.error(request, 'Esta categoría no está disponible aún.')
         return redirect('jurados:home')
     
-    categoria, created = Categoria.objects.get_or_create(
+    categoria = referencias.categoria(categoria_nombre) or Categoria.objects.get_or_create(
         nombre=categoria_nombre,
         defaults={'activa': True}
-    )
-    
-    robots = Robot.objects.filter(categoria=categoria, activo=True).order_by('nombre')
-    
-    # Crear ranking basado en mejor tiempo
-    ranking = []
-    for robot in robots:
-        mejor_tiempo = robot.mejor_tiempo()
-        if mejor_tiempo:
-            ranking.append({
-                'robot': robot,
-                'mejor_tiempo': mejor_tiempo,
-                'nombre': robot.nombre,
-                'autor_principal': robot.autor_principal,
-                'autor_secundario': robot.autor_secundario,
-            })
+    )[0]
     
-    ranking.sort(key=lambda x: x['mejor_tiempo'])
+    busqueda = request.GET.get('q', '').strip()
+    robots = Paginator(Robot.objects.listado(categoria, busqueda).con_mejor_tiempo(), ROBOTS_POR_PAGINA)
+    pagina = robots.get_page(request.GET.get('pagina'))
+    ranking, desde_siguiente = _pagina_ranking(categoria)
     
     context = {
         'categoria': categoria,
-        'robots': robots,
+        'robots': pagina,
+        'busqueda': busqueda,
+        'hay_robots': bool(busqueda) or pagina.paginator.count > 0,
         'ranking': ranking,
+        'ranking_siguiente': desde_siguiente,
     }
     return render(request, 'jurados/categoria_detalle.html', context)
 
+@require_GET
+@replica.vista_de_lectura
+@archivo.vista_con_archivo
+def categoria_ranking(request, categoria_nombre):
+    """Siguientes filas del ranking (?desde=N) como fragmento HTML o, con ?formato=json, JSON."""
+    categoria = referencias.categoria_o_404(categoria_nombre)
+    try:
+        desde = int(request.GET.get('desde', 0))
+    except ValueError:
+        desde = -1
+    if desde < 0:
+        return JsonResponse({'success': False, 'error': 'Posición inválida'}, status=400)
+    ranking, siguiente = _pagina_ranking(categoria, desde)
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({
+            'success': True,
+            'ranking': [
+                {
+                    'posicion': desde + i,
+                    'id': robot.id,
+                    'nombre': robot.nombre,
+                    'mejor_tiempo': str(robot.mejor),
+                    'autor_principal': robot.autor_principal,
+                    'autor_secundario': robot.autor_secundario,
+                }
+                for i, robot in enumerate(ranking, start=1)
+            ],
+            'desde_siguiente': siguiente,
+        })
+    response = render(request, 'jurados/parciales/ranking_filas.html', {'ranking': ranking, 'desde': desde})
+    if siguiente is not None:
+        response['X-Desde-Siguiente'] = str(siguiente)
+    return response
+
+TIEMPOS_POR_PAGINA = 25
+
+
+def _cursor_tiempo(tiempo) -> str:
+    """Cursor opaco (microsegundos-id) del último tiempo de una página."""
+    return f"{int(tiempo.fecha_registro.timestamp() * 1_000_000)}-{tiempo.id}"
+
+
+def _leer_cursor(valor: str):
+    micros, pk = (int(parte) for parte in valor.split('-', 1))
+    fecha = datetime.fromtimestamp(micros // 1_000_000, tz=dt_timezone.utc).replace(microsecond=micros % 1_000_000)
+    return fecha, pk
+
+
+def _pagina_tiempos(robot, antes_de=None):
+    """Una página del historial y el cursor para pedir la siguiente (None si no hay más)."""
+    tiempos = list(TiempoRegistro.objects.historial(robot, antes_de)[:TIEMPOS_POR_PAGINA + 1])
+    siguiente = _cursor_tiempo(tiempos[TIEMPOS_POR_PAGINA - 1]) if len(tiempos) > TIEMPOS_POR_PAGINA else None
+    return tiempos[:TIEMPOS_POR_PAGINA], siguiente
+
+
 def robot_detalle(request, robot_id):
     """Vista de detalle de un robot específico"""
     robot = get_object_or_404(Robot, id=robot_id, activo=True)
-    tiempos = TiempoRegistro.objects.filter(robot=robot).order_by('-fecha_registro')
-    sesion_activa = SesionRegistro.objects.filter(robot=robot, activa=True).first()
+    tiempos, cursor_siguiente = _pagina_tiempos(robot)
+    sesion_activa = SesionRegistro.objects.vigentes().filter(robot=robot).first()
     
     context = {
         'robot': robot,
         'tiempos': tiempos,
+        'cursor_siguiente': cursor_siguiente,
         'sesion_activa': sesion_activa,
     }
     return render(request, 'jurados/robot_detalle.html', context)
 
+@require_GET
+def robot_tiempos_anteriores(request, robot_id):
+    """Página siguiente del historial (?cursor=...) como fragmento HTML o, con ?formato=json, JSON."""
+    robot = get_object_or_404(Robot, id=robot_id, activo=True)
+    try:
+        antes_de = _leer_cursor(request.GET['cursor'])
+    except (KeyError, ValueError, OverflowError):
+        return JsonResponse({'success': False, 'error': 'Cursor inválido'}, status=400)
+    tiempos, siguiente = _pagina_tiempos(robot, antes_de)
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({
+            'success': True,
+            'tiempos': [
+                {
+                    'id': t.id,
+                    'tiempo': str(t.tiempo),
+                    'fecha_registro': t.fecha_registro.isoformat(),
+                    'metodo_registro': t.metodo_registro,
+                    'valido': t.valido,
+                    'observaciones': t.observaciones,
+                }
+                for t in tiempos
+            ],
+            'cursor_siguiente': siguiente,
+        })
+    response = render(request, 'jurados/parciales/tiempos_filas.html', {'robot': robot, 'tiempos': tiempos})
+    if siguiente:
+        response['X-Cursor-Siguiente'] = siguiente
+    return response
+
 @require_http_methods(["POST"])
 def agregar_robot(request, categoria_nombre):
     """Agregar un nuevo robot a una categoría"""
-    categoria = get_object_or_404(Categoria, nombre=categoria_nombre)
+    categoria = referencias.categoria_o_404(categoria_nombre)
     
     nombre = request.POST.get('nombre', '').strip()
     autor_principal = request.POST.get('autor_principal', '').strip()
@@ -392,21 +504,8 @@ def agregar_robot(request, categoria_nombre):
         messages.error(request, 'El nombre del robot y el autor principal son obligatorios.')
         return redirect('jurados:categoria_detalle', categoria_nombre=categoria_nombre)
     
-    # Verificar duplicados por nombre en la categoría (incluyendo inactivos)
-    existente = Robot.objects.filter(categoria=categoria, nombre__iexact=nombre).first()
-    if existente:
-        if existente.activo:
-            messages.error(request, f'Ya existe un robot con el nombre "{nombre}" en esta categoría.')
-            return redirect('jurados:categoria_detalle', categoria_nombre=categoria_nombre)
-        # Reactivar registro inactivo y actualizar datos
-        existente.activo = True
-        existente.autor_principal = autor_principal
-        existente.autor_secundario = autor_secundario if autor_secundario else None
-        existente.save()
-        messages.success(request, f'Robot "{nombre}" reactivado exitosamente.')
-        return redirect('jurados:categoria_detalle', categoria_nombre=categoria_nombre)
-
-    # Crear nuevo con manejo de colisión de unicidad
+    # Alta en un solo paso: el índice único (categoria, LOWER(nombre)) detecta duplicados,
+    # incluso si dos mesas de inscripción registran el mismo nombre a la vez
     try:
         with transaction.atomic():
             Robot.objects.create(
@@ -416,20 +515,25 @@ def agregar_robot(request, categoria_nombre):
                 autor_secundario=autor_secundario if autor_secundario else None,
             )
         messages.success(request, f'Robot "{nombre}" agregado exitosamente.')
+        return redirect('jurados:categoria_detalle', categoria_nombre=categoria_nombre)
     except IntegrityError:
-        # Ya existe uno creado simultáneamente; recuperar y notificar
-        existente = Robot.objects.filter(categoria=categoria, nombre__iexact=nombre).first()
-        if existente:
-            if not existente.activo:
-                existente.activo = True
-                existente.autor_principal = autor_principal
-                existente.autor_secundario = autor_secundario if autor_secundario else None
-                existente.save()
-                messages.success(request, f'Robot "{nombre}" reactivado exitosamente.')
-            else:
-                messages.info(request, f'El robot "{nombre}" ya existía en esta categoría.')
-        else:
-            messages.error(request, 'No se pudo crear el robot por una colisión de unicidad inesperada.')
+        pass
+
+    # Ya existe (activo o inactivo): una sola búsqueda por el mismo índice
+    existente = Robot.objects.por_nombre(categoria, nombre).first()
+    if existente is None:
+        messages.error(request, 'No se pudo crear el robot por una colisión de unicidad inesperada.')
+    elif existente.activo:
+        messages.error(request, f'Ya existe un robot con el nombre "{nombre}" en esta categoría.')
+    # Reactivar registro inactivo; el filtro activo=False evita reactivarlo dos veces en paralelo
+    elif Robot.objects.filter(pk=existente.pk, activo=False).update(
+        activo=True,
+        autor_principal=autor_principal,
+        autor_secundario=autor_secundario if autor_secundario else None,
+    ):
+        messages.success(request, f'Robot "{nombre}" reactivado exitosamente.')
+    else:
+        messages.info(request, f'El robot "{nombre}" ya existía en esta categoría.')
     return redirect('jurados:categoria_detalle', categoria_nombre=categoria_nombre)
 
 @require_http_methods(["POST"])
@@ -445,15 +549,16 @@ def editar_robot(request, categoria_nombre, robot_id):
         messages.error(request, 'El nombre del robot y el autor principal son obligatorios.')
         return redirect('jurados:categoria_detalle', categoria_nombre=categoria_nombre)
     
-    # Verificar que no existe otro robot con el mismo nombre en la categoría (incluye inactivos)
-    if Robot.objects.filter(categoria=robot.categoria, nombre__iexact=nombre).exclude(id=robot.id).exists():
-        messages.error(request, f'Ya existe otro robot con el nombre "{nombre}" en esta categoría.')
-        return redirect('jurados:categoria_detalle', categoria_nombre=categoria_nombre)
-    
     robot.nombre = nombre
     robot.autor_principal = autor_principal
     robot.autor_secundario = autor_secundario if autor_secundario else None
-    robot.save()
+    # El índice único (categoria, LOWER(nombre)) rechaza otro robot con el mismo nombre (incluye inactivos)
+    try:
+        with transaction.atomic():
+            robot.save()
+    except IntegrityError:
+        messages.error(request, f'Ya existe otro robot con el nombre "{nombre}" en esta categoría.')
+        return redirect('jurados:categoria_detalle', categoria_nombre=categoria_nombre)
     
     messages.success(request, f'Robot "{nombre}" actualizado exitosamente.')
     return redirect('jurados:categoria_detalle', categoria_nombre=categoria_nombre)
@@ -472,19 +577,12 @@ def eliminar_robot(request, categoria_nombre, robot_id):
 @require_http_methods(["POST"])
 def iniciar_sesion(request, robot_id):
     """Iniciar sesión de registro de tiempo para un robot"""
-    robot = get_object_or_404(Robot, id=robot_id, activo=True)
+    robot = get_object_or_404(Robot.objects.select_related('categoria'), id=robot_id, activo=True)
     
-    # Finalizar cualquier sesión activa anterior
-    SesionRegistro.objects.filter(robot=robot, activa=True).update(
-        activa=False, 
-        fecha_fin=timezone.now()
-    )
-    
-    # Crear nueva sesión
-    sesion = SesionRegistro.objects.create(
-        robot=robot,
-        activa=True,
-    )
+    # Finalizar cualquier sesión activa anterior y crear una nueva (vence según el TTL de la categoría)
+    with transaction.atomic():
+        sesion = SesionRegistro.iniciar(robot)
+        eventos.registrar('sesion_inicio', robot_id=robot.id, sesion=sesion.id)
     
     return JsonResponse({'success': True, 'sesion_id': sesion.id})
 
@@ -493,9 +591,11 @@ def finalizar_sesion(request, robot_id):
     """Finalizar sesión de registro de tiempo"""
     robot = get_object_or_404(Robot, id=robot_id, activo=True)
     
-    sesion = SesionRegistro.objects.filter(robot=robot, activa=True).first()
+    sesion = SesionRegistro.objects.vigentes().filter(robot=robot).first()
     if sesion:
-        sesion.finalizar()
+        with transaction.atomic():
+            sesion.finalizar()
+            eventos.registrar('sesion_fin', robot_id=robot.id, sesion=sesion.id)
         return JsonResponse({'success': True})
     else:
         return JsonResponse({'success': False, 'error': 'No hay sesión activa'})
@@ -514,13 +614,15 @@ def agregar_tiempo_manual(request, robot_id):
             messages.error(request, 'El tiempo debe ser mayor a 0.')
             return redirect('jurados:robot_detalle', robot_id=robot_id)
         
-        TiempoRegistro.objects.create(
-            robot=robot,
-            tiempo=tiempo,
-            metodo_registro='manual',
-            valido=valido,
-            observaciones=observaciones,
-        )
+        with transaction.atomic():
+            registro = TiempoRegistro.objects.create(
+                robot=robot,
+                tiempo=tiempo,
+                metodo_registro='manual',
+                valido=valido,
+                observaciones=observaciones,
+            )
+            eventos.registrar('tiempo', robot_id=robot.id, accion='alta', registro=registro.id, tiempo=tiempo, valido=valido)
         
         messages.success(request, f'Tiempo {tiempo}s agregado exitosamente.')
         
@@ -547,7 +649,10 @@ def editar_tiempo(request, robot_id, tiempo_id):
         tiempo_registro.tiempo = nuevo_tiempo
         tiempo_registro.observaciones = observaciones
         tiempo_registro.valido = valido
-        tiempo_registro.save()
+        with transaction.atomic():
+            tiempo_registro.save()
+            eventos.registrar('tiempo', robot_id=robot.id, accion='edicion', registro=tiempo_registro.id,
+                              tiempo=nuevo_tiempo, valido=valido)
         
         messages.success(request, f'Tiempo actualizado a {nuevo_tiempo}s exitosamente.')
         
@@ -563,7 +668,9 @@ def eliminar_tiempo(request, robot_id, tiempo_id):
     tiempo_registro = get_object_or_404(TiempoRegistro, id=tiempo_id, robot=robot)
     
     tiempo_valor = tiempo_registro.tiempo
-    tiempo_registro.delete()
+    with transaction.atomic():
+        eventos.registrar('tiempo', robot_id=robot.id, accion='baja', registro=tiempo_registro.id, tiempo=tiempo_valor)
+        tiempo_registro.delete()
     
     messages.success(request, f'Tiempo {tiempo_valor}s eliminado exitosamente.')
     return redirect('jurados:robot_detalle', robot_id=robot_id)
@@ -580,14 +687,35 @@ def check_new_times(request, robot_id):
     
     return JsonResponse({'has_new_times': recent_times})
 
+def _epoch_ms(valor):
+    """Convierte un timestamp opcional del dispositivo (epoch en ms) a float."""
+    if valor in (None, ''):
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_registrar_tiempo(request):
-    """API para recibir tiempos desde ESP32"""
+    """API para recibir tiempos desde ESP32.
+
+    Campos opcionales para diagnóstico de latencia: `dispositivo` (id del ESP32),
+    `secuencia` (contador de envíos) y `enviado_en` (epoch en ms al enviar).
+    """
+    recibido_en = time.time()
+    t_recepcion = time.perf_counter()
     try:
         data = json.loads(request.body)
         categoria_nombre = data.get('categoria', '').lower()
         tiempo_valor = data.get('tiempo', '')
+        dispositivo = str(data.get('dispositivo') or request.META.get('REMOTE_ADDR') or 'desconocido')[:64]
+        enviado_en = _epoch_ms(data.get('enviado_en'))
+        try:
+            secuencia = int(data['secuencia']) if data.get('secuencia') not in (None, '') else None
+        except (TypeError, ValueError):
+            secuencia = None
         
         if categoria_nombre not in ['velocista', 'rally']:
             return JsonResponse({
@@ -599,17 +727,18 @@ def api_registrar_tiempo(request):
             tiempo = Decimal(str(tiempo_valor))
             if tiempo <= 0:
                 raise ValueError("Tiempo debe ser positivo")
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, ArithmeticError):
             return JsonResponse({
                 'success': False, 
                 'error': 'Tiempo inválido'
             }, status=400)
         
         # Buscar sesión activa en la categoría
-        categoria = Categoria.objects.get(nombre=categoria_nombre)
-        sesion_activa = SesionRegistro.objects.filter(
+        categoria = referencias.categoria(categoria_nombre)
+        if categoria is None:
+            raise Categoria.DoesNotExist
+        sesion_activa = SesionRegistro.objects.vigentes().filter(
             robot__categoria=categoria,
-            activa=True
         ).select_related('robot').first()
         
         if not sesion_activa:
@@ -617,6 +746,7 @@ def api_registrar_tiempo(request):
                 'success': False, 
                 'error': f'No hay sesión activa esperando tiempo para la categoría {categoria_nombre}'
             }, status=400)
+        t_validado = time.perf_counter()
         
         # Registrar el tiempo
         with transaction.atomic():
@@ -630,12 +760,30 @@ def api_registrar_tiempo(request):
             
             # Finalizar la sesión
             sesion_activa.finalizar()
+            eventos.registrar('tiempo', robot_id=sesion_activa.robot_id, accion='alta', registro=tiempo_registro.id,
+                              tiempo=tiempo, valido=True, sesion=sesion_activa.id)
+        t_commit = time.perf_counter()
+
+        etapas = {
+            metricas.ETAPA_VALIDACION: (t_validado - t_recepcion) * 1000,
+            metricas.ETAPA_COMMIT: (t_commit - t_validado) * 1000,
+            metricas.ETAPA_SERVIDOR: (t_commit - t_recepcion) * 1000,
+        }
+        # La etapa de red depende del reloj del dispositivo (NTP); se descartan valores negativos
+        if enviado_en is not None and recibido_en * 1000 >= enviado_en:
+            etapas[metricas.ETAPA_RED] = recibido_en * 1000 - enviado_en
+            etapas[metricas.ETAPA_TOTAL] = etapas[metricas.ETAPA_RED] + etapas[metricas.ETAPA_SERVIDOR]
+        metricas.latencias.registrar(dispositivo, etapas, secuencia)
         
         return JsonResponse({
             'success': True,
             'robot': sesion_activa.robot.nombre,
             'tiempo': str(tiempo),
-            'categoria': categoria_nombre
+            'categoria': categoria_nombre,
+            'secuencia': secuencia,
+            'recibido_en': round(recibido_en * 1000, 3),
+            'validado_en': round((recibido_en + t_validado - t_recepcion) * 1000, 3),
+            'confirmado_en': round((recibido_en + t_commit - t_recepcion) * 1000, 3),
         })
         
     except json.JSONDecodeError:
@@ -654,6 +802,35 @@ def api_registrar_tiempo(request):
             'error': f'Error interno: {str(e)}'
         }, status=500)
 
+@require_http_methods(["POST"])
+def api_sincronizar(request):
+    """Cola de acciones de una tableta de jurado: se aplica en orden y devuelve resultados y delta (ver sincronizacion.py)."""
+    try:
+        data = json.loads(request.body or b'{}')
+        if not isinstance(data, dict):
+            raise sincronizacion.LoteInvalido('Se esperaba un objeto JSON.')
+        respuesta = sincronizacion.sincronizar(
+            str(data.get('dispositivo') or request.META.get('REMOTE_ADDR') or '')[:64],
+            data.get('acciones', []),
+            data.get('desde'),
+        )
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido'}, status=400)
+    except sincronizacion.LoteInvalido as error:
+        return JsonResponse({'success': False, 'error': str(error)}, status=400)
+    return JsonResponse({'success': True, **respuesta})
+
+@require_GET
+def api_diagnostico_latencias(request):
+    """Histogramas de latencia de la ingesta ESP32 (por etapa y por dispositivo)."""
+    etapas = [e for e in request.GET.get('etapas', '').split(',') if e]
+    return JsonResponse(metricas.latencias.resumen(etapas))
+
+@require_GET
+def api_diagnostico_replica(request):
+    """Estado de la réplica de lectura: si está configurada y cuántos segundos de atraso tiene."""
+    return JsonResponse(replica.estado())
+
 def torneos_app(request):
     """Renderiza la app de torneos usando manifest de Vite para assets."""
     import json
@@ -690,7 +867,7 @@ def torneo_categoria(request, categoria: str):
     if categoria not in ['sumo_rc', 'sumo_autonomo', 'barcos', 'futbol']:
         messages.error(request, 'Categoría inválida.')
         return redirect('jurados:home')
-    torneo = Tournament.objects.filter(categoria=categoria, activo=True).order_by('-fecha_creacion').first()
+    torneo = referencias.torneo_activo(categoria)
     if torneo:
         if categoria == 'futbol':
             return redirect('jurados:futbol_grupos', torneo_id=torneo.id)
@@ -709,7 +886,7 @@ def torneo_reiniciar(request, categoria: str):
         messages.error(request, 'PIN incorrecto. Operación cancelada.')
         return redirect(next_url)
     # desactivar torneos previos
-    Tournament.objects.filter(categoria=categoria, activo=True).update(activo=False)
+    deactivate_tournaments(categoria)
     messages.success(request, 'Torneo reiniciado. Crea uno nuevo para continuar.')
     # Para rally volvemos a Tiempos Rally, para otras categorías mantenemos flujo actual
     if categoria == 'rally':
@@ -736,21 +913,28 @@ def torneo_nuevo(request, categoria):
             'nombre': nombre,
             'participantes_text': request.POST.get('participantes', '')
         }, status=400)
-    # desactivar torneos previos activos de esta categoría
-    Tournament.objects.filter(categoria=categoria, activo=True).update(activo=False)
-    torneo = Tournament.objects.create(categoria=categoria, nombre=nombre, activo=True)
-    for p in participantes:
-        TournamentParticipant.objects.create(tournament=torneo, nombre=p)
+    # nombres repetidos en el texto se toman una sola vez (únicos por torneo)
+    participantes = list(dict.fromkeys(participantes))
+    with transaction.atomic():
+        # desactivar torneos previos activos de esta categoría
+        deactivate_tournaments(categoria)
+        torneo = Tournament.objects.create(categoria=categoria, nombre=nombre, activo=True)
+        inscritos = TournamentParticipant.objects.bulk_create([
+            TournamentParticipant(tournament=torneo, nombre=p) for p in participantes
+        ])
+        if categoria == 'futbol':
+            create_football_groups(torneo)
+        else:
+            create_initial_round_with_participants(torneo, inscritos)
+        eventos.registrar('torneo_creado', torneo.id, instantanea=True)
     if categoria == 'futbol':
-        create_football_groups(torneo)
         messages.success(request, 'Torneo de Fútbol creado correctamente.')
         return redirect('jurados:futbol_grupos', torneo_id=torneo.id)
-    else:
-        create_initial_round(torneo)
-        messages.success(request, 'Torneo creado correctamente.')
-        return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
+    messages.success(request, 'Torneo creado correctamente.')
+    return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
 
 @require_GET
+@archivo.vista_con_archivo
 def torneo_detalle(request, torneo_id):
     torneo = get_object_or_404(Tournament, id=torneo_id)
     rounds = list(torneo.rounds.prefetch_related('matches__a', 'matches__b', 'matches__winner'))
@@ -766,13 +950,18 @@ def torneo_marcar_ganador(request, torneo_id, match_id, winner_participant_id):
     torneo = get_object_or_404(Tournament, id=torneo_id)
     match = get_object_or_404(TournamentMatch, id=match_id, round__tournament=torneo)
     winner = get_object_or_404(TournamentParticipant, id=winner_participant_id, tournament=torneo)
-    match.winner = winner
-    match.save()
-    # Re-generar a partir de la ronda actual (permite edición retroactiva)
-    regenerate_following_from(torneo, match.round)
+    try:
+        version = _version_enviada(request)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Versión inválida'}, status=400)
+    # Actualiza solo los partidos que dependen de este ganador (permite edición retroactiva)
+    try:
+        set_match_winner(torneo, match, winner, version)
+    except VersionConflict as conflicto:
+        return _respuesta_conflicto(request, conflicto, reverse('jurados:torneo_detalle', args=[torneo.id]))
     # Responder según tipo de petición
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        return JsonResponse({'success': True})
+        return JsonResponse({'success': True, 'version': match.version})
     messages.success(request, f'Se marcó ganador en el partido {match.id}.')
     return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
 
@@ -782,18 +971,60 @@ def torneo_guardar_ganador(request, torneo_id, match_id):
     match = get_object_or_404(TournamentMatch, id=match_id, round__tournament=torneo)
     try:
         winner_participant_id = int(request.POST.get('winner_participant_id'))
+        version = _version_enviada(request)
     except (TypeError, ValueError):
         messages.error(request, 'Debe seleccionar un ganador válido.')
         return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
     winner = get_object_or_404(TournamentParticipant, id=winner_participant_id, tournament=torneo)
-    match.winner = winner
-    match.save()
-    # Re-generar a partir de la ronda actual (permite edición retroactiva)
-    regenerate_following_from(torneo, match.round)
+    # Actualiza solo los partidos que dependen de este ganador (permite edición retroactiva)
+    try:
+        set_match_winner(torneo, match, winner, version)
+    except VersionConflict as conflicto:
+        return _respuesta_conflicto(request, conflicto, reverse('jurados:torneo_detalle', args=[torneo.id]))
     messages.success(request, 'Partido guardado.')
     return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
 
+def _ganadores_de_ronda(request):
+    """(ganadores, versiones) por pk de partido desde JSON {"ganadores": {...}, "versiones": {...}} o del formulario."""
+    if request.content_type == 'application/json':
+        data = json.loads(request.body or b'{}')
+        ganadores = {int(pk): int(w) for pk, w in (data.get('ganadores') or {}).items() if w not in (None, '')}
+        versiones = {int(pk): int(v) for pk, v in (data.get('versiones') or {}).items()}
+        return ganadores, versiones
+    ganadores, versiones = {}, {}
+    for clave, valor in request.POST.items():
+        if clave.startswith('ganador_') and valor:
+            ganadores[int(clave[len('ganador_'):])] = int(valor)
+        elif clave.startswith('version_') and valor:
+            versiones[int(clave[len('version_'):])] = int(valor)
+    return ganadores, versiones
+
+@require_http_methods(["POST"])
+def torneo_guardar_ronda(request, torneo_id, round_id):
+    """Registra todos los ganadores de una ronda en una transacción; las rondas siguientes se regeneran una vez."""
+    torneo = get_object_or_404(Tournament, id=torneo_id)
+    ronda = get_object_or_404(TournamentRound, id=round_id, tournament=torneo)
+    quiere_json = request.content_type == 'application/json' or request.headers.get('x-requested-with') == 'XMLHttpRequest'
+    try:
+        ganadores, versiones = _ganadores_de_ronda(request)
+        if not ganadores:
+            raise ValueError('No se indicó ningún ganador.')
+        registrados = set_round_winners(torneo, ronda, ganadores, versiones)
+    except VersionConflict as conflicto:
+        return _respuesta_conflicto(request, conflicto, reverse('jurados:torneo_detalle', args=[torneo.id]))
+    except (ValueError, TypeError, AttributeError) as error:
+        if quiere_json:
+            return JsonResponse({'success': False, 'error': str(error)}, status=400)
+        messages.error(request, f'No se guardó la ronda: {error}')
+        return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
+    if quiere_json:
+        versiones = dict(TournamentMatch.objects.filter(round=ronda).values_list('id', 'version'))
+        return JsonResponse({'success': True, 'registrados': registrados, 'versiones': versiones})
+    messages.success(request, f'{ronda.nombre}: {registrados} ganadores guardados.')
+    return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
+
 @require_GET
+@archivo.vista_con_archivo
 def futbol_grupos(request, torneo_id):
     torneo = get_object_or_404(Tournament, id=torneo_id, categoria='futbol')
     grupos = torneo.football_groups.prefetch_related('teams__participant', 'matches__home__participant', 'matches__away__participant').all()
@@ -813,6 +1044,57 @@ def torneo_ver_llaves(request, torneo_id):
         messages.success(request, 'Llaves generadas.')
     return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
 
+def _resultados_enviados(request):
+    """(resultados, versiones) por pk de partido desde JSON {"resultados": {pk: [gl, gv]}, "versiones": {...}} o del formulario.
+
+    En el formulario cada partido trae gl_<pk>, gv_<pk> y version_<pk>; los que vienen sin goles se omiten.
+    """
+    if request.content_type == 'application/json':
+        data = json.loads(request.body or b'{}')
+        resultados = {int(pk): (int(gl), int(gv)) for pk, (gl, gv) in (data.get('resultados') or {}).items()}
+        versiones = {int(pk): int(v) for pk, v in (data.get('versiones') or {}).items()}
+        return resultados, versiones
+    resultados, versiones = {}, {}
+    for clave, valor in request.POST.items():
+        if not clave.startswith('gl_'):
+            continue
+        pk = int(clave[len('gl_'):])
+        visitante = request.POST.get(f'gv_{pk}', '')
+        if valor == '' and visitante == '':
+            continue
+        if valor == '' or visitante == '':
+            raise ValueError('Falta un marcador: completa ambos goles o deja los dos vacíos.')
+        resultados[pk] = (int(valor), int(visitante))
+        if request.POST.get(f'version_{pk}'):
+            versiones[pk] = int(request.POST[f'version_{pk}'])
+    return resultados, versiones
+
+@require_http_methods(["POST"])
+def futbol_registrar_resultados(request, torneo_id):
+    """Registra varios resultados (un grupo o una fecha completa) en una transacción y revisa el cierre de grupos una vez."""
+    torneo = get_object_or_404(Tournament, id=torneo_id, categoria='futbol')
+    quiere_json = request.content_type == 'application/json' or request.headers.get('x-requested-with') == 'XMLHttpRequest'
+    try:
+        resultados, versiones = _resultados_enviados(request)
+        if not resultados:
+            raise ValueError('No se indicó ningún resultado.')
+        nuevas = record_group_results(resultados, versiones, tournament=torneo)
+    except VersionConflict as conflicto:
+        return _respuesta_conflicto(request, conflicto, reverse('jurados:futbol_grupos', args=[torneo.id]))
+    except (ValueError, TypeError, AttributeError) as error:
+        if quiere_json:
+            return JsonResponse({'success': False, 'error': str(error)}, status=400)
+        messages.error(request, f'No se guardaron los resultados: {error}')
+        return redirect('jurados:futbol_grupos', torneo_id=torneo.id)
+    llaves = are_all_group_matches_played(torneo) and seed_knockout_from_groups(torneo) is not None
+    if quiere_json:
+        return JsonResponse({'success': True, 'registrados': len(nuevas), 'versiones': nuevas, 'llaves_generadas': llaves})
+    if llaves:
+        messages.success(request, 'Fase de grupos completada. Llaves generadas automáticamente.')
+        return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
+    messages.success(request, f'Resultados registrados: {len(nuevas)}.')
+    return redirect('jurados:futbol_grupos', torneo_id=torneo.id)
+
 @require_http_methods(["POST"])
 def futbol_registrar_resultado(request, torneo_id, match_id):
     torneo = get_object_or_404(Tournament, id=torneo_id, categoria='futbol')
@@ -820,15 +1102,24 @@ def futbol_registrar_resultado(request, torneo_id, match_id):
     try:
         gh = int(request.POST.get('goals_home', '0'))
         ga = int(request.POST.get('goals_away', '0'))
+        version = _version_enviada(request)
     except ValueError:
         return JsonResponse({'success': False, 'error': 'Goles inválidos'}, status=400)
-    record_group_result(match, gh, ga)
+    try:
+        record_group_result(match, gh, ga, version)
+    except VersionConflict as conflicto:
+        return _respuesta_conflicto(request, conflicto, reverse('jurados:futbol_grupos', args=[torneo.id]))
+    except ValueError as error:
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest' or 'application/json' in request.headers.get('accept', ''):
+            return JsonResponse({'success': False, 'error': str(error)}, status=400)
+        messages.error(request, f'No se guardó el resultado: {error}')
+        return redirect('jurados:futbol_grupos', torneo_id=torneo.id)
     # Si todos los partidos de grupos están jugados, sembrar eliminación directa
     if are_all_group_matches_played(torneo):
         seed_knockout_from_groups(torneo)
         messages.success(request, 'Fase de grupos completada. Llaves generadas automáticamente.')
         return redirect('jurados:torneo_detalle', torneo_id=torneo.id)
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        return JsonResponse({'success': True})
+        return JsonResponse({'success': True, 'version': match.version})
     messages.success(request, 'Resultado registrado correctamente.')
     return redirect('jurados:futbol_grupos', torneo_id=torneo.id)
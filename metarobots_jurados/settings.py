@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'jurados.replica.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'metarobots_jurados.urls'
@@ -65,6 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'jurados.archivo.contexto',
             ],
         },
     },
@@ -76,13 +79,66 @@ WSGI_APPLICATION = 'metarobots_jurados.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Ajustes de SQLite para escrituras concurrentes de jurados y lecturas de los tableros.
+# Todos se pueden cambiar con variables de entorno METAROBOTS_SQLITE_*.
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('METAROBOTS_SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('METAROBOTS_SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('METAROBOTS_SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+    'mmap_size': os.environ.get('METAROBOTS_SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)),
+    'cache_size': os.environ.get('METAROBOTS_SQLITE_CACHE_SIZE', '-20000'),  # negativo = KiB
+    'temp_store': os.environ.get('METAROBOTS_SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # METAROBOTS_DB_PATH permite apuntar a otra base (p. ej. una desechable para pruebas de carga)
+        'NAME': os.environ.get('METAROBOTS_DB_PATH', BASE_DIR / 'db.sqlite3'),
+        # Conexiones persistentes por hilo con verificación antes de reutilizarlas
+        'CONN_MAX_AGE': int(os.environ.get('METAROBOTS_CONN_MAX_AGE', '300')),
+        'CONN_HEALTH_CHECKS': os.environ.get('METAROBOTS_CONN_HEALTH_CHECKS', '1') == '1',
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+            # IMMEDIATE toma el lock de escritura al iniciar atomic() y evita "database is locked"
+            # al promover una transacción de lectura a escritura. Los atomic() de la app escriben
+            # (servicios de torneo, altas, archivo, lote de sincronización); las lecturas que piden
+            # una vista consistente (verificar_posiciones sin --reparar) usan
+            # jurados.db_sqlite.transaccion_lectura (BEGIN DEFERRED) y no bloquean a los jurados.
+            # Las lecturas fuera de atomic() (vistas, tableros, delta de sincronización) no toman lock.
+            'transaction_mode': os.environ.get('METAROBOTS_SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        },
     }
 }
 
+# Réplica de solo lectura opcional (tableros y vistas públicas; ver jurados/replica.py).
+# METAROBOTS_REPLICA_PATH crea una copia SQLite refrescada con la API de backup; para
+# otra réplica basta con declarar DATABASES[REPLICA_DB_ALIAS] aquí.
+REPLICA_DB_ALIAS = 'replica'
+if os.environ.get('METAROBOTS_REPLICA_PATH'):
+    DATABASES[REPLICA_DB_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['METAROBOTS_REPLICA_PATH'],
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': DATABASES['default']['CONN_HEALTH_CHECKS'],
+        'OPTIONS': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000},
+        'TEST': {'MIRROR': 'default'},
+    }
+# Base de archivo para torneos terminados y tiempos antiguos (comando `archivar`, vistas con ?archivo=1)
+ARCHIVO_DB_ALIAS = 'archivo'
+DATABASES[ARCHIVO_DB_ALIAS] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.environ.get('METAROBOTS_ARCHIVE_PATH', BASE_DIR / 'archivo.sqlite3'),
+    'OPTIONS': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000},
+}
+DATABASE_ROUTERS = ['jurados.archivo.ArchivoRouter', 'jurados.replica.ReplicaRouter']
+# Atraso máximo (segundos) con el que se sigue leyendo de la réplica
+REPLICA_MAX_LAG = float(os.environ.get('METAROBOTS_REPLICA_MAX_LAG', '60'))
+# Cada cuántos segundos refrescar la réplica desde el servidor (0 = solo con `refrescar_replica`).
+# La copia SQLite solo se rehace si el primario cambió; cada copia relee la base entera.
+REPLICA_REFRESCO_INTERVALO = float(os.environ.get('METAROBOTS_REPLICA_INTERVALO', '30'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,6 +185,28 @@ STATICFILES_DIRS = [
 # Necesario para servir archivos estáticos desde cualquier host
 STATIC_ROOT = None  # Django usa el sistema de archivos estáticos integrado en desarrollo
 
+# Cada cuántos segundos el hilo de fondo cierra sesiones de registro vencidas (0 = desactivado;
+# igualmente se ignoran al buscar). También: python manage.py cerrar_sesiones_vencidas
+SESIONES_REAPER_INTERVALO = float(os.environ.get('METAROBOTS_REAPER_INTERVALO', '60'))
+
+# Respaldos en línea (comando `respaldar`; con RESPALDOS_INTERVALO > 0 también desde el servidor)
+RESPALDOS_DIR = os.environ.get('METAROBOTS_RESPALDOS_DIR', BASE_DIR / 'respaldos')
+RESPALDOS_INTERVALO = float(os.environ.get('METAROBOTS_RESPALDOS_INTERVALO', '0'))
+RESPALDOS_CONSERVAR = int(os.environ.get('METAROBOTS_RESPALDOS_CONSERVAR', '12'))
+# Páginas por tramo y pausa entre tramos; tras RESPALDOS_MAX_REINICIOS se copia de una vez
+RESPALDOS_PAGINAS = int(os.environ.get('METAROBOTS_RESPALDOS_PAGINAS', '256'))
+RESPALDOS_PAUSA = float(os.environ.get('METAROBOTS_RESPALDOS_PAUSA', '0.005'))
+RESPALDOS_MAX_REINICIOS = int(os.environ.get('METAROBOTS_RESPALDOS_MAX_REINICIOS', '5'))
+# Cada cuántos segundos la sonda mide la espera por el lock de escritura durante la copia (0 = sin sonda)
+RESPALDOS_SONDA = float(os.environ.get('METAROBOTS_RESPALDOS_SONDA', '0.5'))
+
+# Segundos que la caché en memoria de categorías y torneos activos confía en lo cargado
+# (se invalida al guardar; el vencimiento cubre cambios hechos desde otros procesos)
+REFERENCIAS_TTL = float(os.environ.get('METAROBOTS_REFERENCIAS_TTL', '10'))
+
+# Registro de eventos: instantánea de un torneo cada N eventos suyos (comando `reconstruir_torneo`)
+EVENTOS_INSTANTANEA_CADA = int(os.environ.get('METAROBOTS_EVENTOS_INSTANTANEA_CADA', '50'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
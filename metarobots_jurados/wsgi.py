@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'metarobots_jurados.settings')
 
 application = get_wsgi_application()
+
+# Tareas de fondo (cierre de sesiones vencidas, etc.) solo en el proceso servidor
+from jurados.tareas import iniciar_tareas_fondo  # noqa: E402
+
+iniciar_tareas_fondo()